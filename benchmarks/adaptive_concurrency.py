@@ -0,0 +1,97 @@
+"""Compara concorrência fixa com a adaptativa contra um upstream de capacidade limitada.
+
+O FakeOpenRouterServer simula um upstream com ``capacity`` requisições
+simultâneas: acima disso a latência cresce e, acima do dobro, ele responde
+429. Para cada cenário o script roda os mesmos jobs com um pool de threads e
+mostra throughput, 429 recebidos e, no adaptativo, o limite final.
+
+Uso (na raiz do repositório):
+
+    python benchmarks/adaptive_concurrency.py --requests 600 --capacity 16
+
+Falha (exit 1) se o adaptativo não superar a concorrência baixa em
+throughput ou receber mais 429 que a concorrência alta.
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_server import FakeOpenRouterServer, FakeServerConfig  # noqa: E402
+from src.client import OpenRouterClient  # noqa: E402
+from src.config import AppConfig  # noqa: E402
+
+
+def run_scenario(server: FakeOpenRouterServer, requests: int, workers: int, adaptive: bool) -> Dict[str, float]:
+    config = AppConfig(
+        openrouter_base_url=server.base_url,
+        rate_limit_calls=1_000_000,
+        rate_limit_window=1,
+        retry_delay=0.05,
+        retry_max_delay=0.5,
+        max_retries=10,
+        circuit_failure_threshold=1_000_000,
+        adaptive_concurrency=adaptive,
+        concurrency_max_limit=workers,
+    )
+    client = OpenRouterClient("sk-or-bench", config=config)
+    client.client  # cria o SDK fora da medição
+    server.reset()
+    errors = 0
+
+    def job(i: int) -> None:
+        nonlocal errors
+        try:
+            client.send_message(f"job {i}")
+        except Exception:
+            errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(job, range(requests)))
+    elapsed = time.perf_counter() - started
+    metrics = client.concurrency.metrics().get(config.default_model, {}) if adaptive else {}
+    return {
+        "throughput": requests / elapsed,
+        "elapsed": elapsed,
+        "429": server.stats.by_status.get(429, 0),
+        "errors": errors,
+        "limit": metrics.get("limit", workers),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=600)
+    parser.add_argument("--capacity", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    scenarios = [("fixa 4", 4, False), ("fixa 64", 64, False), ("adaptativa (até 64)", 64, True)]
+    results = {}
+    server_config = FakeServerConfig(latency_ms=args.latency_ms, tokens=5, retry_after=None, capacity=args.capacity)
+    with FakeOpenRouterServer(server_config) as server:
+        print(f"{'concorrência':<24}{'req/s':>8}{'tempo':>9}{'429':>7}{'erros':>7}{'limite':>8}")
+        for name, workers, adaptive in scenarios:
+            r = run_scenario(server, args.requests, workers, adaptive)
+            results[name] = r
+            print(f"{name:<24}{r['throughput']:>8.1f}{r['elapsed']:>8.2f}s{r['429']:>7}{r['errors']:>7}{r['limit']:>8g}")
+
+    adaptive, low, high = results["adaptativa (até 64)"], results["fixa 4"], results["fixa 64"]
+    failures = []
+    if adaptive["throughput"] <= low["throughput"]:
+        failures.append("adaptativa não superou a concorrência fixa baixa")
+    if adaptive["429"] > high["429"]:
+        failures.append("adaptativa recebeu mais 429 que a concorrência fixa alta")
+    for failure in failures:
+        print(f"FALHA {failure}")
+    print("OK" if not failures else f"{len(failures)} falhas")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""Gravação e reprodução de tráfego com cassette.
+
+Grava requisições (com e sem streaming, pelos agentes e pelo cliente) contra
+o servidor local com 429 e 5xx injetados, desliga o servidor e reproduz o
+cassette: as respostas, o número de tentativas (retries) e os erros
+mapeados precisam ser idênticos aos gravados, na latência original e
+comprimida. Por fim, mede busca por hash e reconstrução do índice em um
+cassette com ``--entries`` entradas sintéticas.
+
+Uso (na raiz do repositório):
+
+    python benchmarks/cassette.py --requests 60 --entries 200000
+
+Falha (exit 1) se a reprodução divergir da gravação ou se a busca por hash
+passar de ``--max-seek-ms``.
+"""
+import argparse
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_server import FakeOpenRouterServer, FakeServerConfig  # noqa: E402
+from src.agents import EmailDrafter  # noqa: E402
+from src.cassette import Cassette, request_hash  # noqa: E402
+from src.client import OpenRouterClient  # noqa: E402
+from src.config import AppConfig  # noqa: E402
+
+Outcome = Tuple[str, int, str]
+
+# Sem rate limit local e com backoff curto, o tempo é dominado pela latência gravada
+LIMITS = dict(rate_limit_calls=100_000, rate_limit_window=1, retry_delay=0.01, retry_max_delay=0.02)
+
+
+def run_traffic(config: AppConfig, requests: int) -> Tuple[List[Outcome], float]:
+    """(texto ou erro, tentativas, tipo do erro) de cada requisição e o tempo total"""
+    client = OpenRouterClient("sk-or-bench", config=config, max_retries=2)
+    drafter = EmailDrafter(client)
+    outcomes: List[Outcome] = []
+    started = time.perf_counter()
+    for i in range(requests):
+        try:
+            if i % 3 == 0:
+                stream = client.send_message_stream(f"stream {i}")
+                text = "".join(stream)
+                outcomes.append((text, stream.result.attempts, ""))
+            elif i % 3 == 1:
+                outcomes.append((drafter.draft(f"email {i}"), 0, ""))
+            else:
+                result = client.send_message_result(f"requisição {i}")
+                outcomes.append((result.text, result.attempts, ""))
+        except Exception as e:
+            outcomes.append((str(e), 0, type(e).__name__))
+    return outcomes, time.perf_counter() - started
+
+
+def scale(args: argparse.Namespace, directory: Path) -> List[str]:
+    failures = []
+    cassette = Cassette(directory / "grande.cassette")
+    body = b'{"model":"gpt-4o-mini","messages":[{"role":"user","content":"%d"}]}'
+    started = time.perf_counter()
+    hashes = []
+    for i in range(args.entries):
+        hash = request_hash("POST", "/api/v1/chat/completions", body % i)
+        if i % 1000 == 0:
+            hashes.append(hash)
+        cassette.append({
+            "hash": hash, "status": 200, "latency": 0.5, "headers_at": 0.4, "headers": [],
+            "chunks": [[0.5, '{"choices":[{"message":{"content":"resposta %d"}}]}' % i]],
+        })
+    write = time.perf_counter() - started
+    cassette.close()
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    cassette = Cassette(directory / "grande.cassette")
+    started = time.perf_counter()
+    for hash in hashes:
+        if cassette.get(hash) is None:
+            failures.append(f"hash {hash} não encontrado")
+    seek_ms = (time.perf_counter() - started) / len(hashes) * 1000
+    rss_growth = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+    cassette.close()
+
+    cassette.index_path.unlink()
+    started = time.perf_counter()
+    rebuilt = Cassette(directory / "grande.cassette").summary()["entries"]
+    rebuild = time.perf_counter() - started
+    size = (directory / "grande.cassette").stat().st_size / 1024 / 1024
+    print(
+        f"\n{args.entries} entradas ({size:.1f} MB): gravação {write:.1f}s, busca por hash {seek_ms:.2f} ms, "
+        f"memória +{rss_growth:.1f} MB, reconstrução do índice {rebuild:.1f}s"
+    )
+    if seek_ms > args.max_seek_ms:
+        failures.append(f"busca por hash {seek_ms:.2f} ms (máximo {args.max_seek_ms})")
+    if rebuilt != args.entries:
+        failures.append(f"índice reconstruído com {rebuilt} de {args.entries} entradas")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--entries", type=int, default=200_000)
+    parser.add_argument("--speed", type=float, default=10.0, help="Compressão do tempo na segunda reprodução")
+    parser.add_argument("--max-seek-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "trafego.cassette")
+        server_config = FakeServerConfig(latency_ms=30, error_429=0.15, error_5xx=0.1, tokens=10, seed=7)
+        with FakeOpenRouterServer(server_config) as server:
+            base = dict(openrouter_base_url=server.base_url, **LIMITS)
+            recorded, recorded_time = run_traffic(AppConfig(cassette_record_path=path, **base), args.requests)
+        # Servidor desligado: a reprodução não pode depender da rede
+        runs = [("original", 1.0), (f"{args.speed:g}x", args.speed), ("sem espera", 0.0)]
+        print(f"{'execução':<14}{'tempo':>8}{'iguais':>9}{'erros':>7}")
+        print(f"{'gravação':<14}{recorded_time:>7.2f}s{'-':>9}{sum(1 for o in recorded if o[2]):>7}")
+        for name, speed in runs:
+            config = AppConfig(
+                openrouter_base_url="http://127.0.0.1:9/api/v1", cassette_replay_path=path,
+                cassette_replay_speed=speed, **LIMITS
+            )
+            replayed, elapsed = run_traffic(config, args.requests)
+            same = sum(1 for a, b in zip(recorded, replayed) if a == b)
+            print(f"{name:<14}{elapsed:>7.2f}s{same:>9}{sum(1 for o in replayed if o[2]):>7}")
+            if same != len(recorded):
+                failures.append(f"reprodução {name}: {len(recorded) - same} respostas diferentes da gravação")
+            if speed == 1.0 and elapsed < recorded_time * 0.7:
+                failures.append(f"reprodução na latência original rápida demais ({elapsed:.2f}s)")
+        print(f"cassette: {Cassette(Path(path)).summary()}")
+        failures += scale(args, Path(tmp))
+
+    for failure in failures:
+        print(f"FALHA {failure}")
+    print("OK" if not failures else f"{len(failures)} falhas")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Reuso de conexões HTTP e prewarm, simulando sessões do menu interativo.
+
+O servidor local atrasa cada conexão nova em ``--connect-delay-ms`` (o custo
+de DNS + TCP + TLS até o openrouter.ai). Cada sessão cria um cliente novo,
+como o menu faz após trocar a API key, e envia algumas requisições. Compara
+a latência da primeira requisição de cada sessão com um cliente HTTP por
+OpenRouterClient (comportamento anterior) e com o pool compartilhado
+aquecido por ``prewarm`` enquanto o "usuário" digita.
+
+Uso (na raiz do repositório):
+
+    python benchmarks/connections.py --connect-delay-ms 150 --sessions 3
+
+Falha (exit 1) se, com o pool, alguma requisição abrir conexão nova ou se a
+primeira requisição não ficar mais rápida que sem o pool.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_server import FakeOpenRouterServer, FakeServerConfig  # noqa: E402
+from src.client import OpenRouterClient  # noqa: E402
+from src.config import AppConfig  # noqa: E402
+from src.transport import connection_summary, shared_transport  # noqa: E402
+
+
+def run_sessions(server: FakeOpenRouterServer, args: argparse.Namespace, shared: bool) -> List[List[float]]:
+    config = AppConfig(
+        openrouter_base_url=server.base_url,
+        rate_limit_calls=100_000,
+        rate_limit_window=1,
+        http_shared_pool=shared,
+    )
+    if shared:
+        shared_transport(config).prewarm(config.openrouter_base_url)
+    sessions = []
+    for session in range(args.sessions):
+        time.sleep(args.think_time)  # usuário escolhendo o agente e digitando
+        client = OpenRouterClient("sk-or-bench", config=config)
+        latencies = []
+        for i in range(args.requests):
+            started = time.perf_counter()
+            client.send_message(f"sessão {session} requisição {i}")
+            latencies.append(time.perf_counter() - started)
+        sessions.append(latencies)
+    return sessions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connect-delay-ms", type=float, default=150.0)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--sessions", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--think-time", type=float, default=0.5)
+    args = parser.parse_args()
+
+    # Importa o SDK antes das medições, para que só a conexão pese
+    import openai  # noqa: F401
+
+    results = {}
+    connections = {}
+    server_config = FakeServerConfig(latency_ms=args.latency_ms, connect_delay_ms=args.connect_delay_ms, tokens=5)
+    with FakeOpenRouterServer(server_config) as server:
+        for name, shared in (("por cliente", False), ("compartilhado", True)):
+            server.reset()
+            results[name] = run_sessions(server, args, shared)
+            connections[name] = server.stats.connections
+
+    print(f"{'pool':<16}{'1ª requisição':>15}{'demais (média)':>16}{'conexões':>10}")
+    for name, sessions in results.items():
+        first = sum(s[0] for s in sessions) / len(sessions)
+        rest = [latency for s in sessions for latency in s[1:]]
+        print(f"{name:<16}{first * 1000:>13.0f}ms{sum(rest) / len(rest) * 1000:>14.0f}ms{connections[name]:>10}")
+    stats = shared_transport().stats()
+    print(connection_summary(stats))
+
+    failures = []
+    if stats.new_connections:
+        failures.append(f"{stats.new_connections} requisições abriram conexão com o pool aquecido")
+    first_before = sum(s[0] for s in results["por cliente"]) / args.sessions
+    first_after = sum(s[0] for s in results["compartilhado"]) / args.sessions
+    if first_after > first_before - args.connect_delay_ms / 2000:
+        failures.append(f"1ª requisição com o pool ({first_after * 1000:.0f}ms) não evitou o handshake")
+    for failure in failures:
+        print(f"FALHA {failure}")
+    print("OK" if not failures else f"{len(failures)} falhas")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,360 @@
+"""Servidor local compatível com a API de chat completions do OpenRouter/OpenAI.
+
+Serve respostas sintéticas com latência configurável e injeção de falhas
+(429, 5xx e timeouts), com ou sem streaming, e simula o prompt caching dos
+provedores (``prompt_tokens_details.cached_tokens`` no ``usage``). Pode ser usado programaticamente
+(``FakeOpenRouterServer``) ou pela linha de comando:
+
+    python -m benchmarks.fake_server --port 8765 --latency-ms 200 --error-429 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+
+@dataclass
+class FakeServerConfig:
+    """Distribuição de latência e taxas de falha do servidor"""
+    latency: str = "fixed"          # fixed | uniform | lognormal
+    latency_ms: float = 0.0         # valor fixo, média (uniform) ou mediana (lognormal)
+    latency_spread: float = 0.5     # ± fração (uniform) ou sigma (lognormal)
+    error_429: float = 0.0
+    error_5xx: float = 0.0
+    timeout_rate: float = 0.0
+    timeout_s: float = 5.0
+    retry_after: Optional[float] = 0.05
+    tokens: int = 20
+    token_delay_ms: float = 0.0
+    seed: Optional[int] = None
+    model_latency_ms: Dict[str, float] = field(default_factory=dict)  # sobrepõe latency_ms por modelo
+    # Capacidade simulada do upstream (0 = ilimitada): acima dela a latência cresce
+    # proporcionalmente às requisições em andamento, e acima de 1,5x responde 429
+    capacity: int = 0
+    invalid_keys: Tuple[str, ...] = ()  # API keys recusadas com 401
+    connect_delay_ms: float = 0.0   # atraso ao aceitar cada conexão nova (simula DNS + TLS)
+    prefill_ms_per_1k: float = 0.0  # latência extra por mil tokens de entrada (processamento do prompt)
+    # Pedidos de refinamento por edições (ver BaseAgent.refine_message_template) respondidos
+    # com um bloco que troca as primeiras ``edit_tokens`` palavras do texto (0 = texto completo)
+    edit_tokens: int = 0
+
+    def sample_latency(self, rng: random.Random, model: Optional[str] = None) -> float:
+        base = self.model_latency_ms.get(model, self.latency_ms) / 1000
+        if self.latency == "uniform":
+            return max(0.0, rng.uniform(base * (1 - self.latency_spread), base * (1 + self.latency_spread)))
+        if self.latency == "lognormal" and base > 0:
+            return rng.lognormvariate(0, self.latency_spread) * base
+        return base
+
+
+@dataclass
+class FakeServerStats:
+    requests: int = 0
+    connections: int = 0
+    by_status: Dict[int, int] = field(default_factory=dict)
+    bodies: list = field(default_factory=list)
+    keep_bodies: bool = False
+
+    def record(self, status: int, body: Dict[str, Any]) -> None:
+        self.requests += 1
+        self.by_status[status] = self.by_status.get(status, 0) + 1
+        if self.keep_bodies:
+            self.bodies.append(body)
+
+
+def _text(content: Any) -> str:
+    """Texto de um content string ou lista de partes"""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content)
+
+
+def _cacheable_prefix(request: Dict[str, Any]) -> Optional[str]:
+    """Prefixo que o provedor simulado cachearia, conforme a família do modelo.
+
+    Modelos gpt-*: mensagens de sistema iniciais, automaticamente. Modelos
+    claude-*: só até a última parte marcada com ``cache_control``.
+    Outros: sem cache.
+    """
+    model = request.get("model", "")
+    messages = request.get("messages", [])
+    if model.startswith("gpt"):
+        prefix = [_text(m.get("content", "")) for m in messages if m.get("role") == "system"]
+        return "".join(prefix) or None
+    if model.startswith("claude"):
+        prefix = ""
+        marked = None
+        for message in messages:
+            content = message.get("content", "")
+            parts = content if isinstance(content, list) else [{"text": content}]
+            for part in parts:
+                prefix += part.get("text", "")
+                if part.get("cache_control"):
+                    marked = prefix
+        return marked
+    return None
+
+
+def _edit_block(request: Dict[str, Any], edit_tokens: int) -> Optional[str]:
+    """Bloco de edição que troca as primeiras palavras do "Texto atual" de um pedido de refinamento"""
+    messages = request.get("messages", [])
+    text = _text(messages[-1].get("content", "")) if messages else ""
+    if not edit_tokens or "<<<<<<< TROCAR" not in text or "Texto atual:\n" not in text:
+        return None
+    previous = text.split("Texto atual:\n", 1)[1].split("\n\nNova instrução:", 1)[0]
+    words = previous.split(" ")[:edit_tokens]
+    replacement = [f"e{i}" for i in range(len(words))]
+    return f"<<<<<<< TROCAR\n{' '.join(words)}\n=======\n{' '.join(replacement)}\n>>>>>>> FIM"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Cabeçalho e corpo saem em writes separados; sem isso o Nagle + ACK
+    # atrasado somam ~40 ms por resposta e mascaram o custo do cliente
+    disable_nagle_algorithm = True
+    server: "_Server"
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def setup(self) -> None:
+        super().setup()
+        fake = self.server.fake
+        with fake.lock:
+            fake.stats.connections += 1
+        if fake.config.connect_delay_ms:
+            time.sleep(fake.config.connect_delay_ms / 1000)
+
+    def do_HEAD(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        fake = self.server.fake
+        with fake.lock:
+            fake.inflight += 1
+        try:
+            self._respond()
+        finally:
+            with fake.lock:
+                fake.inflight -= 1
+
+    def _respond(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        fake = self.server.fake
+        config = fake.config
+        prompt_tokens = sum(len(_text(m.get("content", ""))) for m in request.get("messages", [])) // 4
+        with fake.lock:
+            roll = fake.rng.random()
+            latency = config.sample_latency(fake.rng, request.get("model"))
+            inflight = fake.inflight
+        latency += prompt_tokens / 1000 * config.prefill_ms_per_1k / 1000
+
+        if self.headers.get("Authorization", "").removeprefix("Bearer ") in config.invalid_keys:
+            fake.stats_record(401, request)
+            self._send_json(401, {"error": {"message": "No auth credentials found", "code": 401}})
+            return
+        if config.capacity and inflight > config.capacity:
+            if inflight > 1.5 * config.capacity:
+                fake.stats_record(429, request)
+                self._send_json(429, {"error": {"message": "Too many concurrent requests", "code": 429}})
+                return
+            latency *= inflight / config.capacity
+
+        if roll < config.timeout_rate:
+            fake.stats_record(0, request)
+            time.sleep(config.timeout_s)
+            self.close_connection = True
+            return
+        roll -= config.timeout_rate
+
+        time.sleep(latency)
+        if roll < config.error_429:
+            fake.stats_record(429, request)
+            headers = {}
+            if config.retry_after is not None:
+                headers["Retry-After"] = str(config.retry_after)
+            self._send_json(429, {"error": {"message": "Rate limit exceeded", "code": 429}}, headers)
+            return
+        roll -= config.error_429
+        if roll < config.error_5xx:
+            fake.stats_record(502, request)
+            self._send_json(502, {"error": {"message": "Upstream error", "code": 502}})
+            return
+
+        fake.stats_record(200, request)
+        # ~4 caracteres por palavra, como na contagem de prompt_tokens
+        chunks = [f"w{i} " for i in range(config.tokens)]
+        content = " ".join(f"w{i}" for i in range(config.tokens))
+        completion_tokens = config.tokens
+        edit = _edit_block(request, config.edit_tokens)
+        if edit is not None:
+            chunks = edit.splitlines(keepends=True)
+            content = edit
+            completion_tokens = len(edit) // 4
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        cached, written = fake.prompt_cache(request)
+        usage["prompt_tokens_details"] = {"cached_tokens": cached, "cache_write_tokens": written}
+        model = request.get("model", "fake")
+
+        if request.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            for piece in chunks:
+                chunk = {
+                    "id": "fake", "object": "chat.completion.chunk", "created": 0, "model": model,
+                    "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                if config.token_delay_ms:
+                    time.sleep(config.token_delay_ms * max(1, len(piece) // 4) / 1000)
+            final = {
+                "id": "fake", "object": "chat.completion.chunk", "created": 0, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage,
+            }
+            self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+            return
+
+        self._send_json(200, {
+            "id": "fake", "object": "chat.completion", "created": 0, "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    fake: "FakeOpenRouterServer"
+
+
+class FakeOpenRouterServer:
+    """Servidor fake em uma thread de fundo; use ``base_url`` no AppConfig"""
+
+    def __init__(self, config: Optional[FakeServerConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeServerConfig()
+        self.stats = FakeServerStats()
+        self.lock = threading.Lock()
+        self.rng = random.Random(self.config.seed)
+        self.cached_prefixes: set = set()
+        self.inflight = 0
+        self._server = _Server((host, port), _Handler)
+        self._server.fake = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v1"
+
+    def stats_record(self, status: int, body: Dict[str, Any]) -> None:
+        with self.lock:
+            self.stats.record(status, body)
+
+    def prompt_cache(self, request: Dict[str, Any]) -> Tuple[int, int]:
+        """(tokens lidos, tokens gravados) do prompt cache simulado para a requisição"""
+        prefix = _cacheable_prefix(request)
+        if prefix is None:
+            return 0, 0
+        key = (request.get("model"), prefix)
+        tokens = len(prefix) // 4
+        with self.lock:
+            if key in self.cached_prefixes:
+                return tokens, 0
+            self.cached_prefixes.add(key)
+        return 0, tokens
+
+    def reset(self, config: Optional[FakeServerConfig] = None) -> None:
+        """Troca a configuração e zera as estatísticas"""
+        with self.lock:
+            if config is not None:
+                self.config = config
+                self.rng = random.Random(config.seed)
+            self.stats = FakeServerStats(keep_bodies=self.stats.keep_bodies)
+            self.cached_prefixes.clear()
+
+    def start(self) -> "FakeOpenRouterServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeOpenRouterServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Servidor fake compatível com OpenRouter")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], default="fixed")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-spread", type=float, default=0.5)
+    parser.add_argument("--error-429", type=float, default=0.0)
+    parser.add_argument("--error-5xx", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--tokens", type=int, default=20)
+    parser.add_argument("--token-delay-ms", type=float, default=0.0)
+    parser.add_argument("--capacity", type=int, default=0)
+    parser.add_argument("--connect-delay-ms", type=float, default=0.0)
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=0.0)
+    parser.add_argument("--edit-tokens", type=int, default=0)
+    args = parser.parse_args()
+
+    config = FakeServerConfig(
+        latency=args.latency,
+        latency_ms=args.latency_ms,
+        latency_spread=args.latency_spread,
+        error_429=args.error_429,
+        error_5xx=args.error_5xx,
+        timeout_rate=args.timeout_rate,
+        tokens=args.tokens,
+        token_delay_ms=args.token_delay_ms,
+        capacity=args.capacity,
+        connect_delay_ms=args.connect_delay_ms,
+        prefill_ms_per_1k=args.prefill_ms_per_1k,
+        edit_tokens=args.edit_tokens,
+    )
+    server = FakeOpenRouterServer(config, args.host, args.port)
+    print(f"Servidor fake em {server.base_url} (Ctrl+C para sair)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
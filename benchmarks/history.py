@@ -0,0 +1,168 @@
+"""Histórico local das gerações: custo de registrar, gravação em lote, busca e retenção.
+
+Mede quanto ``HistoryStore.record`` acrescenta a cada geração (só enfileira),
+a vazão da gravação em lote em segundo plano, a latência da busca full-text
+(FTS5) e dos filtros com ``--entries`` gerações sintéticas, e confere que a
+compactação aplica a retenção por idade e por número de gerações. Por fim,
+roda agentes contra o servidor local e confere que cada geração foi
+registrada com modelo, latência e tokens.
+
+Uso (na raiz do repositório):
+
+    python benchmarks/history.py --entries 100000
+
+Falha (exit 1) se ``record`` passar de ``--max-record-us``, a busca de
+``--max-search-ms`` ou se a retenção ou o registro pelos agentes falharem.
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_server import FakeOpenRouterServer, FakeServerConfig  # noqa: E402
+from src.agents import EmailDrafter, PromptGenerator  # noqa: E402
+from src.client import OpenRouterClient  # noqa: E402
+from src.config import AppConfig  # noqa: E402
+from src.history import HistoryStore  # noqa: E402
+
+WORDS = (
+    "reunião cliente proposta orçamento prazo contrato entrega equipe projeto revisão relatório "
+    "reembolso fatura suporte atraso pedido cancelamento marketing campanha lançamento produto "
+    "feedback treinamento integração migração servidor banco dados segurança acesso senha"
+).split()
+AGENTS = ["EmailDrafter", "PromptGenerator", "NotesFormatter"]
+MODELS = ["gpt-4o-mini", "claude-3-haiku", "llama-3.1-70b"]
+
+
+def text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def fill(store: HistoryStore, entries: int) -> float:
+    """Registra ``entries`` gerações e espera a gravação; retorna o µs médio por record"""
+    rng = random.Random(7)
+    rows = [
+        (rng.choice(AGENTS), rng.choice(MODELS), text(rng, 40), text(rng, 120), rng.uniform(0.3, 4), 60, 200)
+        for _ in range(entries)
+    ]
+    started = time.perf_counter()
+    for row in rows:
+        store.record(*row)
+    enqueue = time.perf_counter() - started
+    store.flush()
+    total = time.perf_counter() - started
+    print(
+        f"{entries} gerações: record {enqueue / entries * 1e6:.1f} µs, "
+        f"gravação em lote {entries / total:,.0f} gerações/s ({total:.1f}s)"
+    )
+    return enqueue / entries * 1e6
+
+
+def search(store: HistoryStore, args: argparse.Namespace) -> List[str]:
+    failures = []
+    rng = random.Random(11)
+    cases = {
+        "uma palavra": lambda: dict(query=rng.choice(WORDS)),
+        "três palavras": lambda: dict(query=" ".join(rng.sample(WORDS, 3))),
+        "prefixo": lambda: dict(query=rng.choice(WORDS)[:4]),
+        "palavra + agente": lambda: dict(query=rng.choice(WORDS), agent=rng.choice(AGENTS)),
+        "agente + modelo": lambda: dict(agent=rng.choice(AGENTS), model=rng.choice(MODELS)),
+        "últimos 7 dias": lambda: dict(since=time.time() - 7 * 24 * 3600),
+    }
+    print(f"\n{'busca':<20}{'p50':>9}{'p95':>9}{'resultados':>12}")
+    for name, make in cases.items():
+        latencies, found = [], 0
+        for _ in range(args.searches):
+            kwargs = make()
+            started = time.perf_counter()
+            found += len(store.search(limit=20, **kwargs))
+            latencies.append(time.perf_counter() - started)
+        p50, p95 = percentile(latencies, 0.5) * 1000, percentile(latencies, 0.95) * 1000
+        print(f"{name:<20}{p50:>7.2f}ms{p95:>7.2f}ms{found / args.searches:>12.1f}")
+        if p95 > args.max_search_ms:
+            failures.append(f"busca '{name}' p95 {p95:.1f} ms (máximo {args.max_search_ms})")
+        if not found:
+            failures.append(f"busca '{name}' sem resultados")
+    entry = store.search("reunião")[0]
+    if store.get(entry.id).output != entry.output:
+        failures.append("get não devolveu a saída gravada")
+    return failures
+
+
+def retention(directory: Path) -> List[str]:
+    failures = []
+    store = HistoryStore(directory / "retencao.sqlite3", retention_days=30, max_entries=50)
+    for i in range(80):
+        store.record("EmailDrafter", "gpt-4o-mini", f"input {i}", f"saída {i}")
+    store.flush()
+    # Metade das gerações com 60 dias
+    with store._lock:
+        store._connect().execute("UPDATE generations SET created_at = created_at - 60 * 86400 WHERE id <= 40")
+    removed = store.compact()
+    left = store.stats()["entries"]
+    store.close()
+    print(f"\nretenção (30 dias, 50 gerações): {removed} removidas, {left} mantidas")
+    if left != 40 or removed != 40:
+        failures.append(f"retenção manteve {left} gerações (esperado 40)")
+    return failures
+
+
+def agents(directory: Path) -> List[str]:
+    store = HistoryStore(directory / "agentes.sqlite3")
+    with FakeOpenRouterServer(FakeServerConfig(latency_ms=10, tokens=8)) as server:
+        config = AppConfig(openrouter_base_url=server.base_url, rate_limit_calls=100_000, rate_limit_window=1)
+        client = OpenRouterClient("sk-or-bench", config=config)
+        EmailDrafter(client, history=store).draft("pedir reembolso da fatura")
+        "".join(PromptGenerator(client, history=store).generate_stream("gerar campanha de lançamento"))
+    entries = store.search(limit=10)
+    store.close()
+    failures = []
+    for entry in entries:
+        print(f"{entry.agent:<16}{entry.model:<16}{entry.latency:.3f}s {entry.completion_tokens} tokens")
+        if not entry.output or entry.latency is None or not entry.completion_tokens:
+            failures.append(f"geração de {entry.agent} registrada sem saída, latência ou tokens")
+    if {e.agent for e in entries} != {"EmailDrafter", "PromptGenerator"}:
+        failures.append(f"agentes registrados: {sorted(e.agent for e in entries)}")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--searches", type=int, default=50)
+    parser.add_argument("--max-record-us", type=float, default=50.0)
+    parser.add_argument("--max-search-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(Path(tmp) / "history.sqlite3")
+        record_us = fill(store, args.entries)
+        if record_us > args.max_record_us:
+            failures.append(f"record {record_us:.1f} µs (máximo {args.max_record_us})")
+        failures += search(store, args)
+        size = store.stats()["bytes"] / 1024 / 1024
+        store.close()
+        print(f"banco: {size:.1f} MB")
+        failures += retention(Path(tmp))
+        print()
+        failures += agents(Path(tmp))
+
+    for failure in failures:
+        print(f"FALHA {failure}")
+    print("OK" if not failures else f"{len(failures)} falhas")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
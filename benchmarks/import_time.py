@@ -0,0 +1,75 @@
+"""Benchmark de tempo de import da CLI, baseado em ``python -X importtime``.
+
+Uso (na raiz do repositório):
+
+    python benchmarks/import_time.py [--runs 5] [--max-ms 150]
+
+Falha (exit 1) se o import de ``src.cli`` passar do orçamento ou se um comando
+não interativo importar módulos pesados que deveriam ser carregados sob demanda.
+"""
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+IMPORT_BUDGET_MS = 150.0
+
+# Módulos que um comando não interativo sem requisição real não deve importar
+FORBIDDEN_ON_FAST_PATH = ("questionary", "prompt_toolkit", "openai", "asyncio")
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """Mapeia módulo -> tempo cumulativo em microssegundos"""
+    cumulative: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            cumulative[match.group(4)] = int(match.group(2))
+    return cumulative
+
+
+def run_importtime(args: List[str]) -> Dict[str, int]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Execuções (usa o melhor tempo)")
+    parser.add_argument("--max-ms", type=float, default=IMPORT_BUDGET_MS, help="Orçamento para import de src.cli")
+    args = parser.parse_args()
+
+    timings = [run_importtime(["-c", "import src.cli"]).get("src.cli", 0) / 1000 for _ in range(args.runs)]
+    best = min(timings)
+    print(f"import src.cli: melhor {best:.1f} ms, pior {max(timings):.1f} ms ({args.runs} execuções)")
+
+    # Comando one-shot que falha na validação: não deve tocar UI interativa nem o SDK
+    too_long = "x" * 10001
+    modules = run_importtime(["-m", "src.cli", "email", too_long, "--api-key", "sk-or-bench"])
+    leaked = [name for name in FORBIDDEN_ON_FAST_PATH if name in modules]
+
+    failed = False
+    if best > args.max_ms:
+        print(f"FALHA: import de src.cli acima do orçamento de {args.max_ms:.0f} ms")
+        failed = True
+    if leaked:
+        print(f"FALHA: caminho rápido importou {', '.join(leaked)}")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
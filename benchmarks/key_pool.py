@@ -0,0 +1,89 @@
+"""Mede o throughput do KeyPool com 1, 2 e 4 API keys e a quarentena de keys inválidas.
+
+Cada key tem um rate limiter local de ``--calls-per-second`` chamadas por
+segundo; com o pool, o throughput deve crescer linearmente com o número de
+keys. No último cenário uma das keys é recusada pelo servidor (401): ela deve
+ir para a quarentena sem que nenhum job falhe.
+
+Uso (na raiz do repositório):
+
+    python benchmarks/key_pool.py --requests 120 --calls-per-second 20
+
+Falha (exit 1) se 4 keys não renderem ao menos 3x o throughput de uma, ou se
+a key inválida derrubar algum job.
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_server import FakeOpenRouterServer, FakeServerConfig  # noqa: E402
+from src.config import AppConfig  # noqa: E402
+from src.key_pool import KeyPool, usage_table  # noqa: E402
+
+
+def run_scenario(
+    server: FakeOpenRouterServer, keys: List[str], requests: int, calls_per_second: int
+) -> Tuple[float, int, KeyPool]:
+    config = AppConfig(
+        openrouter_base_url=server.base_url,
+        rate_limit_calls=calls_per_second,
+        rate_limit_window=1,
+    )
+    pool = KeyPool.from_keys(keys, config=config)
+    errors = 0
+
+    def job(i: int) -> None:
+        nonlocal errors
+        try:
+            pool.send_message(f"job {i}")
+        except Exception:
+            errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(job, range(requests)))
+    return requests / (time.perf_counter() - started), errors, pool
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=120)
+    parser.add_argument("--calls-per-second", type=int, default=20)
+    args = parser.parse_args()
+
+    keys = [f"sk-or-bench-key-{i}" for i in range(4)]
+    failures = []
+    throughput = {}
+    server_config = FakeServerConfig(latency_ms=10, tokens=5, invalid_keys=("sk-or-bench-revoked",))
+    with FakeOpenRouterServer(server_config) as server:
+        print(f"{'keys':<8}{'req/s':>8}{'erros':>7}")
+        for count in (1, 2, 4):
+            rate, errors, _ = run_scenario(server, keys[:count], args.requests, args.calls_per_second)
+            throughput[count] = rate
+            print(f"{count:<8}{rate:>8.1f}{errors:>7}")
+
+        rate, errors, pool = run_scenario(
+            server, keys[:2] + ["sk-or-bench-revoked"], args.requests, args.calls_per_second
+        )
+        print(f"\n2 válidas + 1 revogada: {rate:.1f} req/s, {errors} erros")
+        print(usage_table(pool.usage()))
+
+    if throughput[4] < 3 * throughput[1]:
+        failures.append(f"4 keys renderam só {throughput[4] / throughput[1]:.1f}x o throughput de uma")
+    if errors:
+        failures.append(f"{errors} jobs falharam com uma key revogada no pool")
+    if not pool.usage()[2].quarantined:
+        failures.append("key revogada não foi para a quarentena")
+    for failure in failures:
+        print(f"FALHA {failure}")
+    print("OK" if not failures else f"{len(failures)} falhas")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
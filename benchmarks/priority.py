@@ -0,0 +1,110 @@
+"""Espera de requisições interativas com o rate limiter saturado por batch.
+
+Dezenas de threads de batch disputam o mesmo orçamento de rate limit
+enquanto uma thread interativa envia requisições espaçadas. Compara a espera
+(p50/p95) das interativas com o RateLimiter comum, em que todos disputam o
+bucket igualmente, e com o PriorityRateLimiter.
+
+Uso (na raiz do repositório):
+
+    python benchmarks/priority.py --batch-threads 32 --calls-per-second 20
+
+Falha (exit 1) se o p95 interativo com prioridade não ficar abaixo de
+``--max-p95`` ou se o batch não progredir (starvation).
+"""
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_server import FakeOpenRouterServer, FakeServerConfig  # noqa: E402
+from src.client import OpenRouterClient  # noqa: E402
+from src.config import AppConfig  # noqa: E402
+from src.rate_limiter import RateLimiter  # noqa: E402
+from src.scheduler import request_priority, wait_table  # noqa: E402
+
+
+def run_scenario(
+    server: FakeOpenRouterServer, args: argparse.Namespace, prioritized: bool
+) -> Dict[str, List[float]]:
+    config = AppConfig(
+        openrouter_base_url=server.base_url,
+        rate_limit_calls=args.calls_per_second,
+        rate_limit_window=1,
+        rate_limit_max_wait=None,
+        default_priority="batch",
+    )
+    client = OpenRouterClient("sk-or-bench", config=config)
+    if not prioritized:
+        client.rate_limiter = RateLimiter(config.rate_limit_calls, config.rate_limit_window, max_wait=None)
+    client.client  # cria o SDK fora da medição
+    waits: Dict[str, List[float]] = {"interactive": [], "batch": []}
+    stop = threading.Event()
+
+    def batch_worker(worker: int) -> None:
+        i = 0
+        while not stop.is_set():
+            result = client.send_message_result(f"batch {worker}-{i}")
+            waits["batch"].append(result.rate_limit_wait)
+            i += 1
+
+    threads = [threading.Thread(target=batch_worker, args=(w,), daemon=True) for w in range(args.batch_threads)]
+    for thread in threads:
+        thread.start()
+    time.sleep(1.5)  # esgota o burst e enche a fila
+    with request_priority("interactive"):
+        for i in range(args.interactive):
+            result = client.send_message_result(f"interativo {i}")
+            waits["interactive"].append(result.rate_limit_wait)
+            time.sleep(0.2)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    if prioritized:
+        print(wait_table(client.rate_limiter.wait_report()))
+    return waits
+
+
+def quantile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-threads", type=int, default=32)
+    parser.add_argument("--calls-per-second", type=int, default=20)
+    parser.add_argument("--interactive", type=int, default=20)
+    parser.add_argument("--max-p95", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = {}
+    with FakeOpenRouterServer(FakeServerConfig(latency_ms=5, tokens=5)) as server:
+        for name, prioritized in (("fifo", False), ("prioridade", True)):
+            results[name] = run_scenario(server, args, prioritized)
+
+    print(f"\n{'limiter':<12}{'interativo p50':>16}{'interativo p95':>16}{'batch concluídos':>18}")
+    for name, waits in results.items():
+        print(
+            f"{name:<12}{quantile(waits['interactive'], 0.5):>15.3f}s"
+            f"{quantile(waits['interactive'], 0.95):>15.3f}s{len(waits['batch']):>18}"
+        )
+
+    failures = []
+    p95 = quantile(results["prioridade"]["interactive"], 0.95)
+    if p95 > args.max_p95:
+        failures.append(f"p95 interativo com prioridade {p95:.3f}s acima de {args.max_p95}s")
+    if len(results["prioridade"]["batch"]) < args.calls_per_second:
+        failures.append("batch não progrediu com prioridade (starvation)")
+    for failure in failures:
+        print(f"FALHA {failure}")
+    print("OK" if not failures else f"{len(failures)} falhas")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""Profiler por etapa: custo desligado e ligado, e validade do trace e das pilhas.
+
+Mede o custo de um ``span`` com o profiler desligado (o caminho de toda
+requisição) e ligado, e quantos spans cada requisição abre. Roda requisições
+síncronas, em streaming e assíncronas contra o servidor local (com 429
+injetados, para haver retry) e confere o resultado: etapas esperadas no
+resumo, eventos do trace do Chrome aninhados dentro do pai na mesma trilha,
+tasks asyncio em trilhas separadas e pilhas "collapsed" somando o tempo
+total da raiz no trecho síncrono.
+
+Uso (na raiz do repositório):
+
+    python benchmarks/profiler.py --requests 200
+
+Falha (exit 1) se o custo desligado passar de ``--max-off-percent`` da
+latência de uma requisição, ou se o trace, o resumo ou as pilhas forem
+inconsistentes.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_server import FakeOpenRouterServer, FakeServerConfig  # noqa: E402
+from src import profiler  # noqa: E402
+from src.client import AsyncOpenRouterClient, OpenRouterClient  # noqa: E402
+from src.config import AppConfig  # noqa: E402
+from src.profiler import Profiler, span, stage_table  # noqa: E402
+
+LIMITS = dict(rate_limit_calls=100_000, rate_limit_window=1, retry_delay=0.01, retry_max_delay=0.02)
+
+
+def span_cost(iterations: int) -> Dict[str, float]:
+    """ns por ``with span(...)`` desligado e ligado"""
+    costs = {}
+    for name, enabled in (("desligado", False), ("ligado", True)):
+        if enabled:
+            profiler.enable(Profiler(max_events=0))
+        started = time.perf_counter()
+        for _ in range(iterations):
+            with span("etapa"):
+                pass
+        costs[name] = (time.perf_counter() - started) / iterations * 1e9
+        profiler.disable()
+    return costs
+
+
+def run_sync(client: OpenRouterClient, requests: int) -> float:
+    started = time.perf_counter()
+    for i in range(requests):
+        if i % 2:
+            "".join(client.send_message_stream(f"stream {i}"))
+        else:
+            client.send_message(f"requisição {i}")
+    return (time.perf_counter() - started) / requests
+
+
+async def run_async(config: AppConfig, requests: int) -> None:
+    async with AsyncOpenRouterClient("sk-or-bench", config=config, max_retries=8) as client:
+        await asyncio.gather(*(client.send_message(f"assíncrona {i}") for i in range(requests)))
+
+
+def check_trace(trace: Dict[str, Any]) -> List[str]:
+    """Cada evento precisa caber no evento aberto imediatamente antes na mesma trilha, ou depois dele"""
+    failures = []
+    lanes: Dict[int, List[Dict[str, Any]]] = {}
+    for event in trace["traceEvents"]:
+        if event["ph"] == "X":
+            lanes.setdefault(event["tid"], []).append(event)
+    for tid, events in lanes.items():
+        stack: List[float] = []
+        for event in sorted(events, key=lambda e: (e["ts"], -e["dur"])):
+            while stack and event["ts"] >= stack[-1]:
+                stack.pop()
+            end = event["ts"] + event["dur"]
+            if stack and end > stack[-1] + 1:
+                failures.append(f"trilha {tid}: '{event['name']}' ultrapassa o fim do pai")
+                break
+            stack.append(end)
+    return failures
+
+
+def check_collapsed(text: str, summary: Dict[str, Dict[str, float]], roots: List[str]) -> List[str]:
+    """Os tempos próprios das pilhas de uma raiz somam o tempo total dela"""
+    failures = []
+    stacks = {}
+    for line in text.splitlines():
+        path, value = line.rsplit(" ", 1)
+        stacks[path] = int(value)
+    for root in roots:
+        total = sum(v for path, v in stacks.items() if path == root or path.startswith(root + ";")) / 1e6
+        expected = summary[root.rsplit(";", 1)[-1]]["total"]
+        if abs(total - expected) > expected * 0.01 + 1e-3:
+            failures.append(f"pilhas de '{root}' somam {total:.3f}s, mas a raiz durou {expected:.3f}s")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=1_000_000)
+    parser.add_argument("--max-off-percent", type=float, default=0.5)
+    args = parser.parse_args()
+
+    failures = []
+    costs = span_cost(args.iterations)
+    print(f"span desligado: {costs['desligado']:.0f} ns   ligado: {costs['ligado']:.0f} ns")
+
+    server_config = FakeServerConfig(latency_ms=2, error_429=0.05, tokens=20, seed=3)
+    with FakeOpenRouterServer(server_config) as server:
+        config = AppConfig(openrouter_base_url=server.base_url, **LIMITS)
+        client = OpenRouterClient("sk-or-bench", config=config, max_retries=8)
+        run_sync(client, 10)  # importa o SDK e abre a conexão fora da medição
+
+        off = run_sync(client, args.requests)
+        with tempfile.TemporaryDirectory() as tmp:
+            with client.profile(Path(tmp) / "perfil") as active:
+                with span("síncronas"):
+                    on = run_sync(client, args.requests)
+                with span("assíncronas"):
+                    asyncio.run(run_async(config, 20))
+            trace = json.loads((Path(tmp) / "perfil.trace.json").read_text())
+            collapsed = (Path(tmp) / "perfil.folded").read_text()
+
+    summary = active.summary()
+    events = sum(1 for e in trace["traceEvents"] if e["ph"] == "X")
+    spans_per_request = (events - 3) / (args.requests + 20)
+    off_overhead = spans_per_request * costs["desligado"] / 1e9
+    print(f"\n{args.requests} requisições: {off * 1000:.2f} ms desligado, {on * 1000:.2f} ms ligado")
+    print(
+        f"{spans_per_request:.1f} spans por requisição: custo desligado ~{off_overhead * 1e6:.1f} µs "
+        f"({off_overhead / off * 100:.3f}% da requisição)"
+    )
+    print(f"\n{stage_table(summary)}")
+    print(f"\ntrace: {events} eventos em {len({e['tid'] for e in trace['traceEvents']})} trilhas")
+
+    if off_overhead / off * 100 > args.max_off_percent:
+        failures.append(f"custo desligado {off_overhead / off * 100:.3f}% (máximo {args.max_off_percent}%)")
+    for stage in ("request", "attempt", "rate_limit_wait", "http", "parse", "first_token", "stream_read", "retry_backoff"):
+        if stage not in summary:
+            failures.append(f"etapa '{stage}' ausente do resumo")
+    if summary.get("request", {}).get("calls") != args.requests + 20:
+        failures.append(f"{summary.get('request', {}).get('calls')} spans 'request' (esperado {args.requests + 20})")
+    async_lanes = {e["tid"] for e in trace["traceEvents"] if e["ph"] == "X" and e["name"] == "request"}
+    if len(async_lanes) < 20:
+        failures.append(f"requisições assíncronas simultâneas em só {len(async_lanes)} trilhas")
+    failures += check_trace(trace)
+    # Tasks simultâneas somam mais que o tempo de parede da raiz; a soma só fecha no trecho síncrono
+    failures += check_collapsed(collapsed, summary, ["profile;síncronas"])
+
+    for failure in failures:
+        print(f"FALHA {failure}")
+    print("OK" if not failures else f"{len(failures)} falhas")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
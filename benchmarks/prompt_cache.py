@@ -0,0 +1,93 @@
+"""Verifica o formato das requisições para o prompt caching de cada família de modelo.
+
+Envia os system prompts dos agentes ao FakeOpenRouterServer, com e sem
+streaming, e confere:
+
+- Claude: system prompt como parte de texto com ``cache_control`` ephemeral
+- OpenAI: system prompt como string, antes da mensagem do usuário (prefixo estável)
+- Llama: formato simples, sem marcação
+- ``usage.cached_tokens`` registrado a partir da segunda chamada (quando há cache)
+
+Uso (na raiz do repositório):
+
+    python benchmarks/prompt_cache.py
+
+Falha (exit 1) se algum formato ou contagem divergir.
+"""
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_server import FakeOpenRouterServer, FakeServerConfig  # noqa: E402
+from src.agents import EmailDrafter, NotesFormatter, PromptGenerator  # noqa: E402
+from src.client import OpenRouterClient  # noqa: E402
+from src.config import MODEL_FAMILIES, AppConfig  # noqa: E402
+from src.instrumentation import CompletionResult, RequestHook  # noqa: E402
+
+
+class _Collector(RequestHook):
+    def __init__(self) -> None:
+        self.results: List[CompletionResult] = []
+
+    def after_response(self, ctx, result: CompletionResult) -> None:
+        self.results.append(result)
+
+
+def check_shape(family: str, body: Dict[str, Any], system_prompt: str) -> List[str]:
+    problems = []
+    messages = body.get("messages", [])
+    if [m.get("role") for m in messages] != ["system", "user"]:
+        return [f"ordem das mensagens: {[m.get('role') for m in messages]}"]
+    content = messages[0]["content"]
+    if family == "anthropic":
+        expected = [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
+        if content != expected:
+            problems.append("system prompt sem breakpoint cache_control")
+    elif content != system_prompt:
+        problems.append(f"system prompt deveria ser string simples, veio {type(content).__name__}")
+    return problems
+
+
+def main() -> int:
+    failures: List[str] = []
+    collector = _Collector()
+    with FakeOpenRouterServer(FakeServerConfig(tokens=3)) as server:
+        server.stats.keep_bodies = True
+        config = AppConfig(openrouter_base_url=server.base_url, rate_limit_calls=1_000_000, rate_limit_window=1)
+        client = OpenRouterClient("sk-or-check", config=config, hooks=[collector])
+
+        print(f"{'modelo':<24}{'agente':<18}{'modo':<8}{'cached 1ª':>10}{'cached 2ª':>10}  formato")
+        for model, family in sorted(MODEL_FAMILIES.items()):
+            for agent in (EmailDrafter(client), PromptGenerator(client), NotesFormatter(client)):
+                for stream in (False, True):
+                    server.reset()
+                    collector.results.clear()
+                    for i in range(2):
+                        if stream:
+                            "".join(agent.client.send_message_stream(f"input {i}", model, agent.system_prompt, agent.name))
+                        else:
+                            agent.client.send_message(f"input {i}", model, agent.system_prompt, agent.name)
+
+                    problems = []
+                    for body in server.stats.bodies:
+                        problems += check_shape(family, body, agent.system_prompt)
+                    first, second = (r.usage.cached_tokens if r.usage else -1 for r in collector.results)
+                    expects_cache = family in ("openai", "anthropic")
+                    if first != 0 or (second > 0) != expects_cache:
+                        problems.append(f"cached_tokens inesperado: {first}, {second}")
+
+                    mode = "stream" if stream else "send"
+                    status = "ok" if not problems else "; ".join(sorted(set(problems)))
+                    print(f"{model:<24}{agent.name:<18}{mode:<8}{first:>10}{second:>10}  {status}")
+                    failures += [f"{model}/{agent.name}/{mode}: {p}" for p in problems]
+
+    for failure in failures:
+        print(f"FALHA {failure}")
+    print("OK" if not failures else f"{len(failures)} falhas")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
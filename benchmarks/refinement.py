@@ -0,0 +1,160 @@
+"""Sessões de refinamento: entrada por iteração contra gerações completas e conversa inteira.
+
+Roda uma sessão do EmailDrafter contra o servidor local (com latência de
+prefill proporcional aos tokens de entrada): uma descrição inicial e
+``--iterations`` instruções de ajuste ("mais curto", "tom mais formal").
+A cada iteração compara três estratégias:
+
+- refinamento (``AgentSession``): texto atual, instrução e contexto limitado;
+- geração completa: a descrição e todas as instruções até ali, do zero
+  (o que o usuário faria sem sessão), executada de verdade;
+- conversa inteira: reenviar o pedido, todas as respostas e instruções
+  anteriores e a nova instrução (histórico sem compactação), executada de verdade.
+
+O servidor local gera cada token com ``--token-delay-ms`` e processa a
+entrada com ``--prefill-ms-per-1k``, e responde aos refinamentos com um
+bloco de edição de ``--edit-tokens`` palavras, como um modelo que segue o
+formato de ``BaseAgent.refine_message_template``. O refinamento envia mais
+entrada que a geração completa (o texto atual), mas gera só as edições em
+vez do texto inteiro; a saída, mais cara e mais lenta, decide.
+
+Uso (na raiz do repositório):
+
+    python benchmarks/refinement.py --iterations 12
+
+Falha (exit 1) se a entrada dos refinamentos crescer mais de
+``--max-growth`` ao longo da sessão, se o contexto passar de
+``session_context_tokens`` ou se o refinamento não tiver custo estimado
+(preços de ``MODEL_PRICES``) e latência médios menores que os da geração
+completa e os da conversa inteira.
+"""
+import argparse
+import sys
+from pathlib import Path
+from typing import Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_server import FakeOpenRouterServer, FakeServerConfig  # noqa: E402
+from src.agents import AgentSession, EmailDrafter  # noqa: E402
+from src.agents.session import refinement_table  # noqa: E402
+from src.client import MessageStream, OpenRouterClient  # noqa: E402
+from src.config import AppConfig  # noqa: E402
+from src.router import estimate_cost  # noqa: E402
+from src.tokens import count_tokens  # noqa: E402
+
+LIMITS = dict(rate_limit_calls=100_000, rate_limit_window=1, retry_delay=0.01, retry_max_delay=0.02)
+DESCRIPTION = (
+    "E-mail para o cliente Acme informando que a entrega do projeto de migração do banco de dados "
+    "vai atrasar duas semanas por causa da revisão de segurança pedida pela equipe deles, com o novo "
+    "cronograma, os próximos passos e um pedido de reunião na próxima terça para alinhar o escopo"
+)
+INSTRUCTIONS = [
+    "mais curto",
+    "tom mais formal",
+    "mencione que não haverá custo adicional",
+    "tire o pedido de reunião",
+    "coloque o cronograma em tópicos",
+    "assine como Maria, gerente de projetos",
+    "deixe o assunto mais direto",
+    "acrescente um pedido de desculpas pelo atraso",
+    "troque 'duas semanas' por 'dez dias úteis'",
+    "cite o contrato 2024-117",
+    "remova os jargões técnicos",
+    "termine com uma frase de agradecimento",
+    "use 'vocês' em vez de 'a equipe de vocês'",
+    "inclua o telefone de contato (11) 4000-1234",
+    "reduza para no máximo três parágrafos",
+    "mantenha só o essencial",
+]
+
+
+def run(stream: MessageStream) -> Tuple[int, int, float]:
+    """(tokens de entrada, tokens de saída, latência) de uma chamada em streaming"""
+    for _ in stream:
+        pass
+    usage = stream.result.usage
+    return usage.prompt_tokens, usage.completion_tokens, stream.result.latency
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=12)
+    parser.add_argument("--tokens", type=int, default=200, help="tokens de cada resposta completa do servidor")
+    parser.add_argument("--edit-tokens", type=int, default=12, help="palavras trocadas por refinamento")
+    parser.add_argument("--token-delay-ms", type=float, default=10.0)
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=200.0)
+    parser.add_argument("--max-growth", type=float, default=0.15)
+    args = parser.parse_args()
+
+    instructions = [INSTRUCTIONS[i % len(INSTRUCTIONS)] for i in range(args.iterations)]
+    server_config = FakeServerConfig(
+        latency_ms=5, tokens=args.tokens, token_delay_ms=args.token_delay_ms,
+        prefill_ms_per_1k=args.prefill_ms_per_1k, edit_tokens=args.edit_tokens, seed=5
+    )
+    failures = []
+    with FakeOpenRouterServer(server_config) as server:
+        config = AppConfig(openrouter_base_url=server.base_url, **LIMITS)
+        client = OpenRouterClient("sk-or-bench", config=config)
+        agent = EmailDrafter(client)
+        client.send_message("aquecimento")  # importa o SDK e abre a conexão fora da medição
+
+        session = AgentSession.from_config(agent, config)
+        session.send(DESCRIPTION)
+        conversation = [DESCRIPTION, session.last_output]
+        rows = []
+        for i, instruction in enumerate(instructions, 1):
+            context_tokens = count_tokens(session.context(client.model), client.model)
+            session.send(instruction)
+            refine = session.turns[-1]
+            regenerate = run(agent.run_stream("\n".join([DESCRIPTION, *instructions[:i]])))
+            history = run(
+                client.send_message_stream("\n\n".join([*conversation, instruction]), None, agent.system_prompt)
+            )
+            conversation += [instruction, refine.output]
+            rows.append((
+                i, context_tokens, (refine.prompt_tokens, refine.completion_tokens, refine.latency), regenerate, history
+            ))
+
+    names = ("refinamento", "geração completa", "conversa inteira")
+    print(f"{'iteração':>8}{'contexto':>10}" + "".join(f"{name:>26}" for name in names))
+    for i, context_tokens, *strategies in rows:
+        print(f"{i:>8}{context_tokens:>10}" + "".join(
+            f"{prompt:>10} +{completion:>5}{latency * 1000:>8.0f}ms" for prompt, completion, latency in strategies
+        ))
+    print(f"\n{refinement_table(session.metrics())}")
+
+    model = client.model
+    means = []
+    for column in (2, 3, 4):
+        prompt, completion, latency = (sum(row[column][k] for row in rows) / len(rows) for k in range(3))
+        means.append((prompt, completion, latency, estimate_cost(model, prompt, completion)))
+    print(f"\nmédias por iteração ({model}):")
+    for name, (prompt, completion, latency, cost) in zip(names, means):
+        print(
+            f"  {name:<18}{prompt:>6.0f} + {completion:>4.0f} tokens  {latency * 1000:>6.0f} ms  "
+            f"US$ {cost * 1000:.4f} por mil"
+        )
+
+    refine = means[0]
+    for name, other in zip(names[1:], means[1:]):
+        if refine[3] >= other[3]:
+            failures.append(f"refinamento com custo estimado maior ou igual ao da {name}")
+        if refine[2] >= other[2]:
+            failures.append(f"refinamento com latência maior ou igual à da {name}")
+
+    growth = rows[-1][2][0] / rows[0][2][0] - 1
+    if growth > args.max_growth:
+        failures.append(f"entrada do refinamento cresceu {growth:.0%} (máximo {args.max_growth:.0%})")
+    largest_context = max(row[1] for row in rows)
+    if largest_context > config.session_context_tokens:
+        failures.append(f"contexto com {largest_context} tokens (máximo {config.session_context_tokens})")
+
+    for failure in failures:
+        print(f"FALHA {failure}")
+    print("OK" if not failures else f"{len(failures)} falhas")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""Convergência e custo do roteamento do modelo auto.
+
+O servidor local responde cada modelo com uma latência diferente. Para cada
+objetivo (menor p95 sob um teto de custo; mais barato dentro de um SLO de
+latência), um cliente com ``model="auto"`` envia requisições a partir de um
+histórico vazio e o roteador precisa convergir para o modelo esperado. Mede
+também o custo de ``choose()`` por requisição e se o histórico persistido em
+disco é recarregado por um novo roteador.
+
+Uso (na raiz do repositório):
+
+    python benchmarks/router.py --requests 300 --threads 8
+
+Falha (exit 1) se o roteador não escolher o modelo esperado, se ele não
+responder pela maioria das requisições finais ou se ``choose()`` custar mais
+que ``--max-choose-us`` microssegundos.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_server import FakeOpenRouterServer, FakeServerConfig  # noqa: E402
+from src.client import OpenRouterClient  # noqa: E402
+from src.config import AUTO_MODEL, AppConfig  # noqa: E402
+from src.router import ModelHistory, ModelRouter, RoutingObjective, routing_table  # noqa: E402
+
+MODEL_LATENCY_MS = {
+    "gpt-4o-mini": 120,
+    "gpt-4o": 35,
+    "claude-3-haiku": 45,
+    "claude-3-sonnet": 80,
+    "claude-3-opus": 200,
+    "llama-3.1-8b-instruct": 150,
+    "llama-3.1-70b-instruct": 70,
+}
+
+# (nome, objetivo, modelo esperado)
+SCENARIOS = [
+    # gpt-4o é o mais rápido, mas custa acima do teto; claude-3-haiku é o mais rápido abaixo dele
+    ("p95 com teto de custo", RoutingObjective("latency", max_cost=1e-4), "claude-3-haiku"),
+    # llama-3.1-8b é o mais barato, mas estoura o SLO de 100 ms
+    ("custo com SLO de 100ms", RoutingObjective("cost", latency_slo=0.1), "llama-3.1-70b-instruct"),
+]
+
+
+def run_scenario(server: FakeOpenRouterServer, args: argparse.Namespace, objective: RoutingObjective,
+                 directory: Path) -> ModelRouter:
+    config = AppConfig(openrouter_base_url=server.base_url, rate_limit_calls=100_000, rate_limit_window=1)
+    client = OpenRouterClient("sk-or-bench", model=AUTO_MODEL, config=config)
+    router = ModelRouter(
+        objective=objective,
+        history=ModelHistory(directory, size=args.history_size),
+        exploration=args.exploration,
+        refresh_interval=0.2,
+        seed=1,
+    )
+    client.use_router(router)
+    with ThreadPoolExecutor(args.threads) as pool:
+        list(pool.map(lambda i: client.send_message(f"requisição {i}"), range(args.requests)))
+    router.close()
+    return router
+
+
+def recent_share(router: ModelRouter, expected: str, requests: int) -> float:
+    """Fração das últimas escolhas (sem exploração) que foram para ``expected``"""
+    chosen: List[str] = []
+    for _ in range(requests):
+        chosen.append(router.choose("requisição"))
+    return chosen.count(expected) / len(chosen)
+
+
+def choose_cost_us(router: ModelRouter, calls: int = 20_000) -> float:
+    message = "x" * 2000
+    started = time.perf_counter()
+    for _ in range(calls):
+        router.choose(message, "system")
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--exploration", type=float, default=0.2)
+    parser.add_argument("--history-size", type=int, default=256)
+    parser.add_argument("--min-share", type=float, default=0.7)
+    parser.add_argument("--max-choose-us", type=float, default=50.0)
+    args = parser.parse_args()
+
+    failures = []
+    server_config = FakeServerConfig(latency="uniform", latency_spread=0.2, model_latency_ms=MODEL_LATENCY_MS, tokens=20)
+    with FakeOpenRouterServer(server_config) as server:
+        for name, objective, expected in SCENARIOS:
+            with tempfile.TemporaryDirectory() as tmp:
+                directory = Path(tmp)
+                router = run_scenario(server, args, objective, directory)
+                print(f"\n=== {name} (esperado: {expected}) ===")
+                print(routing_table(router.report()))
+
+                router.exploration = 0.0
+                router.decisions.clear()
+                best = router.choose("requisição")
+                share = recent_share(router, expected, 200)
+                router.exploration = args.exploration
+                cost = choose_cost_us(router)
+                reloaded = ModelRouter(objective=objective, history=ModelHistory(directory), exploration=0.0)
+                print(f"escolha final: {best}; choose(): {cost:.1f} µs; recarregado do disco: {reloaded.choose('x')}")
+
+                if best != expected:
+                    failures.append(f"{name}: escolheu {best}, esperado {expected}")
+                if share < args.min_share:
+                    failures.append(f"{name}: {share:.0%} das escolhas em {expected}")
+                if cost > args.max_choose_us:
+                    failures.append(f"{name}: choose() custou {cost:.1f} µs (máximo {args.max_choose_us})")
+                if reloaded.choose("x") != expected:
+                    failures.append(f"{name}: histórico recarregado do disco escolheu {reloaded.choose('x')}")
+
+    for failure in failures:
+        print(f"FALHA {failure}")
+    print("OK" if not failures else f"{len(failures)} falhas")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
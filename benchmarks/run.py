@@ -0,0 +1,279 @@
+"""Suíte de benchmarks offline do cliente, agentes e CLI.
+
+Sobe um FakeOpenRouterServer local, executa os cenários e compara com um
+baseline salvo:
+
+    python -m benchmarks.run                    # executa e compara com o baseline
+    python -m benchmarks.run --save-baseline    # grava os resultados como baseline
+    python -m benchmarks.run --scenario throughput --requests 1000
+
+Sai com código 1 se alguma métrica piorar além de ``--tolerance``.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.fake_server import FakeOpenRouterServer, FakeServerConfig
+from src.agents import EmailDrafter, NotesFormatter, PromptGenerator
+from src.client import OpenRouterClient
+from src.config import AppConfig
+from src.hedging import HedgedClient, HedgePolicy
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+# Métricas em que um valor maior é melhor; as demais são latências/contagens
+HIGHER_IS_BETTER = {"rps"}
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    calls: int = 0
+    errors: int = 0
+    server_requests: int = 0
+    elapsed: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+    extra: Dict[str, float] = field(default_factory=dict)
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def metrics(self) -> Dict[str, float]:
+        metrics = {
+            "rps": self.calls / self.elapsed if self.elapsed else 0.0,
+            "p50_ms": self.percentile(50) * 1000,
+            "p95_ms": self.percentile(95) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "mean_ms": statistics.fmean(self.latencies) * 1000 if self.latencies else 0.0,
+            "retries": max(0, self.server_requests - self.calls),
+            "errors": self.errors,
+        }
+        metrics.update(self.extra)
+        return metrics
+
+
+def make_client(server: FakeOpenRouterServer, timeout: int = 30, **config_overrides) -> OpenRouterClient:
+    config = AppConfig(
+        openrouter_base_url=server.base_url,
+        rate_limit_calls=1_000_000,
+        rate_limit_window=1,
+        retry_delay=0.01,
+        retry_max_delay=0.2,
+        **config_overrides,
+    )
+    return OpenRouterClient("sk-or-benchmark", timeout=timeout, config=config)
+
+
+def drive(
+    name: str,
+    server: FakeOpenRouterServer,
+    call: Callable[[int], None],
+    requests: int,
+    concurrency: int
+) -> ScenarioResult:
+    """Executa ``call(i)`` ``requests`` vezes com ``concurrency`` threads"""
+    result = ScenarioResult(name)
+    lock = threading.Lock()
+
+    def timed(i: int) -> None:
+        start = time.perf_counter()
+        failed = False
+        try:
+            call(i)
+        except Exception:
+            failed = True
+        latency = time.perf_counter() - start
+        with lock:
+            result.errors += failed
+            result.latencies.append(latency)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, range(requests)))
+    result.elapsed = time.perf_counter() - start
+    result.calls = requests
+    result.server_requests = server.stats.requests
+    return result
+
+
+def scenario_overhead(server: FakeOpenRouterServer, requests: int) -> ScenarioResult:
+    """Latência 0 no servidor: o tempo medido é o custo do cliente + loopback"""
+    server.reset(FakeServerConfig(seed=1))
+    client = make_client(server)
+    client.send_message("aquecimento")
+    server.reset()
+    return drive("overhead", server, lambda i: client.send_message(f"mensagem {i}"), requests, 1)
+
+
+def scenario_throughput(server: FakeOpenRouterServer, requests: int) -> ScenarioResult:
+    server.reset(FakeServerConfig(latency="lognormal", latency_ms=50, latency_spread=0.5, seed=2))
+    client = make_client(server)
+    return drive("throughput", server, lambda i: client.send_message(f"mensagem {i}"), requests, 16)
+
+
+def scenario_faults(server: FakeOpenRouterServer, requests: int) -> ScenarioResult:
+    server.reset(FakeServerConfig(
+        latency="lognormal", latency_ms=30, error_429=0.1, error_5xx=0.05,
+        timeout_rate=0.01, timeout_s=2.0, seed=3,
+    ))
+    # Breaker desativado na prática: aqui queremos medir o custo dos retries
+    client = make_client(server, timeout=1, circuit_failure_threshold=1_000_000, max_retries=4)
+    return drive("faults", server, lambda i: client.send_message(f"mensagem {i}"), requests, 8)
+
+
+def scenario_streaming(server: FakeOpenRouterServer, requests: int) -> ScenarioResult:
+    server.reset(FakeServerConfig(latency_ms=20, tokens=50, token_delay_ms=1, seed=4))
+    client = make_client(server)
+    ttft: List[float] = []
+
+    def call(i: int) -> None:
+        stream = client.send_message_stream(f"mensagem {i}")
+        for _ in stream:
+            pass
+        ttft.append(stream.time_to_first_token or 0.0)
+
+    result = drive("streaming", server, call, requests, 8)
+    result.extra["ttft_p50_ms"] = statistics.median(ttft) * 1000 if ttft else 0.0
+    return result
+
+
+def scenario_agents(server: FakeOpenRouterServer, requests: int) -> ScenarioResult:
+    server.reset(FakeServerConfig(latency="uniform", latency_ms=20, seed=5))
+    client = make_client(server)
+    calls = [
+        EmailDrafter(client).draft,
+        PromptGenerator(client).generate,
+        NotesFormatter(client).format,
+    ]
+    return drive("agents", server, lambda i: calls[i % 3](f"input {i}"), requests, 8)
+
+
+def scenario_hedging(server: FakeOpenRouterServer, requests: int) -> ScenarioResult:
+    """Cauda longa no modelo principal, com hedge em um fallback de mesma latência típica"""
+    server.reset(FakeServerConfig(
+        latency="lognormal", latency_spread=1.0, seed=7,
+        model_latency_ms={"gpt-4o-mini": 40, "claude-3-haiku": 40},
+    ))
+    inner = make_client(server)
+    inner.send_message("aquecimento")
+    server.reset()
+    client = HedgedClient(
+        inner,
+        default=HedgePolicy(fallbacks=["claude-3-haiku"], percentile=0.9, initial_delay=0.2),
+    )
+    result = drive("hedging", server, lambda i: client.send_message(f"mensagem {i}"), requests, 8)
+    result.extra["hedged_pct"] = client.stats.hedged / max(1, client.stats.requests) * 100
+    client.close()
+    return result
+
+
+def scenario_cli(server: FakeOpenRouterServer, requests: int) -> ScenarioResult:
+    """Custo de ponta a ponta de um comando one-shot em processo novo"""
+    server.reset(FakeServerConfig(seed=6))
+    runs = max(1, min(requests, 10))
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ, HOME=home, OPENROUTER_BASE_URL=server.base_url)
+
+        def call(i: int) -> None:
+            completed = subprocess.run(
+                [sys.executable, "-m", "src.cli", "email", f"reunião {i}",
+                 "--api-key", "sk-or-benchmark", "--no-cache"],
+                cwd=ROOT, env=env, capture_output=True,
+            )
+            if completed.returncode != 0:
+                raise RuntimeError(completed.stderr.decode("utf-8", "replace"))
+
+        return drive("cli", server, call, runs, 1)
+
+
+SCENARIOS: Dict[str, Callable[[FakeOpenRouterServer, int], ScenarioResult]] = {
+    "overhead": scenario_overhead,
+    "throughput": scenario_throughput,
+    "faults": scenario_faults,
+    "streaming": scenario_streaming,
+    "agents": scenario_agents,
+    "hedging": scenario_hedging,
+    "cli": scenario_cli,
+}
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float
+) -> List[str]:
+    """Lista as métricas que pioraram mais que ``tolerance`` em relação ao baseline"""
+    regressions = []
+    for scenario, metrics in results.items():
+        for metric, value in metrics.items():
+            reference = baseline.get(scenario, {}).get(metric)
+            if not reference or metric in ("errors", "retries"):
+                continue
+            change = (value - reference) / reference
+            if metric in HIGHER_IS_BETTER:
+                change = -change
+            if change > tolerance:
+                regressions.append(
+                    f"{scenario}.{metric}: {value:.2f} vs baseline {reference:.2f} ({change:+.0%})"
+                )
+    return regressions
+
+
+def print_table(results: Dict[str, Dict[str, float]]) -> None:
+    columns = ["rps", "p50_ms", "p95_ms", "p99_ms", "retries", "errors"]
+    print(f"{'cenário':<12}" + "".join(f"{c:>10}" for c in columns) + "  extra")
+    for scenario, metrics in results.items():
+        extra = ", ".join(f"{k}={v:.1f}" for k, v in metrics.items() if k not in columns and k != "mean_ms")
+        print(f"{scenario:<12}" + "".join(f"{metrics[c]:>10.1f}" for c in columns) + f"  {extra}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks offline com servidor OpenRouter fake")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Cenário (repetível)")
+    parser.add_argument("--requests", type=int, default=200, help="Requisições por cenário")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Grava os resultados como novo baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Piora máxima aceita (fração)")
+    parser.add_argument("--output", type=Path, help="Grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    results: Dict[str, Dict[str, float]] = {}
+    with FakeOpenRouterServer() as server:
+        for name in args.scenario or list(SCENARIOS):
+            results[name] = SCENARIOS[name](server, args.requests).metrics()
+
+    print_table(results)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2))
+        print(f"Baseline salvo em {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print("Sem baseline para comparar (use --save-baseline)")
+        return 0
+
+    regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+    for line in regressions:
+        print(f"REGRESSÃO {line}")
+    print("OK" if not regressions else f"{len(regressions)} regressões")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,27 @@
-from .email_drafter import EmailDrafter
-from .prompt_generator import PromptGenerator
-from .notes_formatter import NotesFormatter
+from typing import TYPE_CHECKING
 
-__all__ = ["EmailDrafter", "PromptGenerator", "NotesFormatter"]
+__all__ = ["BaseAgent", "EmailDrafter", "PromptGenerator", "NotesFormatter", "AgentSession"]
 
+_MODULES = {
+    "BaseAgent": ".base",
+    "EmailDrafter": ".email_drafter",
+    "PromptGenerator": ".prompt_generator",
+    "NotesFormatter": ".notes_formatter",
+    "AgentSession": ".session",
+}
+
+if TYPE_CHECKING:
+    from .base import BaseAgent
+    from .email_drafter import EmailDrafter
+    from .prompt_generator import PromptGenerator
+    from .notes_formatter import NotesFormatter
+    from .session import AgentSession
+
+
+def __getattr__(name: str):
+    # Importa cada agente apenas quando é usado
+    if name in _MODULES:
+        import importlib
+
+        return getattr(importlib.import_module(_MODULES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
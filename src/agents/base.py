@@ -0,0 +1,279 @@
+import re
+import time
+from dataclasses import replace
+from typing import TYPE_CHECKING, Iterator, List, Optional, Union
+
+from ..client import AsyncOpenRouterClient, MessageStream, OpenRouterClient
+from ..config import MAX_INPUT_LENGTH
+from ..instrumentation import CompletionResult, TokenUsage
+
+if TYPE_CHECKING:
+    from ..history import HistoryStore
+    from ..near_duplicates import NearDuplicateIndex, NearDuplicateMatch
+
+# Bloco de edição do refinamento: trecho exato do texto atual e o que entra no lugar
+_EDIT = re.compile(r"<{7} TROCAR\n(.*?)\n={7}\n(.*?)\n?>{7} FIM", re.DOTALL)
+
+
+def apply_edits(previous: str, response: str) -> Optional[str]:
+    """Aplica a ``previous`` os blocos de edição de ``response``.
+
+    Sem blocos, ``response`` é o texto revisado completo. Retorna None se um
+    trecho a trocar não existir no texto.
+    """
+    edits = _EDIT.findall(response)
+    if not edits:
+        return response.strip()
+    text = previous
+    for old, new in edits:
+        if not old or old not in text:
+            return None
+        text = text.replace(old, new, 1)
+    return text
+
+
+def _merge_results(first: CompletionResult, second: CompletionResult) -> CompletionResult:
+    """Resultado de duas chamadas seguidas: texto da segunda, tempos e tokens somados"""
+    usages = [r.usage for r in (first, second) if r.usage is not None]
+    usage = TokenUsage(
+        prompt_tokens=sum(u.prompt_tokens for u in usages),
+        completion_tokens=sum(u.completion_tokens for u in usages),
+        total_tokens=sum(u.total_tokens for u in usages),
+        cached_tokens=sum(u.cached_tokens for u in usages),
+        cache_write_tokens=sum(u.cache_write_tokens for u in usages),
+    ) if usages else None
+    return replace(
+        second,
+        latency=first.latency + second.latency,
+        attempts=first.attempts + second.attempts,
+        rate_limit_wait=first.rate_limit_wait + second.rate_limit_wait,
+        usage=usage,
+    )
+
+
+class BaseAgent:
+    """Base dos agentes: guarda o cliente e monta a mensagem do usuário.
+
+    Com ``near_duplicates``, inputs quase idênticos a um já respondido
+    reutilizam a resposta anterior (``similar_mode="reuse"``) ou apenas ficam
+    disponíveis via ``find_similar`` para serem exibidos como rascunho
+    (``similar_mode="draft"``). Com ``history``, cada geração (input, saída,
+    modelo, latência e tokens) é registrada no histórico local.
+    """
+
+    system_prompt: str = ""
+    user_message_template: str = "{input}"
+    # Refinamento: o modelo devolve só os trechos alterados, aplicados localmente
+    # ao texto anterior; gerar só as edições é bem mais curto que reescrever tudo
+    refine_message_template: str = (
+        "Revise o texto atual conforme a nova instrução, mantendo o restante. "
+        "Responda apenas com as alterações, uma por bloco, neste formato:\n"
+        "<<<<<<< TROCAR\n<trecho exato do texto atual>\n=======\n<novo trecho>\n>>>>>>> FIM\n"
+        "Para acrescentar algo, troque um trecho vizinho por ele mesmo mais o acréscimo. "
+        "Se a instrução mudar quase todo o texto, responda apenas com o texto revisado completo.\n\n"
+        "{context}Texto atual:\n{previous}\n\nNova instrução: {instruction}"
+    )
+    # Reescrita completa, quando alguma edição não casa com o texto atual
+    rewrite_message_template: str = (
+        "Revise o texto atual conforme a nova instrução, mantendo o restante. "
+        "Responda apenas com o texto revisado completo.\n\n"
+        "{context}Texto atual:\n{previous}\n\nNova instrução: {instruction}"
+    )
+    # Orçamentos em tokens: entrada aceita (validada na CLI) e max_tokens da resposta
+    max_input_tokens: Optional[int] = None
+    max_output_tokens: Optional[int] = None
+
+    def __init__(
+        self,
+        client: Union[OpenRouterClient, AsyncOpenRouterClient],
+        near_duplicates: Optional["NearDuplicateIndex"] = None,
+        similar_mode: str = "reuse",
+        history: Optional["HistoryStore"] = None
+    ):
+        if similar_mode not in ("reuse", "draft"):
+            raise ValueError(f"Modo inválido para inputs semelhantes: {similar_mode}")
+        self.client = client
+        self.near_duplicates = near_duplicates
+        self.similar_mode = similar_mode
+        self.history = history
+
+    @property
+    def name(self) -> str:
+        """Nome do agente nas métricas de instrumentação"""
+        return type(self).__name__
+
+    def _build_message(self, text: str) -> str:
+        return self.user_message_template.format(input=text)
+
+    def build_refine_message(self, previous: str, instruction: str, context: str = "") -> str:
+        """Mensagem de refinamento; ``context`` resume o pedido original e as instruções anteriores."""
+        return self.refine_message_template.format(
+            context=f"{context}\n\n" if context else "", previous=previous, instruction=instruction
+        )
+
+    def build_rewrite_message(self, previous: str, instruction: str, context: str = "") -> str:
+        return self.rewrite_message_template.format(
+            context=f"{context}\n\n" if context else "", previous=previous, instruction=instruction
+        )
+
+    def _scope(self, model: Optional[str]) -> str:
+        return f"{self.name}:{model or self.client.model}"
+
+    def find_similar(self, text: str, model: Optional[str] = None) -> Optional["NearDuplicateMatch"]:
+        """Resposta anterior para um input quase idêntico, se houver índice configurado."""
+        # Notas longas seguem pelo map-reduce, fora do índice
+        if self.near_duplicates is None or len(text) > MAX_INPUT_LENGTH:
+            return None
+        return self.near_duplicates.lookup(self._scope(model), text)
+
+    def _reusable(self, text: str, model: Optional[str]) -> Optional[str]:
+        if self.similar_mode != "reuse":
+            return None
+        match = self.find_similar(text, model)
+        return match.response if match else None
+
+    def _remember(self, text: str, model: Optional[str], response: str) -> None:
+        if self.near_duplicates is not None and response:
+            self.near_duplicates.add(self._scope(model), text, response)
+
+    def _record(
+        self,
+        text: str,
+        model: Optional[str],
+        output: str,
+        started: float,
+        result: Optional[CompletionResult] = None,
+        reused: bool = False
+    ) -> None:
+        """Registra a geração no histórico (só enfileira; a gravação é em segundo plano)"""
+        if self.history is None:
+            return
+        usage = result.usage if result is not None else None
+        self.history.record(
+            self.name,
+            result.model if result is not None else model or self.client.model,
+            text,
+            output,
+            result.latency if result is not None else time.perf_counter() - started,
+            usage.prompt_tokens if usage else None,
+            usage.completion_tokens if usage else None,
+            cached=result.cached if result is not None else reused,
+        )
+
+    def _record_stream(
+        self, text: str, model: Optional[str], stream: MessageStream, started: float, reused: bool = False
+    ) -> MessageStream:
+        if self.history is not None:
+            stream.add_done_callback(lambda s: self._record(text, model, s.text, started, s.result, reused))
+        return stream
+
+    def run(self, text: str, model: Optional[str] = None) -> str:
+        """Executa a tarefa principal do agente (interface comum para fan-out e pipelines)."""
+        return self._send(text, model)
+
+    def run_stream(self, text: str, model: Optional[str] = None) -> MessageStream:
+        """Como run, mas em streaming."""
+        return self._stream(text, model)
+
+    def _send(self, text: str, model: Optional[str] = None) -> str:
+        started = time.perf_counter()
+        reused = self._reusable(text, model)
+        if reused is not None:
+            self._record(text, model, reused, started, reused=True)
+            return reused
+        result = self.client.send_message_result(
+            self._build_message(text), model, self.system_prompt, self.name, self.max_output_tokens
+        )
+        self._remember(text, model, result.text)
+        self._record(text, model, result.text, started, result)
+        return result.text
+
+    def _stream(self, text: str, model: Optional[str] = None) -> MessageStream:
+        started = time.perf_counter()
+        reused = self._reusable(text, model)
+        if reused is not None:
+            return self._record_stream(text, model, MessageStream(iter([reused]), started), started, reused=True)
+        stream = self.client.send_message_stream(
+            self._build_message(text), model, self.system_prompt, self.name, self.max_output_tokens
+        )
+        stream.add_done_callback(lambda s: self._remember(text, model, s.text))
+        return self._record_stream(text, model, stream, started)
+
+    async def _asend(self, text: str, model: Optional[str] = None) -> str:
+        if not isinstance(self.client, AsyncOpenRouterClient):
+            raise TypeError("Métodos assíncronos exigem um AsyncOpenRouterClient")
+        started = time.perf_counter()
+        reused = self._reusable(text, model)
+        if reused is not None:
+            self._record(text, model, reused, started, reused=True)
+            return reused
+        result = await self.client.send_message_result(
+            self._build_message(text), model, self.system_prompt, self.name, self.max_output_tokens
+        )
+        self._remember(text, model, result.text)
+        self._record(text, model, result.text, started, result)
+        return result.text
+
+    def _refine_result(
+        self, previous: str, instruction: str, context: str, model: Optional[str]
+    ) -> CompletionResult:
+        result = self.client.send_message_result(
+            self.build_refine_message(previous, instruction, context), model, self.system_prompt, self.name,
+            self.max_output_tokens
+        )
+        revised = apply_edits(previous, result.text)
+        if revised is not None:
+            return replace(result, text=revised)
+        rewrite = self.client.send_message_result(
+            self.build_rewrite_message(previous, instruction, context), model, self.system_prompt, self.name,
+            self.max_output_tokens
+        )
+        return _merge_results(result, rewrite)
+
+    def refine(self, previous: str, instruction: str, context: str = "", model: Optional[str] = None) -> str:
+        """Revisa ``previous`` conforme ``instruction`` (ex.: "mais curto"), sem gerar do zero.
+
+        O modelo responde só com as edições; se alguma não casar com o texto,
+        uma segunda chamada pede o texto revisado completo.
+        """
+        started = time.perf_counter()
+        result = self._refine_result(previous, instruction, context, model)
+        self._record(instruction, model, result.text, started, result)
+        return result.text
+
+    def refine_stream(
+        self, previous: str, instruction: str, context: str = "", model: Optional[str] = None
+    ) -> MessageStream:
+        """Como refine, com a interface de streaming: o texto revisado chega de uma vez, já com as edições."""
+        started = time.perf_counter()
+        results: List[CompletionResult] = []
+
+        def deltas() -> Iterator[str]:
+            results.append(self._refine_result(previous, instruction, context, model))
+            yield results[0].text
+
+        stream = MessageStream(deltas(), started, on_complete=lambda s: results[0])
+        return self._record_stream(instruction, model, stream, started)
+
+    async def arefine(
+        self, previous: str, instruction: str, context: str = "", model: Optional[str] = None
+    ) -> str:
+        """Versão assíncrona de refine; requer um AsyncOpenRouterClient."""
+        if not isinstance(self.client, AsyncOpenRouterClient):
+            raise TypeError("Métodos assíncronos exigem um AsyncOpenRouterClient")
+        started = time.perf_counter()
+        result = await self.client.send_message_result(
+            self.build_refine_message(previous, instruction, context), model, self.system_prompt, self.name,
+            self.max_output_tokens
+        )
+        revised = apply_edits(previous, result.text)
+        if revised is not None:
+            result = replace(result, text=revised)
+        else:
+            rewrite = await self.client.send_message_result(
+                self.build_rewrite_message(previous, instruction, context), model, self.system_prompt, self.name,
+                self.max_output_tokens
+            )
+            result = _merge_results(result, rewrite)
+        self._record(instruction, model, result.text, started, result)
+        return result.text
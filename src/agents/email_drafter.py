@@ -1,21 +1,30 @@
 from typing import Optional
-from ..client import OpenRouterClient
 
+from ..client import MessageStream
+from .base import BaseAgent
 
-class EmailDrafter:
+
+class EmailDrafter(BaseAgent):
     """Agente especializado em criação de emails profissionais"""
-    
-    def __init__(self, client: OpenRouterClient):
-        self.client = client
-        self.system_prompt = """Você é um assistente especializado em emails profissionais.
+
+    system_prompt = """Você é um assistente especializado em emails profissionais.
 
 VALIDAÇÃO OBRIGATÓRIA: Verifique se o conteúdo é apropriado para email profissional. REJEITE receitas, piadas, memes ou qualquer assunto não profissional. Se não for apropriado, responda APENAS: "O conteúdo descrito não é apropriado para um email profissional. Por favor, forneça um assunto relacionado a trabalho, negócios ou contexto profissional."
 
 Para emails válidos: use tom profissional, estruture com saudação/corpo/fechamento, seja claro e objetivo."""
 
+    user_message_template = "Crie um email profissional baseado na descrição:\n\n{input}"
+    max_input_tokens = 3000
+    max_output_tokens = 1024
+
     def draft(self, description: str, model: Optional[str] = None) -> str:
         """Cria um email profissional baseado na descrição fornecida."""
-        user_message = f"Crie um email profissional baseado na descrição:\n\n{description}"
-        
-        return self.client.send_message(user_message, model, self.system_prompt)
+        return self._send(description, model)
+
+    def draft_stream(self, description: str, model: Optional[str] = None) -> MessageStream:
+        """Como draft, mas retorna o email em streaming."""
+        return self._stream(description, model)
 
+    async def adraft(self, description: str, model: Optional[str] = None) -> str:
+        """Versão assíncrona de draft; requer um AsyncOpenRouterClient."""
+        return await self._asend(description, model)
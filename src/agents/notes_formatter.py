@@ -1,21 +1,189 @@
-from typing import Optional
-from ..client import OpenRouterClient
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 
+from ..chunking import split_into_chunks
+from ..client import MessageStream
+from ..config import (
+    NOTES_CHUNK_OVERLAP,
+    NOTES_CHUNK_SIZE,
+    NOTES_MAX_PARALLEL_CHUNKS,
+    NOTES_REDUCE_MAX_LENGTH,
+)
+from ..profiler import carry_context
+from ..tokens import count_tokens
+from .base import BaseAgent
 
-class NotesFormatter:
-    """Agente especializado em formatação de notas de reunião"""
-    
-    def __init__(self, client: OpenRouterClient):
-        self.client = client
-        self.system_prompt = """Você é um especialista em organização e formatação de notas de reunião.
+
+class NotesFormatter(BaseAgent):
+    """Agente especializado em formatação de notas de reunião.
+
+    Notas com mais de ``single_call_max_tokens`` tokens são processadas em
+    map-reduce: os trechos são formatados em paralelo e uma chamada final os
+    combina.
+    """
+
+    system_prompt = """Você é um especialista em organização e formatação de notas de reunião.
 
 VALIDAÇÃO OBRIGATÓRIA: Verifique se o conteúdo são realmente notas de reunião/trabalho. REJEITE receitas, piadas, memes, textos criativos ou qualquer conteúdo que não seja notas de reunião/profissional. Se não for apropriado, responda APENAS: "O conteúdo fornecido não parece ser notas de reunião. Por favor, forneça notas de reunião ou conteúdo profissional para formatação."
 
 Para notas válidas: identifique ações/decisões/tópicos, organize logicamente, crie itens de ação claros, use formatação clara."""
 
+    user_message_template = "Organize as seguintes notas de reunião:\n\n{input}"
+    # A transcrição inteira pode ser longa (map-reduce); cada chamada não
+    max_input_tokens = 300_000
+    max_output_tokens = 4096
+    single_call_max_tokens = 3000
+
+    chunk_message_template = (
+        "Organize o seguinte trecho (parte {index} de {total}) de uma transcrição longa de reunião. "
+        "Liste apenas os tópicos, decisões e ações presentes neste trecho:\n\n{input}"
+    )
+
+    reduce_system_prompt = """Você é um especialista em organização e formatação de notas de reunião.
+
+Você receberá notas parciais já formatadas, extraídas de trechos consecutivos de uma mesma reunião. Os trechos se sobrepõem, então o mesmo item pode aparecer em mais de uma parte.
+
+Combine tudo em um único documento: una tópicos, decisões e itens de ação, remova duplicatas, preserve responsáveis e prazos, e mantenha a mesma formatação clara das notas parciais."""
+
+    reduce_message_template = "Combine as seguintes notas parciais em um único documento:\n\n{input}"
+
+    def needs_chunking(self, notes: str, model: Optional[str] = None) -> bool:
+        """Se as notas passam do orçamento de uma única chamada."""
+        if len(notes.encode("utf-8")) <= self.single_call_max_tokens:
+            return False
+        return count_tokens(notes, model or self.client.model) > self.single_call_max_tokens
+
     def format(self, notes: str, model: Optional[str] = None) -> str:
         """Formata notas de reunião desorganizadas em estrutura clara."""
-        user_message = f"Organize as seguintes notas de reunião:\n\n{notes}"
-        
-        return self.client.send_message(user_message, model, self.system_prompt)
+        if self.needs_chunking(notes, model):
+            started = time.perf_counter()
+            formatted = self.format_chunked(notes, model)
+            self._record(notes, model, formatted, started)
+            return formatted
+        return self._send(notes, model)
+
+    def format_stream(self, notes: str, model: Optional[str] = None) -> MessageStream:
+        """Como format, mas retorna as notas formatadas em streaming."""
+        if self.needs_chunking(notes, model):
+            started = time.perf_counter()
+            partials = self._reduce_until_fits(self._map_chunks(notes, model), model)
+            if len(partials) == 1:
+                stream = MessageStream(iter(partials), time.perf_counter())
+            else:
+                stream = self.client.send_message_stream(
+                    self._build_reduce_message(partials), model, self.reduce_system_prompt, self.name,
+                    self.max_output_tokens
+                )
+            # Latência de todo o map-reduce, não só da chamada final
+            stream.add_done_callback(lambda s: self._record(notes, model, s.text, started))
+            return stream
+        return self._stream(notes, model)
+
+    async def aformat(self, notes: str, model: Optional[str] = None) -> str:
+        """Versão assíncrona de format; requer um AsyncOpenRouterClient."""
+        if self.needs_chunking(notes, model):
+            started = time.perf_counter()
+            formatted = await self.aformat_chunked(notes, model)
+            self._record(notes, model, formatted, started)
+            return formatted
+        return await self._asend(notes, model)
+
+    def run(self, notes: str, model: Optional[str] = None) -> str:
+        return self.format(notes, model)
+
+    def run_stream(self, notes: str, model: Optional[str] = None) -> MessageStream:
+        return self.format_stream(notes, model)
+
+    def format_chunked(self, notes: str, model: Optional[str] = None) -> str:
+        """Formata notas longas: trechos em paralelo e uma chamada final de combinação."""
+        partials = self._reduce_until_fits(self._map_chunks(notes, model), model)
+        if len(partials) == 1:
+            return partials[0]
+        return self._reduce(partials, model)
+
+    async def aformat_chunked(self, notes: str, model: Optional[str] = None) -> str:
+        """Versão assíncrona de format_chunked."""
+        import asyncio
+
+        chunks = self._split(notes)
+        semaphore = asyncio.Semaphore(NOTES_MAX_PARALLEL_CHUNKS)
+
+        async def send(message: str, system_prompt: str) -> str:
+            async with semaphore:
+                return await self.client.send_message(
+                    message, model, system_prompt, self.name, self.max_output_tokens
+                )
+
+        partials = await asyncio.gather(*(
+            send(self._build_chunk_message(chunk, i, len(chunks)), self.system_prompt)
+            for i, chunk in enumerate(chunks, start=1)
+        ))
+        while len(partials) > 1:
+            groups = self._group_partials(partials)
+            if len(groups) == len(partials):
+                groups = [partials]
+            partials = await asyncio.gather(*(
+                send(self._build_reduce_message(group), self.reduce_system_prompt)
+                for group in groups
+            ))
+        return partials[0]
+
+    def _split(self, notes: str) -> List[str]:
+        return split_into_chunks(notes, NOTES_CHUNK_SIZE, NOTES_CHUNK_OVERLAP)
+
+    def _build_chunk_message(self, chunk: str, index: int, total: int) -> str:
+        return self.chunk_message_template.format(input=chunk, index=index, total=total)
+
+    def _build_reduce_message(self, partials: List[str]) -> str:
+        body = "\n\n".join(
+            f"### Parte {i}\n\n{partial}" for i, partial in enumerate(partials, start=1)
+        )
+        return self.reduce_message_template.format(input=body)
+
+    def _map_chunks(self, notes: str, model: Optional[str]) -> List[str]:
+        chunks = self._split(notes)
+        messages = [
+            self._build_chunk_message(chunk, i, len(chunks))
+            for i, chunk in enumerate(chunks, start=1)
+        ]
+        return self._send_parallel(messages, model, self.system_prompt)
+
+    def _send_parallel(self, messages: List[str], model: Optional[str], system_prompt: str) -> List[str]:
+        if len(messages) == 1:
+            return [self.client.send_message(messages[0], model, system_prompt, self.name, self.max_output_tokens)]
+        workers = min(len(messages), NOTES_MAX_PARALLEL_CHUNKS)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(
+                carry_context(lambda message: self.client.send_message(
+                    message, model, system_prompt, self.name, self.max_output_tokens
+                )),
+                messages
+            ))
+
+    def _group_partials(self, partials: List[str]) -> List[List[str]]:
+        """Agrupa notas parciais consecutivas sem passar de NOTES_REDUCE_MAX_LENGTH"""
+        groups: List[List[str]] = [[]]
+        size = 0
+        for partial in partials:
+            if groups[-1] and size + len(partial) > NOTES_REDUCE_MAX_LENGTH:
+                groups.append([])
+                size = 0
+            groups[-1].append(partial)
+            size += len(partial)
+        return groups
+
+    def _reduce_until_fits(self, partials: List[str], model: Optional[str]) -> List[str]:
+        """Combina grupos em paralelo até que todas as parciais caibam em uma chamada final"""
+        groups = self._group_partials(partials)
+        while 1 < len(groups) < len(partials):
+            messages = [self._build_reduce_message(group) for group in groups]
+            partials = self._send_parallel(messages, model, self.reduce_system_prompt)
+            groups = self._group_partials(partials)
+        return partials
 
+    def _reduce(self, partials: List[str], model: Optional[str]) -> str:
+        return self.client.send_message(
+            self._build_reduce_message(partials), model, self.reduce_system_prompt, self.name,
+            self.max_output_tokens
+        )
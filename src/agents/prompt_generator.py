@@ -1,21 +1,31 @@
 from typing import Optional
-from ..client import OpenRouterClient
 
+from ..client import MessageStream
+from .base import BaseAgent
 
-class PromptGenerator:
+
+class PromptGenerator(BaseAgent):
     """Agente especializado em geração de prompts criativos para escrita"""
-    
-    def __init__(self, client: OpenRouterClient):
-        self.client = client
-        self.system_prompt = """Você é um gerador especializado de prompts criativos para escrita.
+
+    system_prompt = """Você é um gerador especializado de prompts criativos para escrita.
 
 VALIDAÇÃO OBRIGATÓRIA: Verifique se o conteúdo são gêneros/temas de escrita criativa. REJEITE notas de reunião, emails, receitas ou qualquer conteúdo que não seja relacionado a escrita criativa. Se não for apropriado, responda APENAS: "O conteúdo fornecido não é apropriado para geração de prompts de escrita criativa. Por favor, forneça gêneros literários, temas ou ideias para escrita criativa."
 
 Para inputs válidos: crie prompts envolventes com personagens/cenários/conflitos, adapte ao gênero, seja criativo mas claro."""
 
+    user_message_template = "Gere prompts criativos para escrita baseado em:\n\n{input}"
+    max_input_tokens = 3000
+    # Evita gerações longas demais: alguns prompts bastam
+    max_output_tokens = 800
+
     def generate(self, genres_themes: str, model: Optional[str] = None) -> str:
         """Gera prompts criativos para escrita baseado em gêneros/temas."""
-        user_message = f"Gere prompts criativos para escrita baseado em:\n\n{genres_themes}"
-        
-        return self.client.send_message(user_message, model, self.system_prompt)
+        return self._send(genres_themes, model)
+
+    def generate_stream(self, genres_themes: str, model: Optional[str] = None) -> MessageStream:
+        """Como generate, mas retorna os prompts em streaming."""
+        return self._stream(genres_themes, model)
 
+    async def agenerate(self, genres_themes: str, model: Optional[str] = None) -> str:
+        """Versão assíncrona de generate; requer um AsyncOpenRouterClient."""
+        return await self._asend(genres_themes, model)
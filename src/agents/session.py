@@ -0,0 +1,189 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional
+
+from ..client import MessageStream
+from ..config import AppConfig
+from ..tokens import MESSAGE_OVERHEAD_TOKENS, count_prompt_tokens, count_tokens, truncate_to_tokens
+from .base import BaseAgent
+
+
+@dataclass
+class SessionTurn:
+    """Uma chamada da sessão: geração completa (``full``) ou refinamento da resposta anterior (``refine``)"""
+    kind: str
+    instruction: str
+    output: str
+    latency: float
+    time_to_first_token: Optional[float]
+    prompt_tokens: int
+    completion_tokens: int
+    # Estimados localmente para as alternativas ao refinamento: entrada de gerar de
+    # novo com o pedido e todas as instruções ou de reenviar a conversa inteira, e a
+    # saída de ambas (o texto completo, em vez de só as edições)
+    regenerate_prompt_tokens: int
+    history_prompt_tokens: int
+    rewrite_completion_tokens: int
+
+
+class AgentSession:
+    """Sessão de refinamento sobre um agente.
+
+    A primeira mensagem gera a resposta normalmente; as seguintes são
+    instruções sobre a última resposta ("mais curto", "tom mais formal") e
+    enviam só o texto atual, a instrução e um resumo do pedido original e das
+    instruções anteriores limitado a ``context_tokens``: a entrada de cada
+    refinamento não cresce com a sessão. O modelo responde só com as edições
+    (ver ``BaseAgent.refine``), então a saída é bem menor que o texto. Os
+    últimos ``max_turns`` turnos ficam guardados para comparar refinamentos
+    com gerações completas.
+    """
+
+    def __init__(self, agent: BaseAgent, max_turns: int = 20, context_tokens: int = 150):
+        self.agent = agent
+        self.max_turns = max_turns
+        self.context_tokens = context_tokens
+        self.turns: Deque[SessionTurn] = deque(maxlen=max_turns)
+        self.request: Optional[str] = None
+        self.instructions: List[str] = []
+        self.last_output: Optional[str] = None
+        self._conversation_tokens = 0
+
+    @classmethod
+    def from_config(cls, agent: BaseAgent, config: AppConfig) -> "AgentSession":
+        return cls(agent, config.session_max_turns, config.session_context_tokens)
+
+    def reset(self) -> None:
+        """Começa um pedido novo; as métricas dos turnos anteriores são mantidas"""
+        self.request = None
+        self.instructions = []
+        self.last_output = None
+        self._conversation_tokens = 0
+
+    def context(self, model: str) -> str:
+        """Pedido original e instruções anteriores (as mais recentes primeiro) dentro de ``context_tokens``"""
+        prefix = "Pedido original: "
+        heading = "\nInstruções anteriores (continuam valendo):\n"
+        # O texto fixo também conta no orçamento (a nota com o maior número possível)
+        budget = self.context_tokens - sum(
+            count_tokens(part, model) for part in (prefix, heading, self._omitted_note(len(self.instructions)))
+        )
+        request = truncate_to_tokens(self.request or "", max(0, budget // 2), model)
+        budget -= count_tokens(request, model)
+        kept: List[str] = []
+        for instruction in reversed(self.instructions):
+            line = f"- {instruction}"
+            cost = count_tokens(line, model) + 1
+            if cost > budget:
+                break
+            kept.append(line)
+            budget -= cost
+        text = prefix + request
+        if kept:
+            text += heading + "\n".join(reversed(kept))
+        omitted = len(self.instructions) - len(kept)
+        if omitted:
+            text += self._omitted_note(omitted)
+        return text
+
+    @staticmethod
+    def _omitted_note(count: int) -> str:
+        return f"\n({count} instruções mais antigas omitidas)"
+
+    def stream(self, text: str, model: Optional[str] = None) -> MessageStream:
+        """Gera a resposta para ``text`` ou, se já houver uma, refina-a com ``text`` como instrução"""
+        counting_model = model or self.agent.client.model
+        if self.last_output is None:
+            kind, message = "full", self.agent._build_message(text)
+            self.request, self.instructions = text, []
+            stream = self.agent.run_stream(text, model)
+        else:
+            context = self.context(counting_model)
+            kind, message = "refine", self.agent.build_refine_message(self.last_output, text, context)
+            stream = self.agent.refine_stream(self.last_output, text, context, model)
+        stream.add_done_callback(lambda s: self._add_turn(kind, text, message, counting_model, s))
+        return stream
+
+    def send(self, text: str, model: Optional[str] = None) -> str:
+        """Como stream, mas retorna a resposta completa."""
+        stream = self.stream(text, model)
+        for _ in stream:
+            pass
+        return stream.text
+
+    def _add_turn(self, kind: str, instruction: str, message: str, model: str, stream: MessageStream) -> None:
+        system = self.agent.system_prompt
+        result = stream.result
+        usage = result.usage if result is not None else None
+        prompt_tokens = usage.prompt_tokens if usage else count_prompt_tokens(message, system, model)
+        output_tokens = count_tokens(stream.text, model)
+        if kind == "refine":
+            self.instructions.append(instruction)
+            del self.instructions[:-self.max_turns]
+            regenerate = count_prompt_tokens(
+                self.agent._build_message("\n".join([self.request or "", *self.instructions])), system, model
+            )
+            history = self._conversation_tokens + count_prompt_tokens(instruction, system, model)
+            self._conversation_tokens += count_tokens(instruction, model) + MESSAGE_OVERHEAD_TOKENS
+        else:
+            regenerate = history = prompt_tokens
+            self._conversation_tokens = count_tokens(message, model) + MESSAGE_OVERHEAD_TOKENS
+        # Mensagens que uma conversa sem compactação reenviaria (além do system prompt)
+        self._conversation_tokens += output_tokens + MESSAGE_OVERHEAD_TOKENS
+        self.last_output = stream.text
+        self.turns.append(SessionTurn(
+            kind=kind,
+            instruction=instruction,
+            output=stream.text,
+            latency=result.latency if result is not None else stream.total_time or 0.0,
+            time_to_first_token=stream.time_to_first_token,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=usage.completion_tokens if usage else output_tokens,
+            regenerate_prompt_tokens=regenerate,
+            history_prompt_tokens=history,
+            rewrite_completion_tokens=output_tokens,
+        ))
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """Médias por tipo de chamada (full, refine): tokens de entrada e saída, latência e TTFT;
+        nos refinamentos, também a entrada de uma nova geração completa e da conversa inteira
+        e a saída de uma reescrita completa"""
+        report = {}
+        for kind in ("full", "refine"):
+            turns = [turn for turn in self.turns if turn.kind == kind]
+            if not turns:
+                continue
+            ttfts = [turn.time_to_first_token for turn in turns if turn.time_to_first_token is not None]
+            report[kind] = {
+                "calls": len(turns),
+                "prompt_tokens": sum(turn.prompt_tokens for turn in turns) / len(turns),
+                "completion_tokens": sum(turn.completion_tokens for turn in turns) / len(turns),
+                "latency": sum(turn.latency for turn in turns) / len(turns),
+                "time_to_first_token": sum(ttfts) / len(ttfts) if ttfts else 0.0,
+                "regenerate_prompt_tokens": sum(turn.regenerate_prompt_tokens for turn in turns) / len(turns),
+                "history_prompt_tokens": sum(turn.history_prompt_tokens for turn in turns) / len(turns),
+                "rewrite_completion_tokens": sum(turn.rewrite_completion_tokens for turn in turns) / len(turns),
+            }
+        return report
+
+
+def refinement_table(metrics: Dict[str, Dict[str, float]]) -> str:
+    """Tabela comparando refinamentos e gerações completas da sessão"""
+    names = {"full": "geração completa", "refine": "refinamento"}
+    header = f"{'chamada':<18}{'chamadas':>9}{'entrada':>9}{'saída':>8}{'TTFT':>8}{'latência':>10}"
+    lines = [header, "-" * len(header)]
+    for kind, values in metrics.items():
+        lines.append(
+            f"{names[kind]:<18}{values['calls']:>9}{values['prompt_tokens']:>9.0f}"
+            f"{values['completion_tokens']:>8.0f}{values['time_to_first_token']:>7.2f}s{values['latency']:>9.2f}s"
+        )
+    refine = metrics.get("refine")
+    if refine:
+        rewrite = refine["rewrite_completion_tokens"]
+        lines.append(
+            f"Tokens por refinamento (entrada + saída): {refine['prompt_tokens']:.0f} + "
+            f"{refine['completion_tokens']:.0f} (gerar de novo com todas as instruções: "
+            f"~{refine['regenerate_prompt_tokens']:.0f} + {rewrite:.0f}; "
+            f"reenviar a conversa inteira: ~{refine['history_prompt_tokens']:.0f} + {rewrite:.0f})"
+        )
+    return "\n".join(lines)
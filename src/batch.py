@@ -0,0 +1,184 @@
+import json
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Set, TextIO, Tuple
+
+from .profiler import carry_context, span
+
+
+@dataclass
+class BatchJob:
+    """Job individual lido de um arquivo JSONL"""
+    id: str
+    agent: str
+    input: str
+    model: Optional[str] = None
+
+
+@dataclass
+class BatchSummary:
+    """Contadores de uma execução em lote"""
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    skipped: int = 0
+
+
+def parse_job(line: str, line_number: int) -> BatchJob:
+    """Converte uma linha JSONL em BatchJob"""
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"JSON inválido: {e}")
+    if not isinstance(record, dict):
+        raise ValueError("Cada linha deve ser um objeto JSON")
+
+    agent = record.get("agent")
+    text = record.get("input")
+    model = record.get("model")
+    if not agent or not isinstance(agent, str):
+        raise ValueError("Campo 'agent' é obrigatório")
+    if not isinstance(text, str):
+        raise ValueError("Campo 'input' é obrigatório")
+    if model is not None and not isinstance(model, str):
+        raise ValueError("Campo 'model' deve ser texto")
+
+    job_id = record.get("id")
+    return BatchJob(
+        id=str(job_id) if job_id is not None else f"line-{line_number}",
+        agent=agent,
+        input=text,
+        model=model or None,
+    )
+
+
+def load_completed_ids(output_path: Path) -> Set[str]:
+    """Lê os IDs já gravados no arquivo de saída para retomar uma execução"""
+    completed: Set[str] = set()
+    if not output_path.exists():
+        return completed
+    with output_path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict) and "id" in record:
+                completed.add(str(record["id"]))
+    return completed
+
+
+def _iter_lines(input_path: Path) -> Iterator[Tuple[int, str]]:
+    with input_path.open(encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if line:
+                yield line_number, line
+
+
+def _open_output(output_path: Path) -> TextIO:
+    """Abre a saída em modo append, corrigindo uma última linha truncada"""
+    needs_newline = False
+    if output_path.exists() and output_path.stat().st_size > 0:
+        with output_path.open("rb") as f:
+            f.seek(-1, 2)
+            needs_newline = f.read(1) != b"\n"
+    out = output_path.open("a", encoding="utf-8")
+    if needs_newline:
+        out.write("\n")
+    return out
+
+
+def _run_job(handler: Callable[[BatchJob], str], job: BatchJob) -> Dict[str, Any]:
+    start = time.perf_counter()
+    record: Dict[str, Any] = {"id": job.id, "agent": job.agent, "model": job.model}
+    try:
+        record["output"] = handler(job)
+        record["status"] = "ok"
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = type(e).__name__
+        record["message"] = str(e)
+    record["elapsed"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def _write_record(out: TextIO, record: Dict[str, Any], summary: BatchSummary) -> None:
+    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    out.flush()
+    if record["status"] == "ok":
+        summary.succeeded += 1
+    else:
+        summary.failed += 1
+
+
+def run_batch(
+    input_path: Path,
+    output_path: Path,
+    handler: Callable[[BatchJob], str],
+    concurrency: int = 4,
+    on_record: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> BatchSummary:
+    """Executa os jobs de um JSONL em paralelo, gravando cada resultado ao terminar.
+
+    O arquivo de entrada é lido sob demanda e no máximo ``2 * concurrency`` jobs
+    ficam pendentes, então o uso de memória não depende do tamanho da entrada.
+    IDs já presentes em ``output_path`` são ignorados.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency deve ser maior que zero")
+
+    summary = BatchSummary()
+    seen_ids = load_completed_ids(output_path)
+    pending: Dict[Future, BatchJob] = {}
+    max_pending = concurrency * 2
+
+    def emit(record: Dict[str, Any]) -> None:
+        with span("write_result"):
+            _write_record(out, record, summary)
+        if on_record:
+            on_record(record)
+
+    def drain(return_when: str) -> None:
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            del pending[future]
+            emit(future.result())
+
+    with _open_output(output_path) as out:
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        # Os jobs herdam o span do batch e a prioridade de quem chamou
+        run_job = carry_context(_run_job)
+        try:
+            for line_number, line in _iter_lines(input_path):
+                summary.total += 1
+                try:
+                    job = parse_job(line, line_number)
+                except ValueError as e:
+                    job_id = f"line-{line_number}"
+                    if job_id in seen_ids:
+                        summary.skipped += 1
+                        continue
+                    seen_ids.add(job_id)
+                    emit({"id": job_id, "status": "error", "error": "ValueError", "message": str(e)})
+                    continue
+
+                if job.id in seen_ids:
+                    summary.skipped += 1
+                    continue
+                seen_ids.add(job.id)
+
+                if len(pending) >= max_pending:
+                    drain(FIRST_COMPLETED)
+                pending[executor.submit(run_job, handler, job)] = job
+
+            while pending:
+                drain(ALL_COMPLETED)
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    return summary
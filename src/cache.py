@@ -0,0 +1,168 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from .config import CONFIG_DIR
+
+DEFAULT_CACHE_PATH = CONFIG_DIR / "cache.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at);
+CREATE INDEX IF NOT EXISTS idx_responses_created ON responses(created_at);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def make_cache_key(model: str, system_prompt: Optional[str], message: str) -> str:
+    """Gera a chave do cache a partir de modelo, system prompt e mensagem"""
+    digest = hashlib.sha256()
+    for part in (model, system_prompt or "", message):
+        encoded = part.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Cache persistente de respostas em SQLite com expiração por TTL e LRU por tamanho.
+
+    Vários processos podem usar o mesmo arquivo: o banco roda em modo WAL e
+    espera por locks em vez de falhar. Erros do SQLite nunca interrompem uma
+    requisição; são tratados como miss. A expiração e o limite de tamanho são
+    aplicados na primeira gravação do processo e depois a cada
+    ``evict_every`` gravações, não a cada miss.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        ttl: float = 7 * 24 * 3600,
+        max_bytes: int = 50 * 1024 * 1024,
+        evict_every: int = 100
+    ):
+        self.path = Path(path) if path else DEFAULT_CACHE_PATH
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        # Começa em zero: a CLI costuma gravar uma resposta só por execução
+        self._until_evict = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                str(self.path), timeout=10.0, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _bump(self, conn: sqlite3.Connection, name: str) -> None:
+        conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        """Retorna a resposta armazenada ou None em caso de miss"""
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row and now - row[1] <= self.ttl:
+                    conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                    self._bump(conn, "hits")
+                    self.hits += 1
+                    return row[0]
+                if row:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._bump(conn, "misses")
+            except sqlite3.Error:
+                pass
+            self.misses += 1
+            return None
+
+    def set(self, key: str, model: str, value: str) -> None:
+        """Armazena uma resposta e aplica a política de expiração"""
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses "
+                    "(key, model, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, value, len(value.encode("utf-8")), now, now)
+                )
+                self._until_evict -= 1
+                if self._until_evict <= 0:
+                    self._evict(conn, now)
+                    self._until_evict = self.evict_every
+            except sqlite3.Error:
+                pass
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        cursor = conn.execute("SELECT key, size FROM responses ORDER BY accessed_at")
+        to_delete = []
+        for key, size in cursor:
+            if total <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", to_delete)
+
+    def clear(self) -> None:
+        """Remove todas as respostas e zera os contadores"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM responses")
+            conn.execute("DELETE FROM stats")
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Contadores persistidos e ocupação atual do cache"""
+        with self._lock:
+            conn = self._connect()
+            counters = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,508 @@
+import hashlib
+import json
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .config import AppConfig
+from .transport import _http_module
+
+httpx = _http_module()
+
+_MAGIC = b"ORC1"
+_LENGTH = struct.Struct("<I")
+
+# Cabeçalhos que não fazem sentido reproduzir
+_SKIPPED_HEADERS = {"date", "set-cookie", "transfer-encoding", "connection"}
+
+
+def request_hash(method: str, path: str, body: bytes) -> str:
+    """Identificador da requisição: método, caminho e corpo JSON canônico (sem host nem API key)"""
+    try:
+        canonical = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode("utf-8")
+    except ValueError:
+        canonical = body
+    return hashlib.sha256(b"%s %s\n%s" % (method.encode(), path.encode(), canonical)).hexdigest()[:32]
+
+
+def _hash(request) -> str:
+    return request_hash(request.method, request.url.path, request.content)
+
+
+class Cassette:
+    """Arquivo append-only de requisições gravadas, com índice em SQLite.
+
+    Cada entrada é um JSON comprimido com zlib e prefixado pelo tamanho:
+    hash da requisição, corpo enviado, status, cabeçalhos e os pedaços da
+    resposta com o instante em que chegaram (ou o erro de rede). O índice
+    (``<arquivo>.idx``) guarda hash e posição de cada entrada, então abrir ou
+    buscar por hash não carrega o cassette na memória; se ficar para trás
+    (ex.: índice apagado), é completado lendo só o trecho novo do arquivo.
+    Um processo gravando por vez.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path).expanduser()
+        self.index_path = self.path.with_name(self.path.name + ".idx")
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._file = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.index_path), timeout=10.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "seq INTEGER PRIMARY KEY, hash TEXT NOT NULL, offset INTEGER NOT NULL, "
+                "length INTEGER NOT NULL, status INTEGER, latency REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_hash ON entries(hash, seq)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._conn = conn
+            self._catch_up()
+        return self._conn
+
+    def _indexed_size(self) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'size'").fetchone()
+        return row[0] if row else 0
+
+    def _catch_up(self) -> None:
+        """Indexa as entradas gravadas depois da última atualização do índice"""
+        if not self.path.exists():
+            return
+        size = self.path.stat().st_size
+        offset = self._indexed_size()
+        if offset >= size:
+            return
+        rows = []
+        with open(self.path, "rb") as f:
+            if offset == 0:
+                if f.read(len(_MAGIC)) != _MAGIC:
+                    raise ValueError(f"{self.path} não é um cassette")
+                offset = len(_MAGIC)
+            f.seek(offset)
+            while True:
+                header = f.read(_LENGTH.size)
+                if len(header) < _LENGTH.size:
+                    break
+                (length,) = _LENGTH.unpack(header)
+                data = f.read(length)
+                if len(data) < length:
+                    break  # entrada incompleta (gravação interrompida)
+                entry = json.loads(zlib.decompress(data))
+                rows.append((entry["hash"], offset, length, entry.get("status"), entry.get("latency")))
+                offset += _LENGTH.size + length
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO entries (hash, offset, length, status, latency) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('size', ?)", (offset,))
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        data = zlib.compress(json.dumps(entry, separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            conn = self._connect()
+            if self._file is None:
+                self._file = open(self.path, "ab")
+                if self._file.tell() == 0:
+                    self._file.write(_MAGIC)
+            offset = self._file.tell()
+            self._file.write(_LENGTH.pack(len(data)) + data)
+            self._file.flush()
+            with conn:
+                conn.execute(
+                    "INSERT INTO entries (hash, offset, length, status, latency) VALUES (?, ?, ?, ?, ?)",
+                    (entry["hash"], offset, len(data), entry.get("status"), entry.get("latency"))
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('size', ?)",
+                    (offset + _LENGTH.size + len(data),)
+                )
+
+    def _read(self, offset: int, length: int) -> Dict[str, Any]:
+        with open(self.path, "rb") as f:
+            f.seek(offset + _LENGTH.size)
+            return json.loads(zlib.decompress(f.read(length)))
+
+    def get(self, hash: str, occurrence: int = 0) -> Optional[Dict[str, Any]]:
+        """``occurrence``-ésima gravação da requisição ``hash`` (a última, se houver menos)"""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT offset, length FROM entries WHERE hash = ? ORDER BY seq LIMIT 1 OFFSET ?",
+                (hash, occurrence)
+            ).fetchone()
+            if row is None:
+                row = conn.execute(
+                    "SELECT offset, length FROM entries WHERE hash = ? ORDER BY seq DESC LIMIT 1", (hash,)
+                ).fetchone()
+        return self._read(*row) if row else None
+
+    def find(self, prefix: str) -> List[str]:
+        """Hashes que começam com ``prefix``"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT DISTINCT hash FROM entries WHERE hash LIKE ? ORDER BY hash LIMIT 100", (prefix + "%",)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def summary(self) -> Dict[str, Any]:
+        """Entradas, requisições distintas, status e latência gravados"""
+        with self._lock:
+            conn = self._connect()
+            entries, distinct, latency = conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT hash), COALESCE(AVG(latency), 0) FROM entries"
+            ).fetchone()
+            statuses = dict(conn.execute(
+                "SELECT COALESCE(status, 0), COUNT(*) FROM entries GROUP BY status"
+            ).fetchall())
+        return {
+            "entries": entries,
+            "requests": distinct,
+            "statuses": statuses,
+            "mean_latency": latency,
+            "bytes": self.path.stat().st_size if self.path.exists() else 0,
+        }
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Entradas na ordem de gravação, lidas sob demanda"""
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._connect().execute(
+                    "SELECT seq, offset, length FROM entries WHERE seq > ? ORDER BY seq LIMIT 1000", (last,)
+                ).fetchall()
+            if not rows:
+                return
+            for seq, offset, length in rows:
+                yield self._read(offset, length)
+                last = seq
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_cassettes: Dict[Path, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def open_cassette(path: str) -> Cassette:
+    """Cassette compartilhado pelos clientes do processo (um arquivo aberto por caminho)"""
+    resolved = Path(path).expanduser().resolve()
+    with _cassettes_lock:
+        cassette = _cassettes.get(resolved)
+        if cassette is None:
+            cassette = _cassettes[resolved] = Cassette(resolved)
+    return cassette
+
+
+def _encode(chunk: bytes) -> str:
+    # latin-1 preserva qualquer byte (pedaços podem cortar caracteres UTF-8)
+    return chunk.decode("latin-1")
+
+
+def _headers(response) -> List[Tuple[str, str]]:
+    return [(k, v) for k, v in response.headers.items() if k.lower() not in _SKIPPED_HEADERS]
+
+
+def _error_kind(error: Exception) -> str:
+    return "timeout" if isinstance(error, httpx.TimeoutException) else "connect"
+
+
+def _raise_recorded(entry: Dict[str, Any], request) -> None:
+    message = entry.get("message", "erro gravado no cassette")
+    if entry["error"] == "timeout":
+        raise httpx.ReadTimeout(message, request=request)
+    raise httpx.ConnectError(message, request=request)
+
+
+def _miss(request, hash: str):
+    payload = {"error": {"message": f"Requisição não gravada no cassette (hash {hash})", "code": 404}}
+    return httpx.Response(404, json=payload, request=request)
+
+
+class _Recorder:
+    """Estado de gravação de uma requisição"""
+
+    def __init__(self, cassette: Cassette, request):
+        self.cassette = cassette
+        self.started = time.perf_counter()
+        self.entry: Dict[str, Any] = {
+            "hash": _hash(request),
+            "ts": time.time(),
+            "method": request.method,
+            "path": request.url.path,
+            "request": request.content.decode("utf-8", "replace"),
+        }
+        self.chunks: List[List[Any]] = []
+        self._saved = False
+
+    def elapsed(self) -> float:
+        return round(time.perf_counter() - self.started, 6)
+
+    def headers(self, response) -> None:
+        self.entry.update(status=response.status_code, headers=_headers(response), headers_at=self.elapsed())
+
+    def chunk(self, data: bytes) -> None:
+        self.chunks.append([self.elapsed(), _encode(data)])
+
+    def error(self, error: Exception) -> None:
+        self.entry.update(error=_error_kind(error), message=str(error))
+        self.save()
+
+    def save(self) -> None:
+        if self._saved:
+            return
+        self._saved = True
+        self.entry.update(chunks=self.chunks, latency=self.elapsed())
+        self.cassette.append(self.entry)
+
+
+class _RecordingStream(httpx.SyncByteStream):
+    def __init__(self, stream, recorder: _Recorder):
+        self._stream = stream
+        self._recorder = recorder
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._stream:
+            self._recorder.chunk(chunk)
+            yield chunk
+        self._recorder.save()
+
+    def close(self) -> None:
+        # Stream fechado antes do fim (ex.: hedge perdedor) grava o que chegou
+        self._stream.close()
+        self._recorder.save()
+
+
+class RecordingTransport(httpx.BaseTransport):
+    """Envia pelo transporte real e grava requisição, resposta, tempos e erros de rede"""
+
+    def __init__(self, inner, cassette: Cassette):
+        self.inner = inner
+        self.cassette = cassette
+
+    def handle_request(self, request):
+        recorder = _Recorder(self.cassette, request)
+        try:
+            response = self.inner.handle_request(request)
+        except (httpx.TimeoutException, httpx.NetworkError) as e:
+            recorder.error(e)
+            raise
+        recorder.headers(response)
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response.stream, recorder),
+            extensions=response.extensions,
+            request=request,
+        )
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class _Player:
+    """Escolhe a gravação de cada requisição: gravações repetidas do mesmo hash
+    (ex.: um 429 e o retry bem-sucedido) saem na ordem em que foram gravadas"""
+
+    def __init__(self, cassette: Cassette, speed: float):
+        self.cassette = cassette
+        self.speed = speed
+        self._seen: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def next(self, request) -> Tuple[str, Optional[Dict[str, Any]]]:
+        hash = _hash(request)
+        with self._lock:
+            occurrence = self._seen.get(hash, 0)
+            self._seen[hash] = occurrence + 1
+        return hash, self.cassette.get(hash, occurrence)
+
+    def delay(self, at: float, started: float) -> float:
+        """Segundos até o instante gravado ``at`` (dividido por ``speed``; 0 = sem espera)"""
+        if not self.speed:
+            return 0.0
+        return max(0.0, at / self.speed - (time.perf_counter() - started))
+
+
+class _ReplayStream(httpx.SyncByteStream):
+    def __init__(self, player: _Player, chunks: List[List[Any]], started: float):
+        self._player = player
+        self._chunks = chunks
+        self._started = started
+
+    def __iter__(self) -> Iterator[bytes]:
+        for at, data in self._chunks:
+            wait = self._player.delay(at, self._started)
+            if wait:
+                time.sleep(wait)
+            yield data.encode("latin-1")
+
+
+class ReplayTransport(httpx.BaseTransport):
+    """Responde com as gravações do cassette, sem rede, nos tempos originais ou comprimidos.
+
+    A resposta passa pelo SDK como uma resposta real: status de erro viram
+    as mesmas exceções, com retries e circuit breaker. Requisições que não
+    estão no cassette recebem 404.
+    """
+
+    def __init__(self, cassette: Cassette, speed: float = 1.0):
+        self.player = _Player(cassette, speed)
+
+    def handle_request(self, request):
+        started = time.perf_counter()
+        hash, entry = self.player.next(request)
+        if entry is None:
+            return _miss(request, hash)
+        wait = self.player.delay(entry.get("headers_at", entry["latency"]), started)
+        if wait:
+            time.sleep(wait)
+        if "error" in entry:
+            _raise_recorded(entry, request)
+        return httpx.Response(
+            entry["status"],
+            headers=entry["headers"],
+            stream=_ReplayStream(self.player, entry["chunks"], started),
+            request=request,
+        )
+
+
+class _AsyncRecordingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, recorder: _Recorder):
+        self._stream = stream
+        self._recorder = recorder
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._recorder.chunk(chunk)
+            yield chunk
+        self._recorder.save()
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+        self._recorder.save()
+
+
+class AsyncRecordingTransport(httpx.AsyncBaseTransport):
+    """Versão assíncrona do RecordingTransport"""
+
+    def __init__(self, inner, cassette: Cassette):
+        self.inner = inner
+        self.cassette = cassette
+
+    async def handle_async_request(self, request):
+        recorder = _Recorder(self.cassette, request)
+        try:
+            response = await self.inner.handle_async_request(request)
+        except (httpx.TimeoutException, httpx.NetworkError) as e:
+            recorder.error(e)
+            raise
+        recorder.headers(response)
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_AsyncRecordingStream(response.stream, recorder),
+            extensions=response.extensions,
+            request=request,
+        )
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+class _AsyncReplayStream(httpx.AsyncByteStream):
+    def __init__(self, player: _Player, chunks: List[List[Any]], started: float):
+        self._player = player
+        self._chunks = chunks
+        self._started = started
+
+    async def __aiter__(self):
+        import asyncio
+
+        for at, data in self._chunks:
+            wait = self._player.delay(at, self._started)
+            if wait:
+                await asyncio.sleep(wait)
+            yield data.encode("latin-1")
+
+
+class AsyncReplayTransport(httpx.AsyncBaseTransport):
+    """Versão assíncrona do ReplayTransport"""
+
+    def __init__(self, cassette: Cassette, speed: float = 1.0):
+        self.player = _Player(cassette, speed)
+
+    async def handle_async_request(self, request):
+        import asyncio
+
+        started = time.perf_counter()
+        hash, entry = self.player.next(request)
+        if entry is None:
+            return _miss(request, hash)
+        wait = self.player.delay(entry.get("headers_at", entry["latency"]), started)
+        if wait:
+            await asyncio.sleep(wait)
+        if "error" in entry:
+            _raise_recorded(entry, request)
+        return httpx.Response(
+            entry["status"],
+            headers=entry["headers"],
+            stream=_AsyncReplayStream(self.player, entry["chunks"], started),
+            request=request,
+        )
+
+
+def cassette_http_client(config: AppConfig, asynchronous: bool = False):
+    """Cliente HTTP do SDK que grava ou reproduz o cassette configurado; None sem cassette"""
+    from openai import DefaultAsyncHttpxClient, DefaultHttpxClient
+
+    from .transport import shared_transport
+
+    if config.cassette_replay_path:
+        cassette = open_cassette(config.cassette_replay_path)
+        if asynchronous:
+            return DefaultAsyncHttpxClient(transport=AsyncReplayTransport(cassette, config.cassette_replay_speed))
+        return DefaultHttpxClient(transport=ReplayTransport(cassette, config.cassette_replay_speed))
+    if config.cassette_record_path:
+        cassette = open_cassette(config.cassette_record_path)
+        options = shared_transport(config).transport_options()
+        if asynchronous:
+            return DefaultAsyncHttpxClient(
+                transport=AsyncRecordingTransport(httpx.AsyncHTTPTransport(**options), cassette)
+            )
+        return DefaultHttpxClient(transport=RecordingTransport(httpx.HTTPTransport(**options), cassette))
+    return None
+
+
+def entry_text(entry: Dict[str, Any]) -> str:
+    """Texto da resposta gravada (JSON ou stream SSE de chat completions)"""
+    body = "".join(data for _, data in entry.get("chunks", [])).encode("latin-1").decode("utf-8", "replace")
+    if not body.lstrip().startswith("data:"):
+        try:
+            return json.loads(body)["choices"][0]["message"]["content"] or ""
+        except (ValueError, KeyError, IndexError, TypeError):
+            return body
+    parts = []
+    for line in body.splitlines():
+        if not line.startswith("data:") or line.strip() == "data: [DONE]":
+            continue
+        try:
+            parts.append(json.loads(line[5:])["choices"][0]["delta"].get("content") or "")
+        except (ValueError, KeyError, IndexError, TypeError):
+            continue
+    return "".join(parts)
@@ -0,0 +1,54 @@
+import re
+from typing import List
+
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+
+
+def _split_unit(text: str, max_chars: int) -> List[str]:
+    """Quebra um trecho grande em parágrafos, depois falas/linhas, frases e por fim caracteres"""
+    if len(text) <= max_chars:
+        return [text]
+    for pattern in (_PARAGRAPH_BREAK, re.compile(r'\n'), _SENTENCE_BREAK):
+        parts = [p.strip() for p in pattern.split(text) if p.strip()]
+        if len(parts) > 1:
+            units: List[str] = []
+            for part in parts:
+                units.extend(_split_unit(part, max_chars))
+            return units
+    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+
+def split_into_chunks(text: str, max_chars: int, overlap: int = 0) -> List[str]:
+    """Divide um texto longo em chunks de até ``max_chars`` caracteres.
+
+    Os cortes acontecem em limites de parágrafo ou de fala (uma linha por
+    fala, como em transcrições) e cada chunk repete até ``overlap``
+    caracteres do final do anterior, para não perder contexto na fronteira.
+    """
+    if max_chars <= 0:
+        raise ValueError("max_chars deve ser maior que zero")
+    overlap = max(0, min(overlap, max_chars // 2))
+    units = _split_unit(text.strip(), max_chars - overlap)
+
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for unit in units:
+        if current and size + len(unit) > max_chars:
+            chunks.append("\n\n".join(current))
+            carry: List[str] = []
+            carry_size = 0
+            for previous in reversed(current):
+                if carry_size + len(previous) + 2 > overlap:
+                    break
+                carry.insert(0, previous)
+                carry_size += len(previous) + 2
+            if carry_size + len(unit) > max_chars:
+                carry, carry_size = [], 0
+            current, size = carry, carry_size
+        current.append(unit)
+        size += len(unit) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
@@ -1,17 +1,21 @@
 from __future__ import annotations
 
+import atexit
+import importlib
 import sys
-from typing import Optional
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, List, Optional
 
-import questionary
 import typer
-from prompt_toolkit.styles import Style
 
-from .client import OpenRouterClient
-from .agents import EmailDrafter, NotesFormatter, PromptGenerator
 from .config import (
     API_KEY_ERROR_KEYWORDS,
+    AUTO_MODEL,
     EXIT_COMMANDS,
+    MAX_INPUT_LENGTH,
+    MAX_NOTES_INPUT_LENGTH,
     RETRY_API_KEY_SIGNAL,
     AppConfig,
 )
@@ -20,44 +24,71 @@ from .exceptions import (
     InvalidAPIKeyError,
     RateLimitError,
 )
-from .utils import get_api_key, sanitize_input, validate_input_length
-
-custom_style = Style([
-    ('qmark', 'fg:#00ff00'),
-    ('question', ''),
-    ('answer', 'fg:#3A96DD'),
-    ('pointer', 'fg:#3A96DD'),
-    ('highlighted', 'fg:#3A96DD'),
-    ('selected', 'fg:#3A96DD'),
-    ('separator', ''),
-    ('instruction', 'fg:#3A96DD'),
-    ('text', ''),
-    ('disabled', 'fg:#858585 italic')
-])
+from .profiler import span, traced
+from .utils import get_api_key, get_api_keys, sanitize_input, validate_input_length
+
+if TYPE_CHECKING:
+    from .batch import BatchJob
+    from .client import MessageStream, OpenRouterClient
+
+# questionary/prompt_toolkit, os agentes e o SDK openai são importados sob
+# demanda: comandos não interativos não devem pagar o custo da UI interativa.
+
+
+@lru_cache(maxsize=None)
+def get_style():
+    """Estilo do menu interativo (importa prompt_toolkit sob demanda)."""
+    from prompt_toolkit.styles import Style
+
+    return Style([
+        ('qmark', 'fg:#00ff00'),
+        ('question', ''),
+        ('answer', 'fg:#3A96DD'),
+        ('pointer', 'fg:#3A96DD'),
+        ('highlighted', 'fg:#3A96DD'),
+        ('selected', 'fg:#3A96DD'),
+        ('separator', ''),
+        ('instruction', 'fg:#3A96DD'),
+        ('text', ''),
+        ('disabled', 'fg:#858585 italic')
+    ])
 
 app = typer.Typer(help="CLI para agentes especializados usando OpenRouter")
 
 AGENT_CONFIG = {
     "Email Drafter": {
-        "class": EmailDrafter,
+        "class": "email_drafter.EmailDrafter",
         "prompt": "Descreva o email:",
         "action": "Gerando email...",
-        "method": "draft"
+        "method": "draft",
+        "stream_method": "draft_stream",
+        "hedge": {"fallbacks": ["claude-3-haiku"]}
     },
     "Creative Writing Prompt Generator": {
-        "class": PromptGenerator,
+        "class": "prompt_generator.PromptGenerator",
         "prompt": "Gêneros/temas de interesse",
         "action": "Gerando prompts...",
-        "method": "generate"
+        "method": "generate",
+        "stream_method": "generate_stream",
+        "hedge": {"fallbacks": ["claude-3-haiku"]}
     },
     "Meeting Notes Formatter": {
-        "class": NotesFormatter,
+        "class": "notes_formatter.NotesFormatter",
         "prompt": "Cole as notas",
         "action": "Formatando notas...",
-        "method": "format"
+        "method": "format",
+        "stream_method": "format_stream",
+        "max_input_length": MAX_NOTES_INPUT_LENGTH,
+        "hedge": {"fallbacks": ["claude-3-haiku", "llama-3.1-70b-instruct"]}
     }
 }
 
+AGENT_COMMANDS = {
+    "email": "Email Drafter",
+    "prompt": "Creative Writing Prompt Generator",
+    "notes": "Meeting Notes Formatter",
+}
+
 
 def _is_api_key_error(error: Exception) -> bool:
     """Verifica se o erro é relacionado a API key"""
@@ -65,58 +96,301 @@ def _is_api_key_error(error: Exception) -> bool:
     return any(keyword in error_str for keyword in API_KEY_ERROR_KEYWORDS)
 
 
-def get_client(api_key: Optional[str] = None, model: Optional[str] = None) -> OpenRouterClient:
-    """Cria e valida cliente OpenRouter."""
-    try:
-        resolved_api_key = get_api_key(api_key)
-    except ValueError as e:
-        raise ValueError(str(e))
-    
+def resolve_agent_name(name: str) -> str:
+    """Aceita o nome do agente em AGENT_CONFIG ou o nome do comando CLI"""
+    if name in AGENT_CONFIG:
+        return name
+    if name.lower() in AGENT_COMMANDS:
+        return AGENT_COMMANDS[name.lower()]
+    raise ValueError(f"Agente desconhecido: {name}")
+
+
+def load_agent_class(agent_name: str) -> type:
+    """Importa a classe do agente sob demanda a partir de AGENT_CONFIG."""
+    module_name, class_name = AGENT_CONFIG[agent_name]["class"].rsplit(".", 1)
+    module = importlib.import_module(f"{__package__}.agents.{module_name}")
+    return getattr(module, class_name)
+
+
+def validate_agent_input(agent_name: str, text: str, model: Optional[str] = None) -> str:
+    """Valida o tamanho (caracteres e tokens) e sanitiza o input conforme o limite do agente."""
+    max_length = AGENT_CONFIG[agent_name].get("max_input_length", MAX_INPUT_LENGTH)
+    # Checagem barata em caracteres antes de importar o agente e contar tokens
+    with span("validate_input"):
+        validate_input_length(text, max_length)
+        max_tokens = load_agent_class(agent_name).max_input_tokens
+        validate_input_length(text, max_length, max_tokens, model)
+    with span("sanitize_input"):
+        return sanitize_input(text, max_length)
+
+
+def read_input_file(path: Path) -> str:
+    """Lê o input de um arquivo, ou da entrada padrão se o caminho for '-'."""
+    if str(path) == "-":
+        return sys.stdin.read()
+    if not path.exists():
+        raise ValueError(f"Arquivo não encontrado: {path}")
+    return path.read_text(encoding="utf-8")
+
+
+def echo_stream(stream: MessageStream) -> str:
+    """Exibe os deltas da resposta conforme chegam e retorna o texto completo."""
+    for delta in stream:
+        with span("render"):
+            typer.echo(delta, nl=False)
+    if stream.hedge is not None and stream.hedge.hedged:
+        echo_hedge_report(stream.hedge)
+    return stream.text
+
+
+def echo_hedge_report(report) -> None:
+    """Informa (no stderr) qual modelo respondeu quando o hedge foi acionado."""
+    reason = {"slow": "demora", "error": "falha"}.get(report.reason, report.reason)
+    saved = f", ~{report.saved:.1f}s economizados" if report.saved else ""
+    typer.echo(
+        f"\n[hedge] resposta de {report.winner} (principal: {report.primary}, "
+        f"motivo: {reason}{saved})",
+        err=True
+    )
+
+
+def hedge_policies(config: AppConfig) -> dict:
+    """Políticas de hedging de AGENT_CONFIG, indexadas pelo nome da classe do agente."""
+    from .hedging import HedgePolicy
+
+    return {
+        agent["class"].rsplit(".", 1)[1]: HedgePolicy.from_config(config, **agent["hedge"])
+        for agent in AGENT_CONFIG.values()
+        if "hedge" in agent
+    }
+
+
+@lru_cache(maxsize=None)
+def get_near_duplicate_index():
+    """Índice de inputs semelhantes compartilhado pelos agentes do processo."""
+    from .near_duplicates import NearDuplicateIndex
+
     config = AppConfig()
-    client = OpenRouterClient(
-        api_key=resolved_api_key, 
-        model=model or config.default_model
+    return NearDuplicateIndex(
+        threshold=config.near_duplicate_threshold,
+        max_entries=config.near_duplicate_max_entries,
+        ttl=config.near_duplicate_ttl
     )
-    
+
+
+@lru_cache(maxsize=None)
+def get_history_store():
+    """Histórico local compartilhado pelos agentes do processo (None se desligado)."""
+    from .history import HistoryStore
+
+    config = AppConfig()
+    if not config.history_enabled:
+        return None
+    store = HistoryStore(retention_days=config.history_retention_days, max_entries=config.history_max_entries)
+    atexit.register(store.close)
+    return store
+
+
+def create_agent(agent_name: str, client: OpenRouterClient, similar: Optional[str] = None):
+    """Instancia o agente com o histórico e, se ``similar`` for reuse/draft, o índice de inputs semelhantes."""
+    agent_class = load_agent_class(agent_name)
+    if not similar:
+        return agent_class(client, history=get_history_store())
+    return agent_class(client, get_near_duplicate_index(), similar, history=get_history_store())
+
+
+def echo_similar_draft(agent, text: str, model: Optional[str]) -> bool:
+    """Exibe a resposta de um input semelhante como rascunho; retorna se havia uma."""
+    match = agent.find_similar(text, model)
+    if match is None:
+        return False
+    typer.echo(f"\nRascunho de uma resposta anterior semelhante ({match.similarity:.0%}):\n")
+    typer.echo(match.response)
+    typer.echo()
+    return True
+
+
+@contextmanager
+def profiled(prefix: Optional[Path], command: str) -> Iterator[None]:
+    """Com ``--profile``, mede as etapas do comando, grava o perfil e exibe o tempo por etapa ao final."""
+    if prefix is None:
+        yield
+        return
+    from .profiler import profiling, stage_table
+
+    profiler = None
+    try:
+        with profiling(prefix, command) as profiler:
+            yield
+    finally:
+        if profiler is not None:
+            typer.echo(f"\nTempo por etapa:\n{stage_table(profiler.summary())}", err=True)
+            typer.echo(f"Perfil gravado em {prefix}.trace.json e {prefix}.folded", err=True)
+
+
+@traced("get_client")
+def get_client(
+    api_key: Optional[str] = None,
+    model: Optional[str] = None,
+    no_cache: bool = False,
+    refresh: bool = False,
+    hedge: bool = False,
+    adaptive: bool = False,
+    keys_file: Optional[Path] = None,
+    priority: str = "interactive"
+) -> OpenRouterClient:
+    """Cria e valida cliente OpenRouter (com hedging entre modelos se ``hedge``).
+
+    Com mais de uma API key (``--keys-file``, OPENROUTER_API_KEYS ou
+    ~/.openrouter/api_keys) e sem ``--api-key``, retorna um KeyPool.
+    """
+    from .cache import ResponseCache
+    from .client import OpenRouterClient
+    from .instrumentation import PrometheusExporter, hooks_from_config
+    from .router import ModelRouter
+
+    config = AppConfig(rate_limit_shared=True, adaptive_concurrency=adaptive, default_priority=priority)
+    api_keys = [] if api_key else get_api_keys(keys_file)
+    if len(api_keys) <= 1:
+        try:
+            api_keys = [get_api_key(api_key or (api_keys[0] if api_keys else None))]
+        except ValueError:
+            # Reproduzir um cassette não acessa a rede: qualquer key no formato serve
+            if not config.cassette_replay_path:
+                raise
+            api_keys = ["sk-or-replay"]
+    if config.cassette_record_path or config.cassette_replay_path:
+        # Respostas do cache não passariam pelo cassette
+        no_cache = True
+
+    cache = None
+    if not no_cache:
+        cache = ResponseCache(ttl=config.cache_ttl, max_bytes=config.cache_max_bytes)
+    hooks = hooks_from_config(config)
+    if len(api_keys) > 1:
+        from .key_pool import KeyPool
+
+        client = KeyPool.from_keys(
+            api_keys, model or config.default_model, config, cache, refresh, hooks
+        )
+        collectors = [client.render_prometheus]
+    else:
+        client = OpenRouterClient(
+            api_key=api_keys[0],
+            model=model or config.default_model,
+            config=config,
+            cache=cache,
+            refresh_cache=refresh,
+            hooks=hooks
+        )
+        collectors = [client.rate_limiter.render_prometheus]
+        if client.concurrency is not None:
+            collectors.append(client.concurrency.render_prometheus)
+    if config.http_shared_pool:
+        from .transport import shared_transport
+
+        collectors.append(shared_transport(config).render_prometheus)
+    if (model or config.default_model) == AUTO_MODEL:
+        # Um roteador para todas as keys; sem auto, nenhuma requisição paga o histórico em disco
+        client.use_router(ModelRouter.from_config(config))
+    # Fecha os exportadores de métricas e grava o histórico do roteador, que é um dos hooks
+    atexit.register(client.hooks.close)
+    for hook in hooks:
+        if isinstance(hook, PrometheusExporter):
+            for collector in collectors:
+                hook.add_collector(collector)
+
     if not client.validate_api_key():
         raise InvalidAPIKeyError("API key inválida ou não autorizada")
-    
+    if hedge:
+        from .hedging import HedgedClient
+
+        return HedgedClient(client, hedge_policies(config))
     return client
 
 
+def echo_queue_waits(client: OpenRouterClient) -> None:
+    """Exibe a espera na fila do rate limiter por classe de prioridade (por key, num pool)."""
+    from .scheduler import wait_table
+
+    for inner in getattr(client, "clients", [client]):
+        report = inner.rate_limiter.wait_report()
+        if any(values["requests"] for values in report.values()):
+            typer.echo(f"Espera na fila do rate limiter (key ...{inner.api_key[-4:]}):")
+            typer.echo(wait_table(report))
+
+
+def echo_concurrency(client: OpenRouterClient) -> None:
+    """Exibe o limite de concorrência adaptativo por modelo (por key, num pool)."""
+    pooled = hasattr(client, "clients")
+    for inner in getattr(client, "clients", [client]):
+        key = f" (key ...{inner.api_key[-4:]})" if pooled else ""
+        for name, metrics in inner.concurrency.metrics().items():
+            typer.echo(
+                f"Concorrência {name}{key}: limite {metrics['limit']:g}, "
+                f"{metrics['drops']} cortes por sobrecarga em {metrics['requests']} tentativas"
+            )
+
+
 def run_agent_interactive(
     agent_name: str, 
     client: OpenRouterClient, 
-    model: Optional[str] = None
+    model: Optional[str] = None,
+    similar: Optional[str] = None
 ) -> Optional[str]:
     """Executa agente em modo interativo."""
     config = AGENT_CONFIG.get(agent_name)
     if not config:
         raise ValueError(f"Agente desconhecido: {agent_name}")
     
-    agent = config["class"](client)
+    import questionary
+
+    from .agents.session import AgentSession
+
+    agent = create_agent(agent_name, client, similar)
+    # Depois de cada resposta, o usuário escolhe entre ajustá-la (ex.: "mais curto") e um novo pedido
+    session = AgentSession.from_config(agent, client.config)
     typer.echo(f"\n{agent_name}")
     typer.echo("Digite 'sair' para voltar\n")
     
     while True:
-        user_input = questionary.text(config["prompt"], style=custom_style).ask()
+        if session.last_output is not None:
+            action = questionary.select(
+                "E agora?",
+                choices=["Novo pedido", "Ajustar esta resposta", "Voltar"],
+                style=get_style()
+            ).ask()
+            if action is None:
+                echo_session_metrics(session)
+                return None
+            if action == "Voltar":
+                break
+            if action == "Novo pedido":
+                session.reset()
+        refining = session.last_output is not None
+        question = "Ajuste (ex.: mais curto, tom mais formal):" if refining else config["prompt"]
+        user_input = questionary.text(question, style=get_style()).ask()
         if user_input is None:
+            echo_session_metrics(session)
             return None
         if not user_input or user_input.lower() in EXIT_COMMANDS:
             break
         
         try:
-            validate_input_length(user_input)
-            sanitized_input = sanitize_input(user_input)
+            sanitized_input = validate_agent_input(agent_name, user_input, model)
         except ValueError as e:
             typer.echo(f"Erro: {e}", err=True)
             continue
         
-        typer.echo(config["action"])
+        if not refining and similar == "draft" and echo_similar_draft(agent, sanitized_input, model):
+            if not questionary.confirm("Gerar uma nova resposta?", default=False, style=get_style()).ask():
+                continue
+
+        typer.echo("Refinando..." if refining else config["action"])
         try:
-            method = getattr(agent, config["method"])
-            result = method(sanitized_input, model)
-            typer.echo(f"\n{result}\n")
+            typer.echo()
+            echo_stream(session.stream(sanitized_input, model))
+            typer.echo("\n")
         except (InvalidAPIKeyError, ValueError) as e:
             if _is_api_key_error(e):
                 typer.echo(f"Erro: {e}", err=True)
@@ -127,6 +401,17 @@ def run_agent_interactive(
             typer.echo(f"Erro: {e}", err=True)
         except Exception as e:
             typer.echo(f"Erro: {e}", err=True)
+    echo_session_metrics(session)
+
+
+def echo_session_metrics(session) -> None:
+    """Compara, ao sair do agente, os refinamentos com as gerações completas da sessão."""
+    from .agents.session import refinement_table
+
+    metrics = session.metrics()
+    if "refine" in metrics:
+        typer.echo(refinement_table(metrics))
+        typer.echo()
 
 
 def run_agent_command(
@@ -134,7 +419,11 @@ def run_agent_command(
     input_arg: Optional[str],
     api_key: Optional[str],
     model: Optional[str],
-    interactive: bool
+    interactive: bool,
+    no_cache: bool = False,
+    refresh: bool = False,
+    hedge: bool = False,
+    similar: Optional[str] = None
 ) -> None:
     """Função genérica para executar comandos de agentes."""
     config = AGENT_CONFIG.get(agent_name)
@@ -142,10 +431,9 @@ def run_agent_command(
         raise ValueError(f"Agente desconhecido: {agent_name}")
     
     try:
-        client = get_client(api_key, model)
-        
         if interactive:
-            run_agent_interactive(agent_name, client, model)
+            client = get_client(api_key, model, no_cache, refresh, hedge)
+            run_agent_interactive(agent_name, client, model, similar)
         else:
             if not input_arg:
                 typer.echo(
@@ -155,17 +443,21 @@ def run_agent_command(
                 raise typer.Exit(1)
             
             try:
-                validate_input_length(input_arg)
-                sanitized_input = sanitize_input(input_arg)
+                sanitized_input = validate_agent_input(agent_name, input_arg, model)
             except ValueError as e:
                 typer.echo(f"Erro: {e}", err=True)
                 raise typer.Exit(1)
             
+            client = get_client(api_key, model, no_cache, refresh, hedge)
+            agent = create_agent(agent_name, client, similar)
+            if similar == "draft" and echo_similar_draft(agent, sanitized_input, model):
+                typer.echo("Execute sem --similar draft para gerar uma nova resposta.", err=True)
+                return
             typer.echo(config["action"])
-            agent = config["class"](client)
-            method = getattr(agent, config["method"])
-            result = method(sanitized_input, model)
-            typer.echo(f"\n{result}")
+            method = getattr(agent, config["stream_method"])
+            typer.echo()
+            echo_stream(method(sanitized_input, model))
+            typer.echo()
             
     except typer.Exit:
         raise
@@ -174,15 +466,31 @@ def run_agent_command(
         raise typer.Exit(1)
 
 
-def run_interactive_menu(api_key: Optional[str] = None, model: Optional[str] = None) -> None:
+def run_interactive_menu(
+    api_key: Optional[str] = None,
+    model: Optional[str] = None,
+    no_cache: bool = False,
+    refresh: bool = False,
+    hedge: bool = False,
+    similar: Optional[str] = None
+) -> None:
     """Menu interativo para seleção de agentes."""
+    import questionary
+
+    from .transport import shared_transport
+
+    # Abre a conexão com o OpenRouter enquanto o usuário escolhe o agente e digita
+    config = AppConfig()
+    if config.http_shared_pool and not config.cassette_replay_path:
+        shared_transport(config).prewarm(config.openrouter_base_url)
+
     try:
         while True:
             client = None
             
             while client is None:
                 if not api_key:
-                    api_key = questionary.password("API key do OpenRouter", style=custom_style).ask()
+                    api_key = questionary.password("API key do OpenRouter", style=get_style()).ask()
                     if api_key is None:
                         sys.exit(0)
                     if not api_key:
@@ -191,7 +499,7 @@ def run_interactive_menu(api_key: Optional[str] = None, model: Optional[str] = N
                         continue
                 
                 try:
-                    client = get_client(api_key, model)
+                    client = get_client(api_key, model, no_cache, refresh, hedge)
                 except (ValueError, InvalidAPIKeyError) as e:
                     typer.echo(f"Erro: {e}", err=True)
                     api_key = None
@@ -206,7 +514,7 @@ def run_interactive_menu(api_key: Optional[str] = None, model: Optional[str] = N
                         "Meeting Notes Formatter",
                         "Sair"
                     ],
-                    style=custom_style,
+                    style=get_style(),
                     use_arrow_keys=True,
                     use_indicator=False,
                     pointer=">"
@@ -217,7 +525,7 @@ def run_interactive_menu(api_key: Optional[str] = None, model: Optional[str] = N
                 if not agent_choice or agent_choice == "Sair":
                     return
                 
-                result = run_agent_interactive(agent_choice, client, model)
+                result = run_agent_interactive(agent_choice, client, model, similar)
                 if result == RETRY_API_KEY_SIGNAL:
                     api_key = None
                     break
@@ -231,46 +539,466 @@ def run_interactive_menu(api_key: Optional[str] = None, model: Optional[str] = N
         raise typer.Exit(1)
 
 
+def run_batch_command(
+    input_file: Path,
+    output_file: Optional[Path],
+    api_key: Optional[str],
+    model: Optional[str],
+    concurrency: int,
+    no_cache: bool = False,
+    refresh: bool = False,
+    hedge: bool = False,
+    adaptive: bool = False,
+    keys_file: Optional[Path] = None
+) -> None:
+    """Executa um arquivo JSONL de jobs através dos agentes."""
+    from .batch import BatchJob, run_batch
+
+    if not input_file.exists():
+        typer.echo(f"Erro: Arquivo não encontrado: {input_file}", err=True)
+        raise typer.Exit(1)
+    output_file = output_file or input_file.with_name(f"{input_file.stem}.results.jsonl")
+
+    try:
+        client = get_client(api_key, model, no_cache, refresh, hedge, adaptive, keys_file, priority="batch")
+        agents = {name: create_agent(name, client) for name in AGENT_CONFIG}
+        if adaptive:
+            # Threads suficientes para o teto; o limiter decide quantas ficam em voo
+            concurrency = max(concurrency, client.config.concurrency_max_limit)
+
+        def handle(job: BatchJob) -> str:
+            with span("job"):
+                agent_name = resolve_agent_name(job.agent)
+                sanitized_input = validate_agent_input(agent_name, job.input, job.model or model)
+                method = getattr(agents[agent_name], AGENT_CONFIG[agent_name]["method"])
+                return method(sanitized_input, job.model or model)
+
+        typer.echo(f"Processando {input_file} -> {output_file}")
+        summary = run_batch(input_file, output_file, handle, concurrency=concurrency)
+    except KeyboardInterrupt:
+        typer.echo("\nInterrompido. Execute novamente para retomar.", err=True)
+        raise typer.Exit(130)
+    except Exception as e:
+        typer.echo(f"Erro: {e}", err=True)
+        raise typer.Exit(1)
+
+    typer.echo(
+        f"Concluído: {summary.succeeded} ok, {summary.failed} com erro, "
+        f"{summary.skipped} ignorados (já processados)"
+    )
+    if hedge and client.stats.hedged:
+        stats = client.stats
+        typer.echo(
+            f"Hedge: {stats.hedged} de {stats.requests} requisições, "
+            f"{stats.fallback_wins} vencidas pelo fallback, ~{stats.saved:.1f}s economizados"
+        )
+    echo_queue_waits(client)
+    if client.config.http_shared_pool:
+        from .transport import connection_summary, shared_transport
+
+        typer.echo(connection_summary(shared_transport().stats()))
+    if hasattr(client, "usage"):
+        from .key_pool import usage_table
+
+        typer.echo(usage_table(client.usage()))
+    if (model or client.config.default_model) == AUTO_MODEL and client.router is not None:
+        from .router import routing_table
+
+        typer.echo(routing_table(client.router.report()))
+    if adaptive:
+        echo_concurrency(client)
+
+
 @app.command()
 def main(
     api_key: Optional[str] = typer.Option(None, "--api-key", "-k", help="Chave da API do OpenRouter"),
-    model: Optional[str] = typer.Option(None, "--model", "-m", help="Modelo a ser usado")
+    model: Optional[str] = typer.Option(None, "--model", "-m", help="Modelo a ser usado (auto: escolhido pelo histórico local)"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Não usar o cache de respostas"),
+    refresh: bool = typer.Option(False, "--refresh", help="Ignorar respostas em cache e atualizá-las"),
+    hedge: bool = typer.Option(False, "--hedge", help="Repetir em um modelo de fallback se o principal demorar ou falhar"),
+    similar: Optional[str] = typer.Option(None, "--similar", help="Para inputs quase idênticos a um anterior: 'reuse' (reutiliza a resposta) ou 'draft' (mostra como rascunho)"),
+    profile: Optional[Path] = typer.Option(None, "--profile", help="Grava o tempo de cada etapa em PROFILE.trace.json (Chrome) e PROFILE.folded (flamegraph)")
 ) -> None:
     """Menu interativo para seleção de agentes"""
-    run_interactive_menu(api_key, model)
+    with profiled(profile, "menu"):
+        run_interactive_menu(api_key, model, no_cache, refresh, hedge, similar)
 
 
 @app.command()
 def email(
     email_description: Optional[str] = typer.Argument(None, help="Descrição do conteúdo do email"),
     api_key: Optional[str] = typer.Option(None, "--api-key", "-k", help="Chave da API do OpenRouter"),
-    model: Optional[str] = typer.Option(None, "--model", "-m", help="Modelo a ser usado"),
-    interactive: bool = typer.Option(False, "--interactive", "-i", help="Modo interativo")
+    model: Optional[str] = typer.Option(None, "--model", "-m", help="Modelo a ser usado (auto: escolhido pelo histórico local)"),
+    interactive: bool = typer.Option(False, "--interactive", "-i", help="Modo interativo"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Não usar o cache de respostas"),
+    refresh: bool = typer.Option(False, "--refresh", help="Ignorar respostas em cache e atualizá-las"),
+    hedge: bool = typer.Option(False, "--hedge", help="Repetir em um modelo de fallback se o principal demorar ou falhar"),
+    similar: Optional[str] = typer.Option(None, "--similar", help="Para inputs quase idênticos a um anterior: 'reuse' (reutiliza a resposta) ou 'draft' (mostra como rascunho)"),
+    profile: Optional[Path] = typer.Option(None, "--profile", help="Grava o tempo de cada etapa em PROFILE.trace.json (Chrome) e PROFILE.folded (flamegraph)")
 ) -> None:
     """Email Drafter: Crie emails profissionais a partir de uma descrição"""
-    run_agent_command("Email Drafter", email_description, api_key, model, interactive)
+    with profiled(profile, "email"):
+        run_agent_command("Email Drafter", email_description, api_key, model, interactive, no_cache, refresh, hedge, similar)
 
 
 @app.command()
 def prompt(
     genres_or_themes: Optional[str] = typer.Argument(None, help="Gêneros ou temas para gerar prompts"),
     api_key: Optional[str] = typer.Option(None, "--api-key", "-k", help="Chave da API do OpenRouter"),
-    model: Optional[str] = typer.Option(None, "--model", "-m", help="Modelo a ser usado"),
-    interactive: bool = typer.Option(False, "--interactive", "-i", help="Modo interativo")
+    model: Optional[str] = typer.Option(None, "--model", "-m", help="Modelo a ser usado (auto: escolhido pelo histórico local)"),
+    interactive: bool = typer.Option(False, "--interactive", "-i", help="Modo interativo"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Não usar o cache de respostas"),
+    refresh: bool = typer.Option(False, "--refresh", help="Ignorar respostas em cache e atualizá-las"),
+    hedge: bool = typer.Option(False, "--hedge", help="Repetir em um modelo de fallback se o principal demorar ou falhar"),
+    similar: Optional[str] = typer.Option(None, "--similar", help="Para inputs quase idênticos a um anterior: 'reuse' (reutiliza a resposta) ou 'draft' (mostra como rascunho)"),
+    profile: Optional[Path] = typer.Option(None, "--profile", help="Grava o tempo de cada etapa em PROFILE.trace.json (Chrome) e PROFILE.folded (flamegraph)")
 ) -> None:
     """Creative Writing Prompt Generator: Gere prompts criativos para escrita"""
-    run_agent_command("Creative Writing Prompt Generator", genres_or_themes, api_key, model, interactive)
+    with profiled(profile, "prompt"):
+        run_agent_command("Creative Writing Prompt Generator", genres_or_themes, api_key, model, interactive, no_cache, refresh, hedge, similar)
 
 
 @app.command()
 def notes(
     raw_notes: Optional[str] = typer.Argument(None, help="Notas desorganizadas para formatar"),
+    input_file: Optional[Path] = typer.Option(None, "--file", "-f", help="Ler as notas de um arquivo ('-' para stdin)"),
     api_key: Optional[str] = typer.Option(None, "--api-key", "-k", help="Chave da API do OpenRouter"),
-    model: Optional[str] = typer.Option(None, "--model", "-m", help="Modelo a ser usado"),
-    interactive: bool = typer.Option(False, "--interactive", "-i", help="Modo interativo")
+    model: Optional[str] = typer.Option(None, "--model", "-m", help="Modelo a ser usado (auto: escolhido pelo histórico local)"),
+    interactive: bool = typer.Option(False, "--interactive", "-i", help="Modo interativo"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Não usar o cache de respostas"),
+    refresh: bool = typer.Option(False, "--refresh", help="Ignorar respostas em cache e atualizá-las"),
+    hedge: bool = typer.Option(False, "--hedge", help="Repetir em um modelo de fallback se o principal demorar ou falhar"),
+    similar: Optional[str] = typer.Option(None, "--similar", help="Para inputs quase idênticos a um anterior: 'reuse' (reutiliza a resposta) ou 'draft' (mostra como rascunho)"),
+    profile: Optional[Path] = typer.Option(None, "--profile", help="Grava o tempo de cada etapa em PROFILE.trace.json (Chrome) e PROFILE.folded (flamegraph)")
 ) -> None:
     """Meeting Notes Formatter: Organize notas de reunião em itens de ação"""
-    run_agent_command("Meeting Notes Formatter", raw_notes, api_key, model, interactive)
+    with profiled(profile, "notes"):
+        if input_file is not None:
+            try:
+                raw_notes = read_input_file(input_file)
+            except (OSError, ValueError) as e:
+                typer.echo(f"Erro: {e}", err=True)
+                raise typer.Exit(1)
+        run_agent_command("Meeting Notes Formatter", raw_notes, api_key, model, interactive, no_cache, refresh, hedge, similar)
+
+
+@app.command()
+def batch(
+    input_file: Path = typer.Argument(..., help="Arquivo JSONL com os jobs (agent, input, model, id)"),
+    output_file: Optional[Path] = typer.Option(None, "--output", "-o", help="Arquivo JSONL de resultados"),
+    api_key: Optional[str] = typer.Option(None, "--api-key", "-k", help="Chave da API do OpenRouter"),
+    model: Optional[str] = typer.Option(None, "--model", "-m", help="Modelo padrão para jobs sem 'model'"),
+    concurrency: int = typer.Option(4, "--concurrency", "-c", min=1, help="Número de requisições simultâneas"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Não usar o cache de respostas"),
+    refresh: bool = typer.Option(False, "--refresh", help="Ignorar respostas em cache e atualizá-las"),
+    hedge: bool = typer.Option(False, "--hedge", help="Repetir em um modelo de fallback se o principal demorar ou falhar"),
+    adaptive: bool = typer.Option(False, "--adaptive", help="Ajustar a concorrência por modelo conforme latência e erros 429"),
+    keys_file: Optional[Path] = typer.Option(None, "--keys-file", help="Arquivo com uma API key por linha, para distribuir os jobs entre elas"),
+    profile: Optional[Path] = typer.Option(None, "--profile", help="Grava o tempo de cada etapa em PROFILE.trace.json (Chrome) e PROFILE.folded (flamegraph)")
+) -> None:
+    """Batch: Execute jobs de um arquivo JSONL em paralelo"""
+    with profiled(profile, "batch"):
+        run_batch_command(input_file, output_file, api_key, model, concurrency, no_cache, refresh, hedge, adaptive, keys_file)
+
+
+def run_fanout_command(
+    text: Optional[str],
+    agent_commands: List[str],
+    models: List[str],
+    pipeline: Optional[str],
+    handoff_chars: int,
+    api_key: Optional[str],
+    no_cache: bool = False,
+    refresh: bool = False,
+    hedge: bool = False
+) -> None:
+    """Envia um input a vários agentes/modelos em paralelo ou por um pipeline encadeado."""
+    from .fanout import FanoutTarget, Pipeline, PipelineStage, comparison_table, fan_out, min_chars
+
+    if not text:
+        typer.echo("Erro: É necessário fornecer o input (argumento ou --file)", err=True)
+        raise typer.Exit(1)
+    try:
+        names = [resolve_agent_name(name.strip()) for name in (pipeline.split(",") if pipeline else agent_commands)]
+        # Em pipelines só o primeiro estágio recebe o input do usuário
+        for agent_name in names[:1] if pipeline else names:
+            for model in models or [None]:
+                sanitized_input = validate_agent_input(agent_name, text, model)
+        client = get_client(api_key, models[0] if models else None, no_cache, refresh, hedge)
+    except ValueError as e:
+        typer.echo(f"Erro: {e}", err=True)
+        raise typer.Exit(1)
+
+    try:
+        if pipeline:
+            model = models[0] if models else None
+            ready = min_chars(handoff_chars) if handoff_chars else None
+            if ready:
+                typer.echo(
+                    f"Aviso: com --handoff-chars, cada estágio recebe só a saída parcial do anterior "
+                    f"(a partir de {handoff_chars} caracteres), não o restante",
+                    err=True
+                )
+            stages = [
+                PipelineStage(create_agent(name, client), model, ready if i else None)
+                for i, name in enumerate(names)
+            ]
+            runner = Pipeline(stages)
+            current = -1
+            for index, delta in runner.stream(sanitized_input):
+                if index != current:
+                    current = index
+                    typer.echo(f"\n=== {stages[index].agent.name} ===\n")
+                with span("render"):
+                    typer.echo(delta, nl=False)
+            typer.echo()
+            for index, (received, generated) in sorted(runner.truncated.items()):
+                typer.echo(
+                    f"Aviso: {stages[index].agent.name} recebeu {received} de {generated} caracteres "
+                    f"da saída de {stages[index - 1].agent.name}",
+                    err=True
+                )
+            results = [result for result in runner.results if result is not None]
+        else:
+            targets = [FanoutTarget(create_agent(name, client), model) for name in names for model in models or [None]]
+            results = []
+            for result in fan_out(sanitized_input, targets):
+                results.append(result)
+                typer.echo(f"\n=== {result.label} ({result.latency:.2f}s) ===\n")
+                typer.echo(result.output if result.ok else f"Erro: {result.error}")
+    except KeyboardInterrupt:
+        raise typer.Exit(130)
+
+    typer.echo()
+    typer.echo(comparison_table(results))
+    if not all(result.ok for result in results):
+        raise typer.Exit(1)
+
+
+@app.command()
+def serve(
+    host: str = typer.Option("127.0.0.1", "--host", help="Endereço de escuta"),
+    port: int = typer.Option(8080, "--port", "-p", help="Porta HTTP"),
+    workers: int = typer.Option(8, "--workers", "-w", min=1, help="Chamadas simultâneas ao OpenRouter"),
+    queue_size: int = typer.Option(64, "--queue-size", min=1, help="Requisições na fila antes de responder 503"),
+    api_key: Optional[str] = typer.Option(None, "--api-key", "-k", help="Chave da API do OpenRouter"),
+    model: Optional[str] = typer.Option(None, "--model", "-m", help="Modelo padrão"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Não usar o cache de respostas"),
+    refresh: bool = typer.Option(False, "--refresh", help="Ignorar respostas em cache e atualizá-las"),
+    hedge: bool = typer.Option(False, "--hedge", help="Repetir em um modelo de fallback se o principal demorar ou falhar"),
+    keys_file: Optional[Path] = typer.Option(None, "--keys-file", help="Arquivo com uma API key por linha, para distribuir as requisições entre elas"),
+    profile: Optional[Path] = typer.Option(None, "--profile", help="Grava o tempo de cada etapa em PROFILE.trace.json (Chrome) e PROFILE.folded (flamegraph)")
+) -> None:
+    """Serve: Exponha os agentes como endpoints HTTP JSON locais"""
+    with profiled(profile, "serve"):
+        from .server import AgentEndpoint, AgentService, create_server
+
+        try:
+            client = get_client(api_key, model, no_cache, refresh, hedge, keys_file=keys_file, priority="api")
+        except Exception as e:
+            typer.echo(f"Erro: {e}", err=True)
+            raise typer.Exit(1)
+
+        endpoints = {}
+        for command, agent_name in AGENT_COMMANDS.items():
+            config = AGENT_CONFIG[agent_name]
+            agent = create_agent(agent_name, client)
+            max_length = config.get("max_input_length", MAX_INPUT_LENGTH)
+            endpoints[command] = AgentEndpoint(
+                name=command,
+                stream=getattr(agent, config["stream_method"]),
+                validate=lambda text, model, agent_name=agent_name: validate_agent_input(agent_name, text, model),
+                # JSON com escapes pode ocupar até ~6 bytes por caractere
+                max_body_bytes=max_length * 6 + 4096,
+            )
+
+        def queue_waits() -> dict:
+            return {
+                f"...{inner.api_key[-4:]}": inner.rate_limiter.wait_report()
+                for inner in getattr(client, "clients", [client])
+            }
+
+        server = create_server(AgentService(endpoints, workers, queue_size, status=queue_waits), host, port)
+        typer.echo(f"Servindo {', '.join(sorted(endpoints))} em http://{host}:{server.server_port}/v1/agents/<agente>")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            typer.echo("\nEncerrando...")
+        finally:
+            server.server_close()
+
+
+@app.command()
+def fanout(
+    text: Optional[str] = typer.Argument(None, help="Input enviado a todos os agentes/modelos"),
+    input_file: Optional[Path] = typer.Option(None, "--file", "-f", help="Ler o input de um arquivo ('-' para stdin)"),
+    agents: Optional[List[str]] = typer.Option(None, "--agent", "-a", help="Agente (email, prompt, notes); repetível"),
+    models: Optional[List[str]] = typer.Option(None, "--model", "-m", help="Modelo; repetível, combinado com cada agente"),
+    pipeline: Optional[str] = typer.Option(None, "--pipeline", help="Agentes encadeados, ex.: notes,email"),
+    handoff_chars: int = typer.Option(0, "--handoff-chars", min=0, help="No pipeline, inicia o próximo estágio após N caracteres (0 = saída completa)"),
+    api_key: Optional[str] = typer.Option(None, "--api-key", "-k", help="Chave da API do OpenRouter"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Não usar o cache de respostas"),
+    refresh: bool = typer.Option(False, "--refresh", help="Ignorar respostas em cache e atualizá-las"),
+    hedge: bool = typer.Option(False, "--hedge", help="Repetir em um modelo de fallback se o principal demorar ou falhar"),
+    profile: Optional[Path] = typer.Option(None, "--profile", help="Grava o tempo de cada etapa em PROFILE.trace.json (Chrome) e PROFILE.folded (flamegraph)")
+) -> None:
+    """Fan-out: Rode um input em vários agentes/modelos e compare latência e tokens"""
+    with profiled(profile, "fanout"):
+        if input_file is not None:
+            try:
+                text = read_input_file(input_file)
+            except (OSError, ValueError) as e:
+                typer.echo(f"Erro: {e}", err=True)
+                raise typer.Exit(1)
+        run_fanout_command(
+            text, agents or ["email"], models or [], pipeline, handoff_chars, api_key, no_cache, refresh, hedge
+        )
+
+
+@app.command()
+def cache(
+    clear: bool = typer.Option(False, "--clear", help="Remove todas as respostas em cache"),
+    profile: Optional[Path] = typer.Option(None, "--profile", help="Grava o tempo de cada etapa em PROFILE.trace.json (Chrome) e PROFILE.folded (flamegraph)")
+) -> None:
+    """Cache: Mostre estatísticas ou limpe o cache de respostas"""
+    with profiled(profile, "cache"):
+        from .cache import ResponseCache
+
+        from .near_duplicates import DEFAULT_INDEX_PATH
+
+        response_cache = ResponseCache()
+        if clear:
+            response_cache.clear()
+            if DEFAULT_INDEX_PATH.exists():
+                get_near_duplicate_index().clear()
+            typer.echo("Cache limpo")
+            return
+        stats = response_cache.stats()
+        lookups = stats["hits"] + stats["misses"]
+        hit_rate = stats["hits"] / lookups * 100 if lookups else 0.0
+        typer.echo(f"Arquivo: {response_cache.path}")
+        typer.echo(f"Entradas: {stats['entries']} ({stats['bytes'] / 1024:.1f} KB)")
+        typer.echo(f"Hits: {stats['hits']}  Misses: {stats['misses']}  Taxa de acerto: {hit_rate:.1f}%")
+        if DEFAULT_INDEX_PATH.exists():
+            typer.echo(f"Inputs semelhantes indexados: {get_near_duplicate_index().stats()['entries']}")
+
+
+def echo_history(entries) -> None:
+    """Lista gerações do histórico, uma por linha."""
+    import datetime
+
+    for entry in entries:
+        when = datetime.datetime.fromtimestamp(entry.created_at).strftime("%Y-%m-%d %H:%M")
+        tokens = f"{entry.completion_tokens} tokens" if entry.completion_tokens is not None else "-"
+        latency = f"{entry.latency:.1f}s" if entry.latency is not None else "-"
+        snippet = " ".join(entry.input.split())[:60]
+        typer.echo(
+            f"{entry.id:>6}  {when}  {entry.agent:<16}{entry.model:<24}{latency:>7}{tokens:>12}  {snippet}"
+        )
+
+
+@app.command()
+def history(
+    query: Optional[str] = typer.Argument(None, help="Palavras a buscar no input ou na resposta"),
+    agent: Optional[str] = typer.Option(None, "--agent", "-a", help="Filtra por agente (email, prompt, notes)"),
+    model: Optional[str] = typer.Option(None, "--model", "-m", help="Filtra por modelo"),
+    days: Optional[float] = typer.Option(None, "--days", "-d", help="Só gerações dos últimos N dias"),
+    limit: int = typer.Option(20, "--limit", "-n", min=1, help="Máximo de gerações listadas"),
+    show: Optional[int] = typer.Option(None, "--show", "-s", help="Exibe de novo a resposta da geração com este id"),
+    stats: bool = typer.Option(False, "--stats", help="Mostra o tamanho e o período do histórico"),
+    compact: bool = typer.Option(False, "--compact", help="Aplica a retenção agora"),
+    clear: bool = typer.Option(False, "--clear", help="Remove todo o histórico"),
+    profile: Optional[Path] = typer.Option(None, "--profile", help="Grava o tempo de cada etapa em PROFILE.trace.json (Chrome) e PROFILE.folded (flamegraph)")
+) -> None:
+    """History: Busque e reexiba gerações anteriores sem chamar a API"""
+    with profiled(profile, "history"):
+        import time
+
+        from .history import HistoryStore
+
+        config = AppConfig()
+        store = HistoryStore(retention_days=config.history_retention_days, max_entries=config.history_max_entries)
+        try:
+            if clear:
+                store.clear()
+                typer.echo("Histórico limpo")
+                return
+            if compact:
+                typer.echo(f"{store.compact()} gerações removidas pela retenção")
+                return
+            if stats:
+                import datetime
+
+                info = store.stats()
+                typer.echo(f"Gerações: {info['entries']} ({info['bytes'] / 1024 / 1024:.1f} MB em {store.path})")
+                if info["entries"]:
+                    period = [datetime.datetime.fromtimestamp(info[k]).strftime("%Y-%m-%d") for k in ("oldest", "newest")]
+                    typer.echo(f"Período: {period[0]} a {period[1]}")
+                    for name, count in sorted(info["agents"].items()):
+                        typer.echo(f"  {name:<20}{count:>8}")
+                return
+            if show is not None:
+                entry = store.get(show)
+                if entry is None:
+                    typer.echo(f"Erro: geração {show} não encontrada", err=True)
+                    raise typer.Exit(1)
+                typer.echo(entry.output)
+                return
+            try:
+                agent_class = load_agent_class(resolve_agent_name(agent)).__name__ if agent else None
+            except ValueError as e:
+                typer.echo(f"Erro: {e}", err=True)
+                raise typer.Exit(1)
+            since = time.time() - days * 24 * 3600 if days else None
+            entries = store.search(query, agent_class, model, since, limit)
+            if not entries:
+                typer.echo("Nenhuma geração encontrada")
+                return
+            echo_history(entries)
+            typer.echo("\nUse --show ID para exibir uma resposta.", err=True)
+        finally:
+            store.close()
+
+
+@app.command()
+def cassette(
+    path: Path = typer.Argument(..., help="Arquivo de cassette gravado com OPENROUTER_RECORD"),
+    hash: Optional[str] = typer.Option(None, "--hash", help="Exibe a requisição com este hash (ou prefixo)"),
+    occurrence: int = typer.Option(0, "--occurrence", min=0, help="Qual gravação do hash exibir (retries)"),
+    profile: Optional[Path] = typer.Option(None, "--profile", help="Grava o tempo de cada etapa em PROFILE.trace.json (Chrome) e PROFILE.folded (flamegraph)")
+) -> None:
+    """Cassette: Resuma um cassette de gravação ou exiba uma requisição pelo hash"""
+    with profiled(profile, "cassette"):
+        import json
+
+        from .cassette import Cassette, entry_text
+
+        if not path.exists():
+            typer.echo(f"Erro: {path} não existe", err=True)
+            raise typer.Exit(1)
+        recorded = Cassette(path)
+        if not hash:
+            summary = recorded.summary()
+            statuses = ", ".join(f"{status or 'erro de rede'}: {count}" for status, count in sorted(summary["statuses"].items()))
+            typer.echo(f"Arquivo: {path} ({summary['bytes'] / 1024:.1f} KB)")
+            typer.echo(f"Entradas: {summary['entries']} ({summary['requests']} requisições distintas)")
+            typer.echo(f"Status: {statuses or '-'}")
+            typer.echo(f"Latência média: {summary['mean_latency']:.2f}s")
+            return
+        matches = recorded.find(hash)
+        if len(matches) != 1:
+            typer.echo(f"Erro: {len(matches)} requisições com o hash {hash}", err=True)
+            for match in matches[:10]:
+                typer.echo(match, err=True)
+            raise typer.Exit(1)
+        entry = recorded.get(matches[0], occurrence)
+        request = json.loads(entry["request"]) if entry["request"] else {}
+        typer.echo(f"Hash: {entry['hash']}")
+        typer.echo(f"Modelo: {request.get('model', '-')}  Stream: {bool(request.get('stream'))}")
+        typer.echo(f"Status: {entry.get('status') or entry.get('error')}  Latência: {entry['latency']:.2f}s")
+        for message in request.get("messages", []):
+            typer.echo(f"\n[{message.get('role')}]\n{message.get('content')}")
+        typer.echo(f"\n[resposta]\n{entry.get('message') or entry_text(entry)}")
 
 
 if __name__ == "__main__":
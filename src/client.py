@@ -1,108 +1,671 @@
-from openai import OpenAI
-from openai import AuthenticationError, PermissionDeniedError, APIConnectionError, APITimeoutError
-from typing import Optional
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, Sequence, Tuple
 
-from .exceptions import InvalidAPIKeyError, RateLimitError, ConnectionError as OpenRouterConnectionError
-from .config import AppConfig, SUPPORTED_MODELS
-from .utils import retry_with_backoff, RateLimiter
+from .cache import ResponseCache, make_cache_key
+from .concurrency import AdaptiveConcurrency, ConcurrencySlot
+from .exceptions import (
+    InvalidAPIKeyError,
+    OpenRouterError,
+    RateLimitError,
+    ServerError,
+    ConnectionError as OpenRouterConnectionError,
+)
+from .config import AUTO_MODEL, MODEL_FAMILIES, SUPPORTED_MODELS, AppConfig
+from .instrumentation import CompletionResult, HookDispatcher, RequestContext, RequestHook, TokenUsage
+from .profiler import Profiler, profiling, span, traced
+from .rate_limiter import AsyncRateLimiter
+from .router import ModelRouter
+from .scheduler import PriorityRateLimiter
+from .tokens import output_cap, pick_model
+from .transport import shared_transport
+from .retry import CircuitBreakerRegistry, RetryPolicy, async_retry_call, parse_retry_after, retry_call
 
+# Chamado quando uma tentativa sai da fila local (rate limiter e vaga de concorrência);
+# o hedging conta o atraso do principal a partir daí
+on_attempt_started: ContextVar[Optional[Callable[[], None]]] = ContextVar("on_attempt_started", default=None)
+
+
+def _attempt_started() -> float:
+    callback = on_attempt_started.get()
+    if callback is not None:
+        callback()
+    return time.perf_counter()
+
+
+def _build_messages(message: str, system_prompt: Optional[str], model: str = "") -> List[Dict[str, Any]]:
+    """Mensagens com o system prompt estático primeiro, como prefixo cacheável.
+
+    Modelos OpenAI cacheiam automaticamente o maior prefixo repetido; os
+    Claude só cacheiam até um breakpoint ``cache_control`` explícito.
+    """
+    messages: List[Dict[str, Any]] = []
+    if system_prompt:
+        if MODEL_FAMILIES.get(model) == "anthropic":
+            messages.append({"role": "system", "content": [
+                {"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}
+            ]})
+        else:
+            messages.append({"role": "system", "content": system_prompt})
+    messages.append({"role": "user", "content": message})
+    return messages
+
+
+def _parse_response(response: Any) -> str:
+    if response.choices and len(response.choices) > 0:
+        return response.choices[0].message.content
+    raise ValueError("Resposta da API não contém choices válidas")
+
+
+def _parse_usage(response: Any) -> Optional[TokenUsage]:
+    return TokenUsage.from_response(getattr(response, "usage", None))
+
+
+def _chunk_delta(chunk: Any) -> str:
+    if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+        return chunk.choices[0].delta.content
+    return ""
+
+
+def _map_api_error(e: Exception) -> Exception:
+    """Converte exceções do SDK nas exceções da aplicação, pelo tipo e status HTTP"""
+    from openai import (
+        APIConnectionError,
+        APIStatusError,
+        APITimeoutError,
+        AuthenticationError,
+        PermissionDeniedError,
+        RateLimitError as SDKRateLimitError,
+    )
+
+    if isinstance(e, OpenRouterError):
+        return e
+    if isinstance(e, (AuthenticationError, PermissionDeniedError)):
+        return InvalidAPIKeyError("API key inválida ou não autorizada")
+    if isinstance(e, SDKRateLimitError):
+        return RateLimitError(
+            "Rate limit excedido. Tente novamente mais tarde",
+            retry_after=parse_retry_after(e.response.headers)
+        )
+    if isinstance(e, APITimeoutError):
+        return OpenRouterConnectionError(f"Timeout na conexão: {str(e)}")
+    if isinstance(e, APIConnectionError):
+        return OpenRouterConnectionError(f"Erro de conexão: {str(e)}")
+    if isinstance(e, APIStatusError):
+        if e.status_code >= 500 or e.status_code == 408:
+            return ServerError(
+                f"Erro no servidor ({e.status_code}): {e.message}",
+                retry_after=parse_retry_after(e.response.headers)
+            )
+        return ValueError(f"Erro na requisição ({e.status_code}): {e.message}")
+    return ValueError(f"Erro na requisição: {str(e)}")
+
+
+def _wrap_final_error(e: Exception) -> Exception:
+    if isinstance(e, (OpenRouterError, ValueError)):
+        return e
+    return ValueError(f"Erro na requisição: {str(e)}")
+
+
+class MessageStream:
+    """Iterador sobre os deltas de uma resposta em streaming.
+
+    Registra ``time_to_first_token`` e ``total_time`` (em segundos) conforme é
+    consumido; ``text`` contém a resposta acumulada e, ao final, ``result``
+    traz o CompletionResult da requisição.
+    """
+
+    def __init__(
+        self,
+        deltas: Iterator[str],
+        started_at: float,
+        on_complete: Optional[Callable[["MessageStream"], Optional[CompletionResult]]] = None,
+        on_close: Optional[Callable[[], None]] = None
+    ):
+        self._deltas = deltas
+        self._started_at = started_at
+        self._on_complete = on_complete
+        self._on_close = on_close
+        self._callbacks: List[Callable[["MessageStream"], None]] = []
+        self._parts: List[str] = []
+        self.time_to_first_token: Optional[float] = None
+        self.total_time: Optional[float] = None
+        self.result: Optional[CompletionResult] = None
+        self.hedge = None
+
+    def __iter__(self) -> Iterator[str]:
+        for delta in self._deltas:
+            if self.time_to_first_token is None:
+                self.time_to_first_token = time.perf_counter() - self._started_at
+            self._parts.append(delta)
+            yield delta
+        self.total_time = time.perf_counter() - self._started_at
+        if self._on_complete:
+            self.result = self._on_complete(self)
+        for callback in self._callbacks:
+            callback(self)
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def add_done_callback(self, callback: Callable[["MessageStream"], None]) -> None:
+        """Chama ``callback(stream)`` quando o stream for consumido até o fim."""
+        self._callbacks.append(callback)
+
+    def close(self) -> None:
+        """Interrompe o stream e libera a conexão sem consumir o restante."""
+        close = getattr(self._deltas, "close", None)
+        if close:
+            close()
+        if self._on_close:
+            self._on_close()
+
+
+class _BaseOpenRouterClient:
+    """Configuração e validações comuns aos clientes síncrono e assíncrono"""
 
-class OpenRouterClient:
-    """Cliente para interagir com a API do OpenRouter"""
-    
     def __init__(
-        self, 
-        api_key: str, 
-        model: str = "gpt-4o-mini", 
+        self,
+        api_key: str,
+        model: str = "gpt-4o-mini",
         timeout: int = 30,
         max_retries: int = 3,
-        config: Optional[AppConfig] = None
+        config: Optional[AppConfig] = None,
+        cache: Optional[ResponseCache] = None,
+        refresh_cache: bool = False,
+        hooks: Optional[Sequence[RequestHook]] = None
     ):
         self.api_key = api_key
         self.config = config or AppConfig()
         self.model = model
         self.timeout = timeout
         self.max_retries = max_retries
-        self.rate_limiter = RateLimiter()
+        self.cache = cache
+        self.refresh_cache = refresh_cache
+        self.hooks = HookDispatcher(hooks)
+        self.retry_policy = RetryPolicy.from_config(self.config, max_retries)
+        self.circuit_breakers = CircuitBreakerRegistry.from_config(self.config)
+        self.concurrency = (
+            AdaptiveConcurrency.from_config(self.config) if self.config.adaptive_concurrency else None
+        )
+        self.router: Optional[ModelRouter] = None
+        self._client = None
+        self._client_lock = threading.Lock()
         self._validate_model(model)
-        
-        self.client = OpenAI(
-            api_key=api_key,
-            base_url=self.config.openrouter_base_url,
-            timeout=timeout
+
+    @property
+    def client(self):
+        """Cliente do SDK openai, criado (e importado) apenas no primeiro uso."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    # Importa o SDK e monta o cliente: fica fora do tempo de rede no profiler
+                    with span("client_init"):
+                        self._client = self._create_client()
+        return self._client
+
+    def _create_client(self):
+        raise NotImplementedError
+
+    @property
+    def _uses_cassette(self) -> bool:
+        return bool(self.config.cassette_record_path or self.config.cassette_replay_path)
+
+    def _http_client(self, asynchronous: bool = False):
+        """Cliente HTTP do SDK: o do cassette (gravação ou reprodução), o pool
+        compartilhado ou None (o padrão do SDK)"""
+        if self._uses_cassette:
+            from .cassette import cassette_http_client
+
+            return cassette_http_client(self.config, asynchronous)
+        if self.config.http_shared_pool:
+            transport = shared_transport(self.config)
+            return transport.async_client() if asynchronous else transport.client()
+        return None
+
+    def profile(self, prefix: Optional[str] = None) -> "ContextManager[Profiler]":
+        """Registra o tempo de cada etapa das requisições feitas dentro do bloco ``with``.
+
+        Com ``prefix``, grava ``<prefix>.trace.json`` (Chrome) e ``<prefix>.folded``
+        (flamegraph) ao sair; o Profiler retornado tem o resumo por etapa. Dentro de
+        outro bloco de profiling (ex.: ``--profile`` da CLI), só o externo grava.
+        """
+        return profiling(prefix, "profile")
+
+    def add_hook(self, hook: RequestHook) -> None:
+        """Registra um hook de instrumentação (ex.: JSONLinesExporter)."""
+        self.hooks.add(hook)
+
+    def use_router(self, router: ModelRouter) -> None:
+        """Usa ``router`` para o modelo auto e alimenta o histórico dele com as requisições deste cliente"""
+        self.router = router
+        self.add_hook(router)
+
+    def _attempt_timeout(self, remaining: Optional[float]) -> float:
+        """Timeout da tentativa, limitado pelo que resta do prazo total"""
+        return self.timeout if remaining is None else min(self.timeout, remaining)
+
+    def _limiter_timeout(self, remaining: Optional[float]) -> Optional[float]:
+        max_wait = self.rate_limiter.max_wait
+        if remaining is None:
+            return max_wait
+        return remaining if max_wait is None else min(remaining, max_wait)
+
+    def _concurrency_slot(self, model: str, remaining: Optional[float]) -> Optional[ConcurrencySlot]:
+        if self.concurrency is None:
+            return None
+        with span("concurrency_wait"):
+            return self.concurrency.get(model).acquire(timeout=self._limiter_timeout(remaining))
+
+    async def _aconcurrency_slot(self, model: str, remaining: Optional[float]) -> Optional[ConcurrencySlot]:
+        if self.concurrency is None:
+            return None
+        with span("concurrency_wait"):
+            return await self.concurrency.get(model).acquire_async(timeout=self._limiter_timeout(remaining))
+
+    def _cache_lookup(self, key: str) -> Optional[str]:
+        if self.cache is None or self.refresh_cache:
+            return None
+        with span("cache_lookup"):
+            return self.cache.get(key)
+
+    def _cache_store(self, key: str, model: str, value: str) -> None:
+        if self.cache is not None and value is not None:
+            with span("cache_store"):
+                self.cache.set(key, model, value)
+
+    def _on_retry(self, ctx: RequestContext) -> Callable[[int, Exception, float], None]:
+        return lambda attempt, error, delay: self.hooks.on_retry(ctx, attempt, error, delay)
+
+    def _fail(self, ctx: RequestContext, error: Exception) -> Exception:
+        error = _wrap_final_error(error)
+        self.hooks.on_error(ctx, error)
+        return error
+
+    def _finish(
+        self,
+        ctx: RequestContext,
+        text: str,
+        usage: Optional[TokenUsage] = None,
+        cached: bool = False,
+        time_to_first_token: Optional[float] = None
+    ) -> CompletionResult:
+        result = CompletionResult(
+            text=text,
+            model=ctx.model,
+            agent=ctx.agent,
+            request_id=ctx.request_id,
+            latency=time.perf_counter() - ctx.started_at,
+            attempts=ctx.attempts,
+            rate_limit_wait=ctx.rate_limit_wait,
+            usage=usage,
+            cached=cached,
+            time_to_first_token=time_to_first_token,
         )
+        with span("hooks"):
+            self.hooks.after_response(ctx, result)
+        return result
+
+    def _request_options(self, model: str, max_tokens: Optional[int]) -> Dict[str, Any]:
+        """Parâmetros opcionais da requisição (``max_tokens`` limitado ao do modelo)"""
+        max_tokens = output_cap(model, max_tokens)
+        return {"max_tokens": max_tokens} if max_tokens else {}
 
     def _validate_model(self, model: str) -> None:
-        if model not in SUPPORTED_MODELS:
+        if model not in SUPPORTED_MODELS and model != AUTO_MODEL:
             raise ValueError(
                 f"Modelo '{model}' não suportado. "
-                f"Modelos disponíveis: {', '.join(sorted(SUPPORTED_MODELS))}"
+                f"Modelos disponíveis: {AUTO_MODEL}, {', '.join(sorted(SUPPORTED_MODELS))}"
             )
 
+    def _resolve_model(self, model: Optional[str]) -> str:
+        if model:
+            self._validate_model(model)
+        return model or self.model
+
+    def _select_model(
+        self, model: Optional[str], message: str, system_prompt: Optional[str], max_tokens: Optional[int]
+    ) -> str:
+        """Modelo efetivo da requisição: resolve o auto pelo roteador e troca por um
+        modelo de contexto maior se a requisição não couber"""
+        model = self._resolve_model(model)
+        with span("select_model"):
+            if model == AUTO_MODEL:
+                if self.router is None:
+                    with self._client_lock:
+                        if self.router is None:
+                            self.use_router(ModelRouter.from_config(self.config))
+                model = self.router.choose(message, system_prompt)
+            return pick_model(message, system_prompt, model, max_tokens)
+
+    def validate_api_key(self) -> bool:
+        """Valida a API key."""
+        if not self.api_key or not isinstance(self.api_key, str):
+            return False
+        if len(self.api_key.strip()) == 0:
+            return False
+        return self.api_key.startswith('sk-or-')
+
+
+class OpenRouterClient(_BaseOpenRouterClient):
+    """Cliente para interagir com a API do OpenRouter"""
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-4o-mini",
+        timeout: int = 30,
+        max_retries: int = 3,
+        config: Optional[AppConfig] = None,
+        cache: Optional[ResponseCache] = None,
+        refresh_cache: bool = False,
+        hooks: Optional[Sequence[RequestHook]] = None
+    ):
+        super().__init__(api_key, model, timeout, max_retries, config, cache, refresh_cache, hooks)
+        self.rate_limiter = PriorityRateLimiter.from_config(self.config, api_key)
+
+    def _create_client(self):
+        from openai import OpenAI
+
+        http_client = self._http_client()
+        return OpenAI(
+            api_key=self.api_key,
+            base_url=self.config.openrouter_base_url,
+            timeout=self.timeout,
+            max_retries=0,
+            http_client=http_client
+        )
+
     def send_message(
-        self, 
-        message: str, 
-        model: Optional[str] = None, 
-        system_prompt: Optional[str] = None
+        self,
+        message: str,
+        model: Optional[str] = None,
+        system_prompt: Optional[str] = None,
+        agent: Optional[str] = None,
+        max_tokens: Optional[int] = None
     ) -> str:
         """Envia mensagem para a API do OpenRouter."""
-        if model:
-            self._validate_model(model)
-        model = model or self.model
+        return self.send_message_result(message, model, system_prompt, agent, max_tokens).text
 
-        messages = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        messages.append({"role": "user", "content": message})
+    @traced("request")
+    def send_message_result(
+        self,
+        message: str,
+        model: Optional[str] = None,
+        system_prompt: Optional[str] = None,
+        agent: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> CompletionResult:
+        """Como send_message, mas retorna também latência, retries e tokens."""
+        model = self._select_model(model, message, system_prompt, max_tokens)
+        request_options = self._request_options(model, max_tokens)
+        ctx = RequestContext(model=model, agent=agent)
+        self.hooks.before_request(ctx)
+        cache_key = make_cache_key(model, system_prompt, message)
+        cached = self._cache_lookup(cache_key)
+        if cached is not None:
+            return self._finish(ctx, cached, cached=True)
+        messages = _build_messages(message, system_prompt, model)
+
+        def _make_request(remaining: Optional[float]) -> Tuple[str, Optional[TokenUsage]]:
+            ctx.attempts += 1
+            with span("rate_limit_wait"):
+                ctx.rate_limit_wait += self.rate_limiter.acquire(timeout=self._limiter_timeout(remaining))
+            slot = self._concurrency_slot(model, remaining)
+            attempt_started = _attempt_started()
+            error = None
+            try:
+                with span("http"):
+                    raw = self.client.chat.completions.with_raw_response.create(
+                        model=model,
+                        messages=messages,
+                        **request_options,
+                        timeout=self._attempt_timeout(remaining)
+                    )
+                with span("parse"):
+                    response = raw.parse()
+                    return _parse_response(response), _parse_usage(response)
+            except Exception as e:
+                error = _map_api_error(e)
+                raise error
+            finally:
+                ctx.upstream_latency = time.perf_counter() - attempt_started
+                if slot:
+                    slot.release(error)
+
+        try:
+            text, usage = retry_call(
+                _make_request,
+                self.retry_policy,
+                self.circuit_breakers.get(model),
+                on_retry=self._on_retry(ctx)
+            )
+        except Exception as e:
+            raise self._fail(ctx, e)
+        self._cache_store(cache_key, model, text)
+        return self._finish(ctx, text, usage)
+
+    @traced("request")
+    def send_message_stream(
+        self,
+        message: str,
+        model: Optional[str] = None,
+        system_prompt: Optional[str] = None,
+        agent: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> MessageStream:
+        """Envia mensagem e retorna os deltas da resposta conforme chegam.
+
+        Falhas antes do primeiro token passam pelo retry normal; depois dele,
+        os erros são apenas convertidos para as exceções da aplicação.
+        """
+        model = self._select_model(model, message, system_prompt, max_tokens)
+        request_options = self._request_options(model, max_tokens)
+        ctx = RequestContext(model=model, agent=agent, stream=True)
+        self.hooks.before_request(ctx)
+        cache_key = make_cache_key(model, system_prompt, message)
+        cached = self._cache_lookup(cache_key)
+        if cached is not None:
+            return MessageStream(
+                iter([cached]),
+                ctx.started_at,
+                on_complete=lambda stream: self._finish(
+                    ctx, stream.text, cached=True, time_to_first_token=stream.time_to_first_token
+                )
+            )
+        messages = _build_messages(message, system_prompt, model)
+        usage: List[TokenUsage] = []
+
+        def _read(chunk: Any) -> str:
+            chunk_usage = _parse_usage(chunk)
+            if chunk_usage:
+                usage.append(chunk_usage)
+            return _chunk_delta(chunk)
+
+        def _open_stream(remaining: Optional[float]):
+            ctx.attempts += 1
+            with span("rate_limit_wait"):
+                ctx.rate_limit_wait += self.rate_limiter.acquire(timeout=self._limiter_timeout(remaining))
+            # A vaga vale até o primeiro token: a latência observada é o TTFT
+            slot = self._concurrency_slot(model, remaining)
+            attempt_started = _attempt_started()
+            error = None
+            try:
+                with span("http"):
+                    stream = iter(self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        **request_options,
+                        stream=True,
+                        stream_options={"include_usage": True},
+                        timeout=self._attempt_timeout(remaining)
+                    ))
+                with span("first_token"):
+                    for chunk in stream:
+                        delta = _read(chunk)
+                        if delta:
+                            return stream, delta
+                return stream, ""
+            except Exception as e:
+                error = _map_api_error(e)
+                raise error
+            finally:
+                ctx.upstream_latency = time.perf_counter() - attempt_started
+                if slot:
+                    slot.release(error)
+
+        try:
+            stream, first_delta = retry_call(
+                _open_stream,
+                self.retry_policy,
+                self.circuit_breakers.get(model),
+                on_retry=self._on_retry(ctx)
+            )
+        except Exception as e:
+            raise self._fail(ctx, e)
 
-        def _make_request():
-            self.rate_limiter()
+        def _deltas() -> Iterator[str]:
+            if first_delta:
+                yield first_delta
             try:
-                response = self.client.chat.completions.create(
-                    model=model,
-                    messages=messages
+                while True:
+                    # Só a leitura do chunk: o tempo do consumidor entre os yields fica de fora
+                    with span("stream_read"):
+                        read_started = time.perf_counter()
+                        chunk = next(stream, None)
+                        ctx.upstream_latency += time.perf_counter() - read_started
+                        if chunk is None:
+                            return
+                        delta = _read(chunk)
+                    if delta:
+                        yield delta
+            except Exception as e:
+                raise self._fail(ctx, _map_api_error(e))
+
+        def _complete(message_stream: MessageStream) -> CompletionResult:
+            self._cache_store(cache_key, model, message_stream.text)
+            return self._finish(
+                ctx,
+                message_stream.text,
+                usage[-1] if usage else None,
+                time_to_first_token=message_stream.time_to_first_token
+            )
+
+        return MessageStream(
+            _deltas(), ctx.started_at, on_complete=_complete, on_close=getattr(stream, "close", None)
+        )
+
+
+class AsyncOpenRouterClient(_BaseOpenRouterClient):
+    """Cliente assíncrono para a API do OpenRouter, baseado em AsyncOpenAI"""
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-4o-mini",
+        timeout: int = 30,
+        max_retries: int = 3,
+        config: Optional[AppConfig] = None,
+        cache: Optional[ResponseCache] = None,
+        refresh_cache: bool = False,
+        hooks: Optional[Sequence[RequestHook]] = None
+    ):
+        super().__init__(api_key, model, timeout, max_retries, config, cache, refresh_cache, hooks)
+        self.rate_limiter = AsyncRateLimiter.from_config(self.config, api_key)
+
+    def _create_client(self):
+        from openai import AsyncOpenAI
+
+        http_client = self._http_client(asynchronous=True)
+        return AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=self.config.openrouter_base_url,
+            timeout=self.timeout,
+            max_retries=0,
+            http_client=http_client
+        )
+
+    async def send_message(
+        self,
+        message: str,
+        model: Optional[str] = None,
+        system_prompt: Optional[str] = None,
+        agent: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        """Envia mensagem para a API do OpenRouter sem bloquear o event loop."""
+        result = await self.send_message_result(message, model, system_prompt, agent, max_tokens)
+        return result.text
+
+    @traced("request")
+    async def send_message_result(
+        self,
+        message: str,
+        model: Optional[str] = None,
+        system_prompt: Optional[str] = None,
+        agent: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> CompletionResult:
+        """Como send_message, mas retorna também latência, retries e tokens."""
+        model = self._select_model(model, message, system_prompt, max_tokens)
+        request_options = self._request_options(model, max_tokens)
+        ctx = RequestContext(model=model, agent=agent)
+        self.hooks.before_request(ctx)
+        cache_key = make_cache_key(model, system_prompt, message)
+        cached = self._cache_lookup(cache_key)
+        if cached is not None:
+            return self._finish(ctx, cached, cached=True)
+        messages = _build_messages(message, system_prompt, model)
+
+        async def _make_request(remaining: Optional[float]) -> Tuple[str, Optional[TokenUsage]]:
+            ctx.attempts += 1
+            with span("rate_limit_wait"):
+                ctx.rate_limit_wait += await self.rate_limiter.acquire_async(
+                    timeout=self._limiter_timeout(remaining)
                 )
-                
-                if response.choices and len(response.choices) > 0:
-                    return response.choices[0].message.content
-                else:
-                    raise ValueError("Resposta da API não contém choices válidas")
-                    
-            except (AuthenticationError, PermissionDeniedError) as e:
-                raise InvalidAPIKeyError("API key inválida ou não autorizada")
-            except APIConnectionError as e:
-                raise OpenRouterConnectionError(f"Erro de conexão: {str(e)}")
-            except APITimeoutError as e:
-                raise OpenRouterConnectionError(f"Timeout na conexão: {str(e)}")
+            slot = await self._aconcurrency_slot(model, remaining)
+            attempt_started = _attempt_started()
+            error = None
+            try:
+                with span("http"):
+                    raw = await self.client.chat.completions.with_raw_response.create(
+                        model=model,
+                        messages=messages,
+                        **request_options,
+                        timeout=self._attempt_timeout(remaining)
+                    )
+                with span("parse"):
+                    response = raw.parse()
+                    return _parse_response(response), _parse_usage(response)
             except Exception as e:
-                error_message = str(e)
-                
-                if "401" in error_message or "Unauthorized" in error_message or "authentication" in error_message.lower() or "permission" in error_message.lower():
-                    raise InvalidAPIKeyError("API key inválida ou não autorizada")
-                elif "429" in error_message or "rate limit" in error_message.lower():
-                    raise RateLimitError("Rate limit excedido. Tente novamente mais tarde")
-                elif "timeout" in error_message.lower():
-                    raise OpenRouterConnectionError(f"Timeout na conexão: {error_message}")
-                elif "connection" in error_message.lower() or "connect" in error_message.lower():
-                    raise OpenRouterConnectionError(f"Erro de conexão: {error_message}")
-                else:
-                    raise ValueError(f"Erro na requisição: {error_message}")
+                error = _map_api_error(e)
+                raise error
+            finally:
+                ctx.upstream_latency = time.perf_counter() - attempt_started
+                if slot:
+                    slot.release(error)
 
         try:
-            return retry_with_backoff(
+            text, usage = await async_retry_call(
                 _make_request,
-                max_retries=self.max_retries,
-                base_delay=self.config.retry_delay
+                self.retry_policy,
+                self.circuit_breakers.get(model),
+                on_retry=self._on_retry(ctx)
             )
-        except (InvalidAPIKeyError, RateLimitError, OpenRouterConnectionError):
-            raise
         except Exception as e:
-            raise ValueError(f"Erro na requisição: {str(e)}")
+            raise self._fail(ctx, e)
+        self._cache_store(cache_key, model, text)
+        return self._finish(ctx, text, usage)
 
-    def validate_api_key(self) -> bool:
-        """Valida a API key."""
-        if not self.api_key or not isinstance(self.api_key, str):
-            return False
-        if len(self.api_key.strip()) == 0:
-            return False
-        return self.api_key.startswith('sk-or-')
\ No newline at end of file
+    async def close(self) -> None:
+        """Fecha as conexões HTTP do cliente (o pool compartilhado continua aberto)."""
+        if self._client is not None and (self._uses_cassette or not self.config.http_shared_pool):
+            await self._client.close()
+
+    async def __aenter__(self) -> "AsyncOpenRouterClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
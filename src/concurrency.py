@@ -0,0 +1,232 @@
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .config import AppConfig
+from .exceptions import ConnectionError as OpenRouterConnectionError
+from .exceptions import RateLimitError, ServerError
+
+# Erros que indicam sobrecarga: o limite cai na hora, sem esperar pela latência
+CONGESTION_ERRORS = (RateLimitError, ServerError, OpenRouterConnectionError)
+
+
+class ConcurrencySlot:
+    """Vaga ocupada por uma tentativa; devolvida com ``release(erro)``"""
+
+    def __init__(self, limit: "AdaptiveLimit", generation: int):
+        self._limit = limit
+        self._generation = generation
+        self._started_at = time.monotonic()
+        self._released = False
+
+    def release(self, error: Optional[BaseException] = None) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._limit._release(time.monotonic() - self._started_at, error, self._generation)
+
+
+class AdaptiveLimit:
+    """Limite de requisições simultâneas de um modelo, ajustado pelas respostas (AIMD).
+
+    Como no AIMDLimit do concurrency-limits da Netflix: cada resposta rápida
+    soma ``1 / limite`` (cerca de +1 por ciclo de requisições; +1 por resposta
+    até o primeiro corte, como o slow start do TCP). Rate limit (429), erro de
+    servidor, timeout ou falha de conexão multiplicam o limite por
+    ``backoff``; latência recente acima de ``tolerance`` vezes a de referência
+    (mínimo observado, que sobe devagar) multiplica por ``latency_backoff``.
+    A latência só é considerada com ao menos metade das vagas em uso. Cada
+    corte vale uma vez por geração: requisições que já estavam em voo quando
+    ele aconteceu não cortam de novo.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        backoff: float = 0.75,
+        latency_backoff: float = 0.9,
+        tolerance: float = 2.0,
+        short_window: int = 10,
+        baseline_drift: float = 0.001
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_backoff = latency_backoff
+        self.tolerance = tolerance
+        self.baseline_drift = baseline_drift
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.inflight = 0
+        self.queued = 0
+        self.drops = 0
+        self.requests = 0
+        self.baseline_latency: Optional[float] = None
+        self.short_latency: Optional[float] = None
+        self._short_alpha = 2 / (short_window + 1)
+        self._slow_start = True
+        self._generation = 0
+        self._cond = threading.Condition()
+
+    @property
+    def capacity(self) -> int:
+        """Número de vagas (parte inteira do limite)"""
+        return max(self.min_limit, int(self.limit))
+
+    def _take(self) -> ConcurrencySlot:
+        self.inflight += 1
+        return ConcurrencySlot(self, self._generation)
+
+    def try_acquire(self) -> Optional[ConcurrencySlot]:
+        with self._cond:
+            if self.inflight < self.capacity:
+                return self._take()
+            return None
+
+    def acquire(self, timeout: Optional[float] = None) -> ConcurrencySlot:
+        """Espera por uma vaga; levanta RateLimitError após ``timeout`` segundos"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if self.inflight < self.capacity:
+                return self._take()
+            self.queued += 1
+            try:
+                while self.inflight >= self.capacity:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise RateLimitError(
+                            f"Limite de concorrência atingido: {self.capacity} requisições em andamento"
+                        )
+                    self._cond.wait(remaining)
+                return self._take()
+            finally:
+                self.queued -= 1
+
+    async def acquire_async(self, timeout: Optional[float] = None, poll: float = 0.01) -> ConcurrencySlot:
+        """Como acquire, sem bloquear o event loop"""
+        import asyncio
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        slot = self.try_acquire()
+        if slot is not None:
+            return slot
+        with self._cond:
+            self.queued += 1
+        try:
+            while True:
+                await asyncio.sleep(poll)
+                slot = self.try_acquire()
+                if slot is not None:
+                    return slot
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise RateLimitError(
+                        f"Limite de concorrência atingido: {self.capacity} requisições em andamento"
+                    )
+                poll = min(poll * 2, 0.1)
+        finally:
+            with self._cond:
+                self.queued -= 1
+
+    def _release(self, latency: float, error: Optional[BaseException], generation: int) -> None:
+        with self._cond:
+            inflight = self.inflight
+            self.inflight -= 1
+            self.requests += 1
+            if isinstance(error, CONGESTION_ERRORS):
+                self.drops += 1
+                self._decrease(self.backoff, generation)
+            elif error is None:
+                self._observe(latency, inflight, generation)
+            self._cond.notify_all()
+
+    def _decrease(self, factor: float, generation: int) -> None:
+        if generation != self._generation:
+            return
+        self._generation += 1
+        self._slow_start = False
+        self.limit = max(self.min_limit, self.limit * factor)
+
+    def _observe(self, latency: float, inflight: int, generation: int) -> None:
+        if self.baseline_latency is None:
+            self.baseline_latency = self.short_latency = latency
+            return
+        self.baseline_latency = min(latency, self.baseline_latency * (1 + self.baseline_drift))
+        self.short_latency += self._short_alpha * (latency - self.short_latency)
+        # Sem usar nem metade das vagas, a latência não diz nada sobre o limite
+        if inflight * 2 < self.limit:
+            return
+        if self.short_latency > self.tolerance * self.baseline_latency:
+            self._decrease(self.latency_backoff, generation)
+            return
+        step = 1.0 if self._slow_start else 1.0 / self.limit
+        self.limit = min(self.max_limit, self.limit + step)
+
+    def metrics(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                "limit": round(self.limit, 2),
+                "inflight": self.inflight,
+                "queued": self.queued,
+                "requests": self.requests,
+                "drops": self.drops,
+                "latency": round(self.short_latency or 0.0, 4),
+                "baseline_latency": round(self.baseline_latency or 0.0, 4),
+            }
+
+
+class AdaptiveConcurrency:
+    """Um AdaptiveLimit por modelo, criado sob demanda"""
+
+    def __init__(self, initial_limit: int = 4, min_limit: int = 1, max_limit: int = 64):
+        self.initial_limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self._limits: Dict[str, AdaptiveLimit] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: AppConfig) -> "AdaptiveConcurrency":
+        return cls(
+            config.concurrency_initial_limit,
+            config.concurrency_min_limit,
+            config.concurrency_max_limit
+        )
+
+    def get(self, model: str) -> AdaptiveLimit:
+        with self._lock:
+            limit = self._limits.get(model)
+            if limit is None:
+                limit = AdaptiveLimit(self.initial_limit, self.min_limit, self.max_limit)
+                self._limits[model] = limit
+            return limit
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """Limite atual, requisições em voo e fila de cada modelo"""
+        with self._lock:
+            limits = dict(self._limits)
+        return {model: limit.metrics() for model, limit in sorted(limits.items())}
+
+    def render_prometheus(self) -> List[str]:
+        """Gauges no formato do Prometheus (ver PrometheusExporter.add_collector)"""
+        return render_concurrency_gauges([({}, self)])
+
+
+def render_concurrency_gauges(sources: Sequence[Tuple[Dict[str, str], AdaptiveConcurrency]]) -> List[str]:
+    """Gauges de vários AdaptiveConcurrency, cada um com seus labels extras (ex.: a API key)"""
+    from .instrumentation import _labels
+
+    gauges = [
+        ("limit", "Limite de concorrência adaptativo atual"),
+        ("inflight", "Requisições em andamento"),
+        ("queued", "Requisições esperando uma vaga"),
+    ]
+    snapshots = [(labels, concurrency.metrics()) for labels, concurrency in sources]
+    lines: List[str] = []
+    for key, description in gauges:
+        name = f"openrouter_concurrency_{key}"
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} gauge"]
+        for labels, metrics in snapshots:
+            for model, values in metrics.items():
+                lines.append(f"{name}{_labels(model=model, **labels)} {values[key]:g}")
+    return lines
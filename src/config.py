@@ -1,9 +1,18 @@
-from dataclasses import dataclass
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Tuple
 
 EXIT_COMMANDS = ['sair', 'exit', 'quit', 'voltar']
 API_KEY_ERROR_KEYWORDS = ["API key", "não autorizada", "inválida"]
 RETRY_API_KEY_SIGNAL = "retry_api_key"
 MAX_INPUT_LENGTH = 10000
+MAX_NOTES_INPUT_LENGTH = 1_000_000
+NOTES_CHUNK_SIZE = 8000
+NOTES_CHUNK_OVERLAP = 400
+NOTES_MAX_PARALLEL_CHUNKS = 8
+NOTES_REDUCE_MAX_LENGTH = 60000
+CONFIG_DIR = Path.home() / ".openrouter"
 
 SUPPORTED_MODELS = {
     "gpt-4o-mini",
@@ -15,13 +24,125 @@ SUPPORTED_MODELS = {
     "llama-3.1-70b-instruct",
 }
 
+# Família de cada modelo: define o formato do prompt caching e a tokenização
+MODEL_FAMILIES = {
+    "gpt-4o-mini": "openai",
+    "gpt-4o": "openai",
+    "claude-3-haiku": "anthropic",
+    "claude-3-sonnet": "anthropic",
+    "claude-3-opus": "anthropic",
+    "llama-3.1-8b-instruct": "llama",
+    "llama-3.1-70b-instruct": "llama",
+}
+
+# Janela de contexto (entrada + saída) e máximo de tokens gerados, por modelo
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4o-mini": 128_000,
+    "gpt-4o": 128_000,
+    "claude-3-haiku": 200_000,
+    "claude-3-sonnet": 200_000,
+    "claude-3-opus": 200_000,
+    "llama-3.1-8b-instruct": 131_072,
+    "llama-3.1-70b-instruct": 131_072,
+}
+
+MODEL_MAX_OUTPUT_TOKENS = {
+    "gpt-4o-mini": 16_384,
+    "gpt-4o": 16_384,
+    "claude-3-haiku": 4_096,
+    "claude-3-sonnet": 4_096,
+    "claude-3-opus": 4_096,
+    "llama-3.1-8b-instruct": 8_192,
+    "llama-3.1-70b-instruct": 8_192,
+}
+
+# Preço estimado em USD por milhão de tokens (entrada, saída), usado pelo roteador do modelo auto
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "claude-3-haiku": (0.25, 1.25),
+    "claude-3-sonnet": (3.00, 15.00),
+    "claude-3-opus": (15.00, 75.00),
+    "llama-3.1-8b-instruct": (0.02, 0.05),
+    "llama-3.1-70b-instruct": (0.12, 0.30),
+}
+
+# Modelo escolhido a cada requisição pelo ModelRouter
+AUTO_MODEL = "auto"
+
 
 @dataclass
 class AppConfig:
     """Configuração centralizada da aplicação"""
-    default_model: str = "gpt-4o-mini"
+    default_model: str = field(default_factory=lambda: os.getenv("OPENROUTER_MODEL", "gpt-4o-mini"))
     default_timeout: int = 30
-    openrouter_base_url: str = "https://openrouter.ai/api/v1"
+    openrouter_base_url: str = field(
+        default_factory=lambda: os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+    )
     max_retries: int = 3
     retry_delay: float = 1.0
+    retry_max_delay: float = 20.0
+    request_deadline: float = 90.0
+    circuit_failure_threshold: int = 5
+    circuit_reset_timeout: float = 30.0
+    rate_limit_calls: int = 10
+    rate_limit_window: int = 60
+    rate_limit_max_wait: float = 60.0
+    rate_limit_shared: bool = False
+    # Fila de prioridade do rate limiter (ver PriorityRateLimiter)
+    default_priority: str = "interactive"
+    priority_weights: Dict[str, float] = field(
+        default_factory=lambda: {"interactive": 16.0, "api": 4.0, "batch": 1.0}
+    )
+    priority_aging: float = 1.0
+    # Concorrência adaptativa por modelo (ver AdaptiveConcurrency); desligada por padrão
+    adaptive_concurrency: bool = False
+    concurrency_initial_limit: int = 4
+    concurrency_min_limit: int = 1
+    concurrency_max_limit: int = 64
+    # Roteamento do modelo auto (ver ModelRouter): objetivo "latency" (menor p95 com
+    # custo até router_max_cost USD por requisição) ou "cost" (mais barato com p95 até
+    # router_latency_slo segundos)
+    router_objective: str = "latency"
+    router_max_cost: float = 0.0
+    router_latency_slo: float = 10.0
+    router_max_error_rate: float = 0.2
+    router_exploration: float = 0.05
+    router_models: Tuple[str, ...] = ()
+    router_fallback: str = "gpt-4o-mini"
+    router_history_size: int = 256
+    # Pool HTTP compartilhado entre os clientes do processo (ver SharedTransport)
+    http_shared_pool: bool = True
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 90.0
+    http2: bool = True
+    # Gravação/reprodução de requisições (ver Cassette); desligadas quando vazias
+    cassette_record_path: str = field(default_factory=lambda: os.getenv("OPENROUTER_RECORD", ""))
+    cassette_replay_path: str = field(default_factory=lambda: os.getenv("OPENROUTER_REPLAY", ""))
+    cassette_replay_speed: float = field(
+        default_factory=lambda: float(os.getenv("OPENROUTER_REPLAY_SPEED", "1.0"))
+    )
+    # Histórico local das gerações (ver HistoryStore); OPENROUTER_HISTORY=0 desliga
+    history_enabled: bool = field(default_factory=lambda: os.getenv("OPENROUTER_HISTORY", "1") != "0")
+    history_retention_days: float = 180
+    history_max_entries: int = 100_000
+    cache_ttl: float = 7 * 24 * 3600
+    cache_max_bytes: int = 50 * 1024 * 1024
+    # Hedging entre modelos (ver HedgePolicy)
+    hedge_percentile: float = 0.95
+    hedge_initial_delay: float = 2.0
+    hedge_min_delay: float = 0.2
+    # Reuso de respostas para inputs quase idênticos (ver NearDuplicateIndex)
+    near_duplicate_threshold: float = 0.8
+    near_duplicate_max_entries: int = 200_000
+    near_duplicate_ttl: float = 30 * 24 * 3600
+    # Sessões de refinamento (ver AgentSession): turnos guardados e orçamento,
+    # em tokens, do pedido original e das instruções anteriores enviados a cada refinamento
+    session_max_turns: int = 20
+    session_context_tokens: int = 150
+    # Exportação de métricas por requisição (desligada quando vazio)
+    metrics_jsonl_path: str = field(default_factory=lambda: os.getenv("OPENROUTER_METRICS_JSONL", ""))
+    metrics_prometheus_path: str = field(default_factory=lambda: os.getenv("OPENROUTER_METRICS_PROM", ""))
+    metrics_port: int = field(default_factory=lambda: int(os.getenv("OPENROUTER_METRICS_PORT", "0")))
 
@@ -1,3 +1,6 @@
+from typing import Optional
+
+
 class OpenRouterError(Exception):
     """Base exception for OpenRouter errors"""
     pass
@@ -10,10 +13,25 @@ class InvalidAPIKeyError(OpenRouterError):
 
 class RateLimitError(OpenRouterError):
     """Raised when rate limit is exceeded"""
-    pass
+
+    def __init__(self, message: str = "", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
 
 
 class ConnectionError(OpenRouterError):
     """Raised when connection fails or timeout occurs"""
     pass
 
+
+class ServerError(OpenRouterError):
+    """Raised when the provider answers with a 5xx status"""
+
+    def __init__(self, message: str = "", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(OpenRouterError):
+    """Raised when a model's circuit breaker is open and calls fail fast"""
+    pass
@@ -0,0 +1,182 @@
+"""Execução de um mesmo input em vários agentes/modelos e pipelines entre agentes."""
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .agents.base import BaseAgent
+from .instrumentation import TokenUsage
+from .profiler import carry_context
+
+
+@dataclass
+class FanoutTarget:
+    """Um agente, opcionalmente com um modelo específico"""
+    agent: BaseAgent
+    model: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        return f"{self.agent.name}@{self.model}" if self.model else self.agent.name
+
+
+@dataclass
+class FanoutResult:
+    label: str
+    agent: str
+    model: Optional[str]
+    output: str = ""
+    error: Optional[str] = None
+    latency: float = 0.0
+    time_to_first_token: Optional[float] = None
+    usage: Optional[TokenUsage] = None
+    started_at: float = 0.0     # segundos desde o início do fan-out/pipeline
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _consume(target: FanoutTarget, text: str, origin: float, on_delta: Optional[Callable[[str], None]] = None) -> FanoutResult:
+    """Executa ``target`` em streaming e mede latência, TTFT e tokens"""
+    started = time.perf_counter()
+    result = FanoutResult(target.label, target.agent.name, target.model, started_at=started - origin)
+    try:
+        stream = target.agent.run_stream(text, target.model)
+        for delta in stream:
+            if on_delta:
+                on_delta(delta)
+        result.output = stream.text
+        result.time_to_first_token = stream.time_to_first_token
+        if stream.result is not None:
+            result.model = stream.result.model
+            result.usage = stream.result.usage
+    except Exception as e:
+        result.error = str(e) or type(e).__name__
+    result.latency = time.perf_counter() - started
+    return result
+
+
+def fan_out(text: str, targets: Sequence[FanoutTarget], max_workers: Optional[int] = None) -> Iterator[FanoutResult]:
+    """Envia ``text`` a todos os alvos em paralelo e produz os resultados conforme terminam.
+
+    Falhas de um alvo viram ``FanoutResult.error`` e não interrompem os demais.
+    """
+    origin = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers or len(targets) or 1) as executor:
+        consume = carry_context(_consume)
+        futures = [executor.submit(consume, target, text, origin) for target in targets]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+@dataclass
+class PipelineStage:
+    """Estágio de um pipeline; ``ready(parcial)`` decide quando a saída do estágio
+    anterior já basta para começar (padrão: esperar a saída completa). Com
+    ``ready``, o estágio recebe só essa saída parcial, nunca o restante."""
+    agent: BaseAgent
+    model: Optional[str] = None
+    ready: Optional[Callable[[str], bool]] = None
+
+
+def min_chars(count: int) -> Callable[[str], bool]:
+    """Critério de handoff: começa com os primeiros ``count`` caracteres da saída anterior"""
+    return lambda text: len(text) >= count
+
+
+_DONE = object()
+
+
+class Pipeline:
+    """Encadeia agentes: a saída de cada estágio é o input do seguinte.
+
+    Cada estágio roda em sua própria thread e começa assim que o anterior
+    termina ou, com ``ready``, assim que a saída parcial for suficiente — o
+    estágio anterior continua em streaming em paralelo. ``stream()`` produz
+    ``(índice do estágio, delta)`` na ordem dos estágios, e ``results`` traz
+    latência e tokens de cada um ao final.
+
+    Um estágio iniciado com saída parcial não recebe o restante: ``truncated``
+    traz, por estágio, quantos caracteres ele recebeu e quantos o anterior gerou.
+    """
+
+    def __init__(self, stages: Sequence[PipelineStage]):
+        if not stages:
+            raise ValueError("Pipeline precisa de ao menos um estágio")
+        self.stages = list(stages)
+        self.results: List[Optional[FanoutResult]] = [None] * len(self.stages)
+        self.truncated: Dict[int, Tuple[int, int]] = {}
+        self._queues: List["queue.Queue"] = [queue.Queue() for _ in self.stages]
+        self._origin = 0.0
+
+    def _start(self, index: int, text: str) -> None:
+        threading.Thread(target=carry_context(self._run_stage), args=(index, text), daemon=True).start()
+
+    def _run_stage(self, index: int, text: str) -> None:
+        stage = self.stages[index]
+        following = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        handed_off: Optional[str] = None
+        parts: List[str] = []
+
+        def on_delta(delta: str) -> None:
+            nonlocal handed_off
+            parts.append(delta)
+            self._queues[index].put(delta)
+            if following is not None and handed_off is None and following.ready:
+                partial = "".join(parts)
+                if following.ready(partial):
+                    handed_off = partial
+                    self._start(index + 1, partial)
+
+        target = FanoutTarget(stage.agent, stage.model)
+        result = _consume(target, text, self._origin, on_delta)
+        self.results[index] = result
+        if handed_off is not None and len(result.output) > len(handed_off):
+            self.truncated[index + 1] = (len(handed_off), len(result.output))
+        self._queues[index].put(_DONE)
+        if handed_off is not None or following is None:
+            return
+        if result.ok and result.output:
+            self._start(index + 1, result.output)
+            return
+        # Estágio falhou: os seguintes não rodam
+        for skipped in range(index + 1, len(self.stages)):
+            agent = self.stages[skipped].agent
+            self.results[skipped] = FanoutResult(
+                agent.name, agent.name, self.stages[skipped].model,
+                error=f"não executado: {self.stages[index].agent.name} falhou"
+            )
+            self._queues[skipped].put(_DONE)
+
+    def stream(self, text: str) -> Iterator[Tuple[int, str]]:
+        self._origin = time.perf_counter()
+        self._start(0, text)
+        for index, deltas in enumerate(self._queues):
+            while True:
+                delta = deltas.get()
+                if delta is _DONE:
+                    break
+                yield index, delta
+
+    def run(self, text: str) -> List[FanoutResult]:
+        for _ in self.stream(text):
+            pass
+        return [result for result in self.results if result is not None]
+
+
+def comparison_table(results: Sequence[FanoutResult]) -> str:
+    """Tabela lado a lado de latência, TTFT e tokens"""
+    header = f"{'alvo':<36}{'modelo':<24}{'início':>8}{'latência':>10}{'TTFT':>8}{'entrada':>9}{'saída':>8}{'cache':>7}  status"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        usage = r.usage or TokenUsage()
+        ttft = f"{r.time_to_first_token:.2f}s" if r.time_to_first_token is not None else "-"
+        lines.append(
+            f"{r.label:<36}{(r.model or '-'):<24}{r.started_at:>7.2f}s{r.latency:>9.2f}s{ttft:>8}"
+            f"{usage.prompt_tokens:>9}{usage.completion_tokens:>8}{usage.cached_tokens:>7}"
+            f"  {'ok' if r.ok else 'erro: ' + r.error}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,347 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from .client import MessageStream, OpenRouterClient, on_attempt_started
+from .config import SUPPORTED_MODELS, AppConfig
+from .exceptions import CircuitOpenError
+from .instrumentation import CompletionResult
+from .profiler import carry_context
+from .retry import RETRYABLE_ERRORS
+
+# Erros em que vale a pena tentar outro modelo; API key inválida ou requisição
+# malformada falhariam do mesmo jeito no fallback
+FALLBACK_ERRORS = (*RETRYABLE_ERRORS, CircuitOpenError)
+
+# Intervalo para conferir se a chamada já saiu da fila do rate limiter
+_QUEUE_POLL = 0.01
+
+
+@dataclass
+class HedgePolicy:
+    """Modelo principal e fallbacks de um agente.
+
+    Se o principal não responder (ou não enviar o primeiro token, em
+    streaming) até o percentil ``percentile`` das latências recentes, a mesma
+    requisição é disparada no próximo fallback e vence quem terminar antes.
+    Enquanto não houver ``min_samples`` amostras, usa ``initial_delay``.
+    Sem ``primary``, o principal é o modelo do cliente.
+    """
+    primary: Optional[str] = None
+    fallbacks: Sequence[str] = ()
+    percentile: float = 0.95
+    initial_delay: float = 2.0
+    min_delay: float = 0.2
+    min_samples: int = 20
+    fallback_on_error: bool = True
+
+    def __post_init__(self) -> None:
+        for model in [self.primary, *self.fallbacks]:
+            if model and model not in SUPPORTED_MODELS:
+                raise ValueError(f"Modelo '{model}' não suportado")
+
+    @classmethod
+    def from_config(cls, config: AppConfig, **kwargs: Any) -> "HedgePolicy":
+        kwargs.setdefault("percentile", config.hedge_percentile)
+        kwargs.setdefault("initial_delay", config.hedge_initial_delay)
+        kwargs.setdefault("min_delay", config.hedge_min_delay)
+        return cls(**kwargs)
+
+    def candidates(self, model: Optional[str], default: str) -> List[str]:
+        """Modelo principal seguido dos fallbacks, sem repetições"""
+        primary = model or self.primary or default
+        return [primary] + [m for m in dict.fromkeys(self.fallbacks) if m != primary]
+
+
+@dataclass
+class HedgeReport:
+    """Qual modelo respondeu e quanto tempo o hedge economizou"""
+    primary: str
+    winner: str
+    hedged: bool = False            # algum fallback chegou a ser disparado
+    reason: Optional[str] = None    # "slow" (atraso) ou "error" (falha do principal)
+    latency: float = 0.0
+    saved: Optional[float] = None   # estimativa, a partir do histórico do principal
+
+    @property
+    def fallback_won(self) -> bool:
+        return self.winner != self.primary
+
+
+class LatencyTracker:
+    """Janela das latências recentes de cada modelo"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, latency: float) -> None:
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(latency)
+
+    def count(self, key: str) -> int:
+        with self._lock:
+            return len(self._samples.get(key, ()))
+
+    def percentile(self, key: str, p: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+    def expected_remaining(self, key: str, elapsed: float) -> Optional[float]:
+        """Quanto ainda faltaria, em média, para uma chamada que já dura ``elapsed``"""
+        with self._lock:
+            slower = [s for s in self._samples.get(key, ()) if s > elapsed]
+        if not slower:
+            return None
+        return sum(slower) / len(slower) - elapsed
+
+
+@dataclass
+class HedgeStats:
+    requests: int = 0
+    hedged: int = 0
+    fallback_wins: int = 0
+    error_fallbacks: int = 0
+    saved: float = 0.0              # medido quando o principal perdedor termina em segundo plano
+    wins: Dict[str, int] = field(default_factory=dict)
+
+    def record(self, report: HedgeReport) -> None:
+        self.requests += 1
+        self.hedged += report.hedged
+        self.fallback_wins += report.fallback_won
+        self.error_fallbacks += report.reason == "error"
+        self.wins[report.winner] = self.wins.get(report.winner, 0) + 1
+
+
+class HedgedClient:
+    """Envolve um OpenRouterClient com hedging e fallback entre modelos.
+
+    Tem a mesma interface de envio do cliente; a política é escolhida pelo
+    ``agent`` da requisição (``policies``) ou ``default``. Sem fallbacks, a
+    chamada vai direto ao cliente.
+
+    O SDK síncrono não interrompe uma requisição em andamento: o perdedor de
+    um envio comum termina em segundo plano (limitado pelo timeout) e só
+    alimenta o histórico de latência; streams perdedores são fechados.
+    """
+
+    def __init__(
+        self,
+        client: OpenRouterClient,
+        policies: Optional[Dict[str, HedgePolicy]] = None,
+        default: Optional[HedgePolicy] = None,
+        max_workers: int = 32
+    ):
+        self.client = client
+        self.policies = dict(policies or {})
+        self.default = default
+        self.latencies = LatencyTracker()
+        self.stats = HedgeStats()
+        self._stats_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+
+    def __getattr__(self, name: str) -> Any:
+        # model, cache, hooks, validate_api_key... vêm do cliente envolvido
+        return getattr(self.client, name)
+
+    def policy_for(self, agent: Optional[str]) -> Optional[HedgePolicy]:
+        return self.policies.get(agent or "", self.default)
+
+    def _hedge_delay(self, policy: HedgePolicy, key: str) -> float:
+        if self.latencies.count(key) < policy.min_samples:
+            return policy.initial_delay
+        return max(policy.min_delay, self.latencies.percentile(key, policy.percentile))
+
+    def _race(
+        self,
+        models: List[str],
+        call: Callable[[str], Any],
+        policy: HedgePolicy,
+        metric: str,
+        discard: Callable[[Any], None]
+    ) -> Tuple[Any, HedgeReport]:
+        """Dispara ``call(model)`` no principal e, se preciso, nos fallbacks; retorna o primeiro sucesso.
+
+        O atraso conta a partir de quando a chamada sai da fila local: enquanto
+        ela espera o rate limiter, o fallback só entraria na mesma fila.
+        """
+        started = time.perf_counter()
+        report = HedgeReport(primary=models[0], winner=models[0])
+        # Modelo e instante em que a chamada saiu da fila local (vazio enquanto espera)
+        pending: Dict[Future, Tuple[str, List[float]]] = {}
+        queue = list(models)
+        errors: List[Exception] = []
+        done_event = threading.Event()
+        discarded: set = set()
+        discard_lock = threading.Lock()
+
+        def discard_once(future: Future) -> None:
+            with discard_lock:
+                if future in discarded:
+                    return
+                discarded.add(future)
+            discard(future.result()[0])
+
+        def timed(model: str, granted: List[float]) -> Tuple[Any, float]:
+            launched = time.perf_counter()
+
+            def attempt_started() -> None:
+                if not granted:
+                    granted.append(time.perf_counter())
+
+            token = on_attempt_started.set(attempt_started)
+            try:
+                value = call(model)
+            finally:
+                on_attempt_started.reset(token)
+            return value, time.perf_counter() - (granted[0] if granted else launched)
+
+        def on_done(future: Future) -> None:
+            model, _ = pending_info[future]
+            if future.cancelled() or future.exception() is not None:
+                return
+            latency = future.result()[1]
+            self.latencies.record(f"{model}:{metric}", latency)
+            # Terminou depois que outro modelo já venceu
+            if done_event.is_set() and future is not winner_future[0]:
+                discard_once(future)
+                if model == models[0] and winner_future[0] is not None:
+                    self._record_saved(latency - report.latency)
+
+        pending_info: Dict[Future, Tuple[str, List[float]]] = {}
+        winner_future: List[Optional[Future]] = [None]
+        last_granted: List[List[float]] = []
+
+        def launch() -> None:
+            model = queue.pop(0)
+            granted: List[float] = []
+            future = self._executor.submit(carry_context(timed), model, granted)
+            pending[future] = pending_info[future] = (model, granted)
+            last_granted[:] = [granted]
+            future.add_done_callback(on_done)
+
+        launch()
+        delay = self._hedge_delay(policy, f"{models[0]}:{metric}")
+        try:
+            while pending:
+                timeout = None
+                granted = list(last_granted[0])
+                if queue:
+                    timeout = max(0.0, granted[0] + delay - time.perf_counter()) if granted else _QUEUE_POLL
+                done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    if not granted:
+                        continue
+                    report.hedged = True
+                    report.reason = report.reason or "slow"
+                    launch()
+                    delay = self._hedge_delay(policy, f"{models[0]}:{metric}")
+                    continue
+                for future in done:
+                    model, _ = pending.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        winner_future[0] = future
+                        done_event.set()
+                        value, _ = future.result()
+                        report.winner = model
+                        report.latency = time.perf_counter() - started
+                        primary_launch = next(
+                            (g[0] for m, g in pending.values() if m == models[0] and g), None
+                        )
+                        if primary_launch is not None:
+                            report.saved = self.latencies.expected_remaining(
+                                f"{models[0]}:{metric}", time.perf_counter() - primary_launch
+                            )
+                        return value, report
+                    errors.append(error)
+                    if not (policy.fallback_on_error and isinstance(error, FALLBACK_ERRORS)):
+                        raise error
+                    if queue and not pending:
+                        report.hedged = True
+                        report.reason = report.reason or "error"
+                        launch()
+            raise errors[-1]
+        finally:
+            done_event.set()
+            for future in pending:
+                if not future.cancel() and future.done() and future.exception() is None:
+                    discard_once(future)
+
+    def _record(self, report: HedgeReport) -> None:
+        with self._stats_lock:
+            self.stats.record(report)
+
+    def _record_saved(self, seconds: float) -> None:
+        with self._stats_lock:
+            self.stats.saved += max(0.0, seconds)
+
+    def send_message(
+        self,
+        message: str,
+        model: Optional[str] = None,
+        system_prompt: Optional[str] = None,
+        agent: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        """Como OpenRouterClient.send_message, com hedging conforme a política do agente."""
+        return self.send_message_result(message, model, system_prompt, agent, max_tokens).text
+
+    def send_message_result(
+        self,
+        message: str,
+        model: Optional[str] = None,
+        system_prompt: Optional[str] = None,
+        agent: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> CompletionResult:
+        """Resultado do modelo vencedor; ``result.hedge`` traz o HedgeReport."""
+        policy = self.policy_for(agent)
+        models = policy.candidates(model, self.client.model) if policy else [model or self.client.model]
+        if len(models) == 1:
+            return self.client.send_message_result(message, models[0], system_prompt, agent, max_tokens)
+
+        result, report = self._race(
+            models,
+            lambda m: self.client.send_message_result(message, m, system_prompt, agent, max_tokens),
+            policy,
+            "latency",
+            discard=lambda _: None
+        )
+        self._record(report)
+        return replace(result, hedge=report)
+
+    def send_message_stream(
+        self,
+        message: str,
+        model: Optional[str] = None,
+        system_prompt: Optional[str] = None,
+        agent: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> MessageStream:
+        """Stream do modelo que enviar o primeiro token antes; ``stream.hedge`` traz o HedgeReport."""
+        policy = self.policy_for(agent)
+        models = policy.candidates(model, self.client.model) if policy else [model or self.client.model]
+        if len(models) == 1:
+            return self.client.send_message_stream(message, models[0], system_prompt, agent, max_tokens)
+
+        stream, report = self._race(
+            models,
+            lambda m: self.client.send_message_stream(message, m, system_prompt, agent, max_tokens),
+            policy,
+            "ttft",
+            discard=lambda loser: loser.close()
+        )
+        self._record(report)
+        stream.hedge = report
+        return stream
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
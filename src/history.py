@@ -0,0 +1,306 @@
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import CONFIG_DIR
+
+DEFAULT_HISTORY_PATH = CONFIG_DIR / "history.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    agent TEXT NOT NULL,
+    model TEXT NOT NULL,
+    input TEXT NOT NULL,
+    output TEXT NOT NULL,
+    latency REAL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    cached INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_generations_created ON generations(created_at);
+CREATE INDEX IF NOT EXISTS idx_generations_agent ON generations(agent, created_at);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+# Índice full-text sobre input e output, mantido pelos triggers
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS generations_fts USING fts5(
+    input, output, content='generations', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS generations_ai AFTER INSERT ON generations BEGIN
+    INSERT INTO generations_fts(rowid, input, output) VALUES (new.id, new.input, new.output);
+END;
+CREATE TRIGGER IF NOT EXISTS generations_ad AFTER DELETE ON generations BEGIN
+    INSERT INTO generations_fts(generations_fts, rowid, input, output)
+    VALUES ('delete', old.id, old.input, old.output);
+END;
+"""
+
+_COLUMNS = "id, created_at, agent, model, input, output, latency, prompt_tokens, completion_tokens, cached"
+
+_Row = Tuple[float, str, str, str, str, Optional[float], Optional[int], Optional[int], int]
+
+
+@dataclass
+class HistoryEntry:
+    """Uma geração registrada no histórico"""
+    id: int
+    created_at: float
+    agent: str
+    model: str
+    input: str
+    output: str
+    latency: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached: bool = False
+
+
+def _match_query(text: str) -> str:
+    """Consulta FTS5 em que cada termo é literal e o último casa por prefixo"""
+    terms = ['"%s"' % term.replace('"', '""') for term in text.split()]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+class HistoryStore:
+    """Histórico local das gerações dos agentes em SQLite, com busca full-text (FTS5).
+
+    ``record`` só enfileira a geração: uma thread grava a fila em lotes (uma
+    transação por lote, a cada ``flush_interval`` segundos ou
+    ``batch_size`` gerações), então registrar não custa nada perceptível à
+    requisição. Ao abrir, e no máximo uma vez por dia, gerações mais antigas
+    que ``retention_days`` ou além das ``max_entries`` mais recentes são
+    removidas. Como no cache, erros do SQLite nunca interrompem uma
+    requisição.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        retention_days: float = 180,
+        max_entries: int = 100_000,
+        flush_interval: float = 0.5,
+        batch_size: int = 256
+    ):
+        self.path = Path(path) if path else DEFAULT_HISTORY_PATH
+        self.retention_days = retention_days
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.fts = True
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._queue: "queue.Queue[Optional[_Row]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                str(self.path), timeout=10.0, isolation_level=None, check_same_thread=False
+            )
+            # Só tem efeito em um banco novo; permite devolver espaço na compactação
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            try:
+                conn.executescript(_FTS_SCHEMA)
+            except sqlite3.OperationalError:
+                # SQLite sem FTS5: a busca cai para LIKE
+                self.fts = False
+            self._conn = conn
+            self._compact_if_due(conn)
+        return self._conn
+
+    def record(
+        self,
+        agent: str,
+        model: str,
+        input: str,
+        output: str,
+        latency: Optional[float] = None,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        cached: bool = False
+    ) -> None:
+        """Enfileira uma geração para gravação em segundo plano"""
+        if not output:
+            return
+        self._queue.put((
+            time.time(), agent, model, input, output, latency, prompt_tokens, completion_tokens, int(cached)
+        ))
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="openrouter-history", daemon=True)
+                    self._writer.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            row = self._queue.get()
+            rows = [row]
+            deadline = time.monotonic() + self.flush_interval
+            while row is not None and len(rows) < self.batch_size:
+                try:
+                    row = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                rows.append(row)
+            self._write([r for r in rows if r is not None])
+            for _ in rows:
+                self._queue.task_done()
+            if rows[-1] is None:
+                return
+
+    def _write(self, rows: List[_Row]) -> None:
+        if not rows:
+            return
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute("BEGIN")
+                conn.executemany(
+                    "INSERT INTO generations (created_at, agent, model, input, output, latency, "
+                    "prompt_tokens, completion_tokens, cached) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                try:
+                    self._conn.execute("ROLLBACK")
+                except (sqlite3.Error, AttributeError):
+                    pass
+
+    def flush(self) -> None:
+        """Espera a gravação de tudo que foi enfileirado"""
+        self._queue.join()
+
+    def search(
+        self,
+        query: Optional[str] = None,
+        agent: Optional[str] = None,
+        model: Optional[str] = None,
+        since: Optional[float] = None,
+        limit: int = 20
+    ) -> List[HistoryEntry]:
+        """Gerações que casam com ``query`` (todas as palavras, no input ou no output)
+        e com os filtros, das mais recentes às mais antigas"""
+        self.flush()
+        conditions, params = [], []
+        for column, value in (("agent", agent), ("model", model)):
+            if value:
+                conditions.append(f"g.{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("g.created_at >= ?")
+            params.append(since)
+        order = "g.created_at DESC"
+        source = "generations g"
+        if query and query.strip():
+            if self.fts:
+                source = "generations_fts f JOIN generations g ON g.id = f.rowid"
+                conditions.append("generations_fts MATCH ?")
+                params.append(_match_query(query))
+                # Percorrer o índice por rowid decrescente para no LIMIT; ordenar por
+                # bm25 pontuaria todas as gerações que casam (centenas de ms em 100k)
+                order = "f.rowid DESC"
+            else:
+                for term in query.split():
+                    conditions.append("(g.input LIKE ? OR g.output LIKE ?)")
+                    params += [f"%{term}%", f"%{term}%"]
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        columns = ", ".join(f"g.{column.strip()}" for column in _COLUMNS.split(","))
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute(
+                f"SELECT {columns} FROM {source} {where} ORDER BY {order} LIMIT ?", (*params, limit)
+            ).fetchall()
+        return [HistoryEntry(*row[:9], cached=bool(row[9])) for row in rows]
+
+    def get(self, entry_id: int) -> Optional[HistoryEntry]:
+        self.flush()
+        with self._lock:
+            row = self._connect().execute(
+                f"SELECT {_COLUMNS} FROM generations WHERE id = ?", (entry_id,)
+            ).fetchone()
+        return HistoryEntry(*row[:9], cached=bool(row[9])) if row else None
+
+    def _compact_if_due(self, conn: sqlite3.Connection) -> None:
+        row = conn.execute("SELECT value FROM meta WHERE name = 'compacted_at'").fetchone()
+        if row is None or time.time() - row[0] > 24 * 3600:
+            self._compact(conn)
+
+    def _compact(self, conn: sqlite3.Connection) -> int:
+        now = time.time()
+        try:
+            deleted = conn.execute(
+                "DELETE FROM generations WHERE created_at < ?", (now - self.retention_days * 24 * 3600,)
+            ).rowcount
+            deleted += conn.execute(
+                "DELETE FROM generations WHERE id <= ("
+                "SELECT id FROM generations ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+            if deleted and self.fts:
+                conn.execute("INSERT INTO generations_fts(generations_fts) VALUES ('optimize')")
+            conn.execute("PRAGMA incremental_vacuum")
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('compacted_at', ?)", (now,)
+            )
+        except sqlite3.Error:
+            return 0
+        return deleted
+
+    def compact(self) -> int:
+        """Aplica a retenção agora; retorna quantas gerações foram removidas"""
+        self.flush()
+        with self._lock:
+            return self._compact(self._connect())
+
+    def clear(self) -> None:
+        self.flush()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM generations")
+            if self.fts:
+                conn.execute("INSERT INTO generations_fts(generations_fts) VALUES ('rebuild')")
+
+    def stats(self) -> Dict[str, Any]:
+        """Gerações, agentes e período cobertos pelo histórico"""
+        self.flush()
+        with self._lock:
+            conn = self._connect()
+            entries, oldest, newest = conn.execute(
+                "SELECT COUNT(*), MIN(created_at), MAX(created_at) FROM generations"
+            ).fetchone()
+            agents = dict(conn.execute("SELECT agent, COUNT(*) FROM generations GROUP BY agent").fetchall())
+        return {
+            "entries": entries,
+            "oldest": oldest,
+            "newest": newest,
+            "agents": agents,
+            "bytes": self.path.stat().st_size if self.path.exists() else 0,
+        }
+
+    def close(self) -> None:
+        """Grava o que falta na fila e fecha o banco"""
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,377 @@
+import json
+import os
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from .config import AppConfig
+
+
+@dataclass
+class TokenUsage:
+    """Contagem de tokens reportada pela API em ``usage``"""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    cached_tokens: int = 0          # parte de prompt_tokens lida do prompt cache do provedor
+    cache_write_tokens: int = 0     # tokens gravados no cache (Claude cobra a escrita)
+
+    @classmethod
+    def from_response(cls, usage) -> Optional["TokenUsage"]:
+        if usage is None:
+            return None
+        details = getattr(usage, "prompt_tokens_details", None)
+        return cls(
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            total_tokens=getattr(usage, "total_tokens", 0) or 0,
+            cached_tokens=(
+                getattr(details, "cached_tokens", 0)
+                or getattr(usage, "cache_read_input_tokens", 0) or 0
+            ),
+            cache_write_tokens=(
+                getattr(details, "cache_write_tokens", 0)
+                or getattr(usage, "cache_creation_input_tokens", 0) or 0
+            ),
+        )
+
+
+@dataclass
+class RequestContext:
+    """Estado de uma requisição, compartilhado entre os hooks"""
+    model: str
+    agent: Optional[str] = None
+    stream: bool = False
+    request_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    started_at: float = field(default_factory=time.perf_counter)
+    timestamp: float = field(default_factory=time.time)
+    attempts: int = 0
+    rate_limit_wait: float = 0.0
+    # Tempo da última tentativa no upstream, sem fila local, backoff nem o consumo do stream
+    upstream_latency: float = 0.0
+
+
+@dataclass
+class CompletionResult:
+    """Texto da resposta com tempos e consumo de tokens"""
+    text: str
+    model: str
+    agent: Optional[str] = None
+    request_id: str = ""
+    latency: float = 0.0
+    attempts: int = 1
+    rate_limit_wait: float = 0.0
+    usage: Optional[TokenUsage] = None
+    cached: bool = False
+    time_to_first_token: Optional[float] = None
+    hedge: Optional[Any] = None     # HedgeReport, quando enviado por um HedgedClient
+
+    @property
+    def retries(self) -> int:
+        return max(0, self.attempts - 1)
+
+
+class RequestHook:
+    """Base para hooks de instrumentação; sobrescreva apenas o necessário"""
+
+    def before_request(self, ctx: RequestContext) -> None:
+        pass
+
+    def after_response(self, ctx: RequestContext, result: CompletionResult) -> None:
+        pass
+
+    def on_retry(self, ctx: RequestContext, attempt: int, error: Exception, delay: float) -> None:
+        pass
+
+    def on_error(self, ctx: RequestContext, error: Exception) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class HookDispatcher:
+    """Repassa eventos para uma lista de hooks; falhas nos hooks nunca afetam a requisição"""
+
+    def __init__(self, hooks: Optional[Sequence[RequestHook]] = None):
+        self.hooks: List[RequestHook] = list(hooks or [])
+
+    def add(self, hook: RequestHook) -> None:
+        self.hooks.append(hook)
+
+    def _emit(self, event: str, *args) -> None:
+        for hook in self.hooks:
+            try:
+                getattr(hook, event)(*args)
+            except Exception:
+                pass
+
+    def before_request(self, ctx: RequestContext) -> None:
+        self._emit("before_request", ctx)
+
+    def after_response(self, ctx: RequestContext, result: CompletionResult) -> None:
+        self._emit("after_response", ctx, result)
+
+    def on_retry(self, ctx: RequestContext, attempt: int, error: Exception, delay: float) -> None:
+        self._emit("on_retry", ctx, attempt, error, delay)
+
+    def on_error(self, ctx: RequestContext, error: Exception) -> None:
+        self._emit("on_error", ctx, error)
+
+    def close(self) -> None:
+        self._emit("close")
+
+
+class JSONLinesExporter(RequestHook):
+    """Grava uma linha JSON por requisição concluída ou com erro"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _write(self, record: Dict) -> None:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            # Uma única escrita em modo append mantém as linhas inteiras entre processos
+            fd = os.open(str(self.path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, line.encode("utf-8"))
+            finally:
+                os.close(fd)
+
+    def after_response(self, ctx: RequestContext, result: CompletionResult) -> None:
+        record = asdict(result)
+        record.pop("text")
+        if record["hedge"] is None:
+            record.pop("hedge")
+        record.update(timestamp=ctx.timestamp, status="ok", stream=ctx.stream)
+        self._write(record)
+
+    def on_error(self, ctx: RequestContext, error: Exception) -> None:
+        self._write({
+            "timestamp": ctx.timestamp,
+            "request_id": ctx.request_id,
+            "model": ctx.model,
+            "agent": ctx.agent,
+            "stream": ctx.stream,
+            "status": "error",
+            "error": type(error).__name__,
+            "latency": time.perf_counter() - ctx.started_at,
+            "attempts": ctx.attempts,
+            "rate_limit_wait": ctx.rate_limit_wait,
+        })
+
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+class _Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.total += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+def _labels(**labels: Optional[str]) -> str:
+    parts = []
+    for name, value in labels.items():
+        escaped = str(value or "").replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class PrometheusExporter(RequestHook):
+    """Métricas no formato texto do Prometheus, por modelo e agente.
+
+    Grava em ``path`` (no máximo a cada ``write_interval`` segundos e no
+    ``close``) e/ou serve em ``/metrics`` via ``serve(port)``.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        write_interval: float = 5.0
+    ):
+        self.path = Path(path) if path else None
+        self.buckets = tuple(buckets)
+        self.write_interval = write_interval
+        self._lock = threading.Lock()
+        self._latency: Dict[Tuple[str, str], _Histogram] = {}
+        self._requests: Dict[Tuple[str, str, str], int] = {}
+        self._tokens: Dict[Tuple[str, str, str], int] = {}
+        self._retries: Dict[Tuple[str, str], int] = {}
+        self._rate_limit_wait: Dict[Tuple[str, str], float] = {}
+        self._collectors: List[Callable[[], List[str]]] = []
+        self._last_write = 0.0
+        # Serializa as gravações do arquivo entre as threads do batch e do servidor
+        self._write_lock = threading.Lock()
+        self._server = None
+
+    def _key(self, ctx: RequestContext) -> Tuple[str, str]:
+        return ctx.model, ctx.agent or ""
+
+    def _count(self, ctx: RequestContext, status: str) -> None:
+        key = (*self._key(ctx), status)
+        self._requests[key] = self._requests.get(key, 0) + 1
+        self._rate_limit_wait[self._key(ctx)] = (
+            self._rate_limit_wait.get(self._key(ctx), 0.0) + ctx.rate_limit_wait
+        )
+
+    def after_response(self, ctx: RequestContext, result: CompletionResult) -> None:
+        with self._lock:
+            self._count(ctx, "cached" if result.cached else "ok")
+            if not result.cached:
+                histogram = self._latency.setdefault(self._key(ctx), _Histogram(self.buckets))
+                histogram.observe(result.latency)
+            if result.usage:
+                for kind in ("prompt", "completion", "cached", "cache_write"):
+                    key = (*self._key(ctx), kind)
+                    self._tokens[key] = self._tokens.get(key, 0) + getattr(result.usage, f"{kind}_tokens")
+        self._maybe_write()
+
+    def on_retry(self, ctx: RequestContext, attempt: int, error: Exception, delay: float) -> None:
+        with self._lock:
+            self._retries[self._key(ctx)] = self._retries.get(self._key(ctx), 0) + 1
+
+    def on_error(self, ctx: RequestContext, error: Exception) -> None:
+        with self._lock:
+            self._count(ctx, "error")
+        self._maybe_write()
+
+    def add_collector(self, collector: Callable[[], List[str]]) -> None:
+        """Inclui no ``render`` as linhas de ``collector()`` (ex.: gauges de concorrência)"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Texto no formato de exposição do Prometheus"""
+        lines = [
+            "# HELP openrouter_request_duration_seconds Latência das requisições ao OpenRouter",
+            "# TYPE openrouter_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (model, agent), histogram in sorted(self._latency.items()):
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    labels = _labels(model=model, agent=agent, le=f"{bound:g}")
+                    lines.append(f"openrouter_request_duration_seconds_bucket{labels} {count}")
+                labels = _labels(model=model, agent=agent, le="+Inf")
+                lines.append(f"openrouter_request_duration_seconds_bucket{labels} {histogram.total}")
+                labels = _labels(model=model, agent=agent)
+                lines.append(f"openrouter_request_duration_seconds_sum{labels} {histogram.sum:.6f}")
+                lines.append(f"openrouter_request_duration_seconds_count{labels} {histogram.total}")
+
+            lines += [
+                "# HELP openrouter_requests_total Requisições por status (ok, cached, error)",
+                "# TYPE openrouter_requests_total counter",
+            ]
+            for (model, agent, status), count in sorted(self._requests.items()):
+                lines.append(f"openrouter_requests_total{_labels(model=model, agent=agent, status=status)} {count}")
+
+            lines += [
+                "# HELP openrouter_tokens_total Tokens consumidos (cached: lidos do prompt cache do provedor)",
+                "# TYPE openrouter_tokens_total counter",
+            ]
+            for (model, agent, kind), count in sorted(self._tokens.items()):
+                lines.append(f"openrouter_tokens_total{_labels(model=model, agent=agent, kind=kind)} {count}")
+
+            lines += [
+                "# HELP openrouter_retries_total Novas tentativas após falhas temporárias",
+                "# TYPE openrouter_retries_total counter",
+            ]
+            for (model, agent), count in sorted(self._retries.items()):
+                lines.append(f"openrouter_retries_total{_labels(model=model, agent=agent)} {count}")
+
+            lines += [
+                "# HELP openrouter_rate_limit_wait_seconds_total Tempo esperando o rate limiter",
+                "# TYPE openrouter_rate_limit_wait_seconds_total counter",
+            ]
+            for (model, agent), seconds in sorted(self._rate_limit_wait.items()):
+                lines.append(f"openrouter_rate_limit_wait_seconds_total{_labels(model=model, agent=agent)} {seconds:.6f}")
+        for collector in self._collectors:
+            lines += collector()
+        return "\n".join(lines) + "\n"
+
+    def write(self) -> None:
+        if self.path is None:
+            return
+        with self._write_lock:
+            self._last_write = time.monotonic()
+            self._write()
+
+    def _write(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Um arquivo temporário por processo e thread: nenhum escritor substitui o de outro
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(self.render(), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def _maybe_write(self) -> None:
+        if self.path is None or time.monotonic() - self._last_write < self.write_interval:
+            return
+        # Se outra thread já está gravando, esta requisição não espera por ela
+        if not self._write_lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() - self._last_write >= self.write_interval:
+                self._last_write = time.monotonic()
+                self._write()
+        finally:
+            self._write_lock.release()
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> None:
+        """Expõe as métricas em http://host:port/metrics numa thread de fundo"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.write()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+
+def hooks_from_config(config: "AppConfig") -> List[RequestHook]:
+    """Exportadores habilitados em ``config`` (arquivo JSONL, Prometheus, porta HTTP)"""
+    hooks: List[RequestHook] = []
+    if config.metrics_jsonl_path:
+        hooks.append(JSONLinesExporter(Path(config.metrics_jsonl_path).expanduser()))
+    if config.metrics_prometheus_path or config.metrics_port:
+        path = config.metrics_prometheus_path
+        prometheus = PrometheusExporter(Path(path).expanduser() if path else None)
+        if config.metrics_port:
+            prometheus.serve(config.metrics_port)
+        hooks.append(prometheus)
+    return hooks
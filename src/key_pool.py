@@ -0,0 +1,229 @@
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Sequence, Tuple, TypeVar
+
+from .cache import ResponseCache
+from .client import MessageStream, OpenRouterClient
+from .config import AppConfig
+from .exceptions import InvalidAPIKeyError
+from .instrumentation import CompletionResult, RequestHook
+from .router import ModelRouter
+from .utils import mask_api_key
+
+T = TypeVar("T")
+
+
+@dataclass
+class KeyUsage:
+    """Uso de uma API key do pool"""
+    key: str                        # mascarada
+    requests: int = 0
+    errors: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    inflight: int = 0
+    remaining: float = 0.0          # tokens no rate limiter da key
+    quarantined: bool = False
+    reason: Optional[str] = None    # motivo da quarentena
+
+
+class _PooledKey:
+    def __init__(self, client: OpenRouterClient):
+        self.client = client
+        self.usage = KeyUsage(mask_api_key(client.api_key)[-8:])
+
+    def record(self, result: Optional[CompletionResult]) -> None:
+        self.usage.requests += 1
+        if result is not None and result.usage:
+            self.usage.prompt_tokens += result.usage.prompt_tokens
+            self.usage.completion_tokens += result.usage.completion_tokens
+            self.usage.cached_tokens += result.usage.cached_tokens
+
+
+class KeyPool:
+    """Várias API keys atrás da mesma interface de envio do cliente.
+
+    Cada key tem seu próprio OpenRouterClient e, portanto, seu próprio rate
+    limiter, circuit breakers e limite de concorrência; cache e hooks são
+    compartilhados. Cada requisição vai para a key com mais capacidade
+    restante (tokens no rate limiter menos requisições em andamento). Uma key
+    que responde InvalidAPIKeyError fica em quarentena e a requisição segue
+    para a próxima; só falha quando todas estiverem em quarentena.
+    """
+
+    def __init__(self, clients: Sequence[OpenRouterClient]):
+        if not clients:
+            raise ValueError("O pool precisa de ao menos uma API key")
+        self.clients = list(clients)
+        self._keys = [_PooledKey(client) for client in self.clients]
+        self._lock = threading.Lock()
+        for pooled in self._keys:
+            if not pooled.client.validate_api_key():
+                self._quarantine(pooled, "formato inválido")
+
+    @classmethod
+    def from_keys(
+        cls,
+        api_keys: Sequence[str],
+        model: str = "gpt-4o-mini",
+        config: Optional[AppConfig] = None,
+        cache: Optional[ResponseCache] = None,
+        refresh_cache: bool = False,
+        hooks: Optional[Sequence[RequestHook]] = None
+    ) -> "KeyPool":
+        config = config or AppConfig()
+        return cls([
+            OpenRouterClient(
+                api_key=key,
+                model=model,
+                timeout=config.default_timeout,
+                max_retries=config.max_retries,
+                config=config,
+                cache=cache,
+                refresh_cache=refresh_cache,
+                hooks=hooks
+            )
+            for key in api_keys
+        ])
+
+    def __getattr__(self, name: str) -> Any:
+        # model, config, cache, hooks... vêm do primeiro cliente
+        return getattr(self.clients[0], name)
+
+    def validate_api_key(self) -> bool:
+        """True se ao menos uma key do pool estiver disponível"""
+        with self._lock:
+            return any(not pooled.usage.quarantined for pooled in self._keys)
+
+    def add_hook(self, hook: RequestHook) -> None:
+        for client in self.clients:
+            client.add_hook(hook)
+
+    def use_router(self, router: ModelRouter) -> None:
+        """Mesmo roteador do modelo auto em todas as keys (um histórico só)"""
+        for client in self.clients:
+            client.use_router(router)
+
+    def _pick(self) -> _PooledKey:
+        with self._lock:
+            available = [pooled for pooled in self._keys if not pooled.usage.quarantined]
+            if not available:
+                raise InvalidAPIKeyError("API key inválida ou não autorizada (todas as keys do pool em quarentena)")
+            pooled = max(
+                available,
+                key=lambda p: (p.client.rate_limiter.tokens - p.usage.inflight, -p.usage.requests)
+            )
+            pooled.usage.inflight += 1
+            return pooled
+
+    def _quarantine(self, pooled: _PooledKey, reason: str) -> None:
+        pooled.usage.quarantined = True
+        pooled.usage.reason = reason
+
+    def _call(self, send: Callable[[OpenRouterClient], T]) -> Tuple[_PooledKey, T]:
+        while True:
+            pooled = self._pick()
+            try:
+                return pooled, send(pooled.client)
+            except InvalidAPIKeyError as e:
+                with self._lock:
+                    pooled.usage.errors += 1
+                    self._quarantine(pooled, str(e))
+            except Exception:
+                with self._lock:
+                    pooled.usage.errors += 1
+                raise
+            finally:
+                with self._lock:
+                    pooled.usage.inflight -= 1
+
+    def send_message(
+        self,
+        message: str,
+        model: Optional[str] = None,
+        system_prompt: Optional[str] = None,
+        agent: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        return self.send_message_result(message, model, system_prompt, agent, max_tokens).text
+
+    def send_message_result(
+        self,
+        message: str,
+        model: Optional[str] = None,
+        system_prompt: Optional[str] = None,
+        agent: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> CompletionResult:
+        pooled, result = self._call(
+            lambda client: client.send_message_result(message, model, system_prompt, agent, max_tokens)
+        )
+        with self._lock:
+            pooled.record(result)
+        return result
+
+    def send_message_stream(
+        self,
+        message: str,
+        model: Optional[str] = None,
+        system_prompt: Optional[str] = None,
+        agent: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> MessageStream:
+        """Stream pela key escolhida; o uso é contabilizado quando o stream termina"""
+        pooled, stream = self._call(
+            lambda client: client.send_message_stream(message, model, system_prompt, agent, max_tokens)
+        )
+
+        def _record(finished: MessageStream) -> None:
+            with self._lock:
+                pooled.record(finished.result)
+
+        stream.add_done_callback(_record)
+        return stream
+
+    def usage(self) -> List[KeyUsage]:
+        """Uso de cada key, na ordem do pool"""
+        with self._lock:
+            report = [KeyUsage(**vars(pooled.usage)) for pooled in self._keys]
+        for row, pooled in zip(report, self._keys):
+            row.remaining = pooled.client.rate_limiter.tokens
+        return report
+
+    def render_prometheus(self) -> List[str]:
+        """Uso e concorrência por key no formato do Prometheus (ver PrometheusExporter.add_collector)"""
+        from .concurrency import render_concurrency_gauges
+        from .instrumentation import _labels
+
+        report = self.usage()
+        lines = [
+            "# HELP openrouter_key_requests_total Requisições concluídas por API key",
+            "# TYPE openrouter_key_requests_total counter",
+        ]
+        lines += [f"openrouter_key_requests_total{_labels(key=row.key)} {row.requests}" for row in report]
+        lines += [
+            "# HELP openrouter_key_quarantined API key em quarentena (1) ou disponível (0)",
+            "# TYPE openrouter_key_quarantined gauge",
+        ]
+        lines += [f"openrouter_key_quarantined{_labels(key=row.key)} {int(row.quarantined)}" for row in report]
+        concurrency = [
+            ({"key": pooled.usage.key}, pooled.client.concurrency)
+            for pooled in self._keys if pooled.client.concurrency is not None
+        ]
+        if concurrency:
+            lines += render_concurrency_gauges(concurrency)
+        return lines
+
+
+def usage_table(report: Sequence[KeyUsage]) -> str:
+    """Tabela do uso por key para exibir ao final de um batch"""
+    header = f"{'key':<12}{'requisições':>12}{'erros':>7}{'entrada':>10}{'saída':>9}{'restante':>10}  status"
+    lines = [header, "-" * len(header)]
+    for row in report:
+        status = f"quarentena: {row.reason}" if row.quarantined else "ok"
+        lines.append(
+            f"{row.key:<12}{row.requests:>12}{row.errors:>7}{row.prompt_tokens:>10}"
+            f"{row.completion_tokens:>9}{row.remaining:>10.1f}  {status}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,250 @@
+import hashlib
+import re
+import sqlite3
+import struct
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .config import CONFIG_DIR
+
+DEFAULT_INDEX_PATH = CONFIG_DIR / "near_duplicates.sqlite3"
+
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+SHINGLE_SIZE = 5
+_EMPTY = (1 << 58) - 1
+_SIGNATURE = struct.Struct(f"<{NUM_HASHES}Q")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    scope TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at);
+CREATE INDEX IF NOT EXISTS idx_entries_created ON entries(created_at);
+CREATE TABLE IF NOT EXISTS buckets (
+    key INTEGER NOT NULL,
+    entry_id INTEGER NOT NULL,
+    PRIMARY KEY (key, entry_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_buckets_entry ON buckets(entry_id);
+"""
+
+
+def normalize_text(text: str) -> str:
+    """Remove acentos, caixa, pontuação e números (datas, horários) para comparação"""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    text = re.sub(r"\d+", "0", text)
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def _shingle_hashes(text: str) -> List[int]:
+    if len(text) <= SHINGLE_SIZE:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    return [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+        for s in shingles
+    ]
+
+
+def minhash(text: str) -> List[int]:
+    """Assinatura MinHash de ``text`` (já normalizado).
+
+    Usa one-permutation hashing: um único hash por shingle, distribuído em
+    NUM_HASHES faixas, com o mínimo de cada faixa; faixas vazias copiam a
+    próxima preenchida (densificação). Custa O(shingles), não O(shingles × hashes).
+    """
+    signature = [_EMPTY] * NUM_HASHES
+    for value in _shingle_hashes(text):
+        slot = value % NUM_HASHES
+        rest = value >> 6
+        if rest < signature[slot]:
+            signature[slot] = rest
+    filled = [i for i, v in enumerate(signature) if v != _EMPTY]
+    if filled and len(filled) < NUM_HASHES:
+        for i in range(NUM_HASHES):
+            if signature[i] == _EMPTY:
+                source = next((j for j in filled if j > i), filled[0])
+                signature[i] = signature[source]
+    return signature
+
+
+def similarity(a: List[int], b: List[int]) -> float:
+    """Estimativa da similaridade de Jaccard entre duas assinaturas"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_HASHES
+
+
+def _band_keys(scope: str, signature: List[int]) -> List[int]:
+    keys = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(scope.encode("utf-8"))
+        digest.update(struct.pack(f"<B{ROWS}Q", band, *signature[band * ROWS:(band + 1) * ROWS]))
+        keys.append(int.from_bytes(digest.digest(), "little", signed=True))
+    return keys
+
+
+@dataclass
+class NearDuplicateMatch:
+    response: str
+    similarity: float
+    entry_id: int
+    created_at: float
+
+
+class NearDuplicateIndex:
+    """Índice LSH persistente de inputs já respondidos, para achar quase-duplicatas.
+
+    Cada entrada guarda a assinatura MinHash do input normalizado e a resposta;
+    a busca consulta os BANDS buckets da assinatura em uma única query
+    indexada e confirma os candidatos pela similaridade estimada. ``scope``
+    (agente e modelo) separa entradas que não devem se misturar.
+
+    Como o ResponseCache, erros do SQLite são tratados como "não encontrado", e
+    a expiração e o limite de entradas são aplicados no primeiro registro do
+    processo e depois a cada ``evict_every`` registros.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        threshold: float = 0.8,
+        max_entries: int = 200_000,
+        ttl: float = 30 * 24 * 3600,
+        evict_every: int = 100
+    ):
+        self.path = Path(path) if path else DEFAULT_INDEX_PATH
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        # Começa em zero: a CLI costuma registrar uma resposta só por execução
+        self._until_evict = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                str(self.path), timeout=10.0, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def signature(self, text: str) -> List[int]:
+        return minhash(normalize_text(text))
+
+    def lookup(self, scope: str, text: str) -> Optional[NearDuplicateMatch]:
+        """Entrada mais parecida com ``text`` acima do threshold, se houver"""
+        signature = self.signature(text)
+        return self.lookup_signature(scope, signature)
+
+    def lookup_signature(self, scope: str, signature: List[int]) -> Optional[NearDuplicateMatch]:
+        keys = _band_keys(scope, signature)
+        now = time.time()
+        best: Optional[NearDuplicateMatch] = None
+        with self._lock:
+            try:
+                conn = self._connect()
+                rows = conn.execute(
+                    "SELECT id, signature, response, created_at FROM entries WHERE id IN ("
+                    f"SELECT entry_id FROM buckets WHERE key IN ({','.join('?' * len(keys))})"
+                    ") AND scope = ? AND created_at >= ?",
+                    (*keys, scope, now - self.ttl)
+                ).fetchall()
+                for entry_id, blob, response, created_at in rows:
+                    score = similarity(signature, list(_SIGNATURE.unpack(blob)))
+                    if score >= self.threshold and (best is None or score > best.similarity):
+                        best = NearDuplicateMatch(response, score, entry_id, created_at)
+                if best is not None:
+                    conn.execute("UPDATE entries SET accessed_at = ? WHERE id = ?", (now, best.entry_id))
+            except sqlite3.Error:
+                best = None
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return best
+
+    def add(self, scope: str, text: str, response: str) -> None:
+        """Registra a resposta de um input"""
+        signature = self.signature(text)
+        keys = _band_keys(scope, signature)
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    cursor = conn.execute(
+                        "INSERT INTO entries (scope, signature, response, created_at, accessed_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (scope, _SIGNATURE.pack(*signature), response, now, now)
+                    )
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO buckets (key, entry_id) VALUES (?, ?)",
+                        [(key, cursor.lastrowid) for key in keys]
+                    )
+                    self._until_evict -= 1
+                    if self._until_evict <= 0:
+                        self._evict(conn, now)
+                        self._until_evict = self.evict_every
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+            except sqlite3.Error:
+                pass
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """Remove entradas expiradas e, acima de max_entries, as menos usadas"""
+        expired = [row[0] for row in conn.execute(
+            "SELECT id FROM entries WHERE created_at < ?", (now - self.ttl,)
+        )]
+        count = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - len(expired)
+        if count > self.max_entries:
+            expired += [row[0] for row in conn.execute(
+                "SELECT id FROM entries WHERE created_at >= ? ORDER BY accessed_at LIMIT ?",
+                (now - self.ttl, count - self.max_entries)
+            )]
+        if expired:
+            conn.executemany("DELETE FROM buckets WHERE entry_id = ?", [(i,) for i in expired])
+            conn.executemany("DELETE FROM entries WHERE id = ?", [(i,) for i in expired])
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM buckets")
+            conn.execute("DELETE FROM entries")
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            conn = self._connect()
+            entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
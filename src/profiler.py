@@ -0,0 +1,293 @@
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class _Span:
+    """Etapa em andamento ou concluída; ``path`` é a pilha até ela (``a;b;c``)"""
+    __slots__ = ("name", "path", "parent", "owner", "args", "start", "end", "children")
+
+    def __init__(self, name: str, parent: Optional["_Span"], owner: Tuple[int, int], args: Optional[Dict[str, Any]]):
+        self.name = name
+        self.path = f"{parent.path};{name}" if parent is not None else name
+        self.parent = parent
+        self.owner = owner
+        self.args = args
+        self.start = 0.0
+        self.end = 0.0
+        self.children = 0.0
+
+
+class _NullSpan:
+    """Span do profiler desligado: não mede nada"""
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc_info: Any) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+_current: ContextVar[Optional[_Span]] = ContextVar("openrouter_span", default=None)
+
+
+def _owner() -> Tuple[int, int]:
+    """(thread, task asyncio) que executa o span: spans de donos diferentes ficam em trilhas separadas"""
+    asyncio = sys.modules.get("asyncio")
+    task = None
+    if asyncio is not None:
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            pass
+    return threading.get_ident(), id(task) if task is not None else 0
+
+
+class _SpanContext:
+    __slots__ = ("_profiler", "_span", "_token")
+
+    def __init__(self, profiler: "Profiler", name: str, args: Optional[Dict[str, Any]]):
+        self._profiler = profiler
+        parent = _current.get()
+        self._span = _Span(name, parent, _owner(), args)
+
+    def __enter__(self) -> _Span:
+        self._token = _current.set(self._span)
+        self._span.start = time.perf_counter()
+        return self._span
+
+    def __exit__(self, *exc_info: Any) -> None:
+        span = self._span
+        span.end = time.perf_counter()
+        _current.reset(self._token)
+        self._profiler._finish(span)
+
+
+class Profiler:
+    """Árvore de spans por etapa das requisições (validação, rate limiter, retry, rede, parsing, terminal).
+
+    Cada ``span`` registra início e fim com ``perf_counter``; o pai vem de uma
+    ContextVar, então a árvore segue tasks asyncio e, com ``carry_context``,
+    as threads dos pools de batch, fan-out e hedging. Os totais por
+    etapa e por pilha são acumulados ao fechar cada span (para o resumo e o
+    flamegraph); os spans em si são guardados até ``max_events`` para o trace
+    do Chrome.
+    """
+
+    def __init__(self, max_events: int = 500_000):
+        self.max_events = max_events
+        self.started_at = time.perf_counter()
+        self.dropped = 0
+        self._events: List[_Span] = []
+        self._stages: Dict[str, List[float]] = {}
+        self._stacks: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def span(self, name: str, args: Optional[Dict[str, Any]] = None) -> _SpanContext:
+        return _SpanContext(self, name, args)
+
+    def _finish(self, span: _Span) -> None:
+        duration = span.end - span.start
+        self_time = max(0.0, duration - span.children)
+        parent = span.parent
+        with self._lock:
+            if parent is not None and parent.owner == span.owner:
+                parent.children += duration
+            stage = self._stages.get(span.name)
+            if stage is None:
+                # chamadas, total, próprio (sem as etapas filhas), máximo
+                stage = self._stages[span.name] = [0, 0.0, 0.0, 0.0]
+            stage[0] += 1
+            stage[1] += duration
+            stage[2] += self_time
+            if duration > stage[3]:
+                stage[3] = duration
+            self._stacks[span.path] = self._stacks.get(span.path, 0.0) + self_time
+            if len(self._events) < self.max_events:
+                self._events.append(span)
+            else:
+                self.dropped += 1
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Por etapa: chamadas, tempo total, tempo próprio (sem as etapas filhas), média e máximo"""
+        with self._lock:
+            stages = {name: list(values) for name, values in self._stages.items()}
+        return {
+            name: {
+                "calls": calls,
+                "total": total,
+                "self": self_time,
+                "mean": total / calls,
+                "max": maximum,
+            }
+            for name, (calls, total, self_time, maximum) in sorted(
+                stages.items(), key=lambda item: item[1][2], reverse=True
+            )
+        }
+
+    def collapsed(self) -> str:
+        """Pilhas no formato "collapsed" (``a;b;c microssegundos``) do flamegraph.pl e do speedscope"""
+        with self._lock:
+            stacks = dict(self._stacks)
+        return "".join(
+            f"{path} {round(seconds * 1e6)}\n" for path, seconds in sorted(stacks.items()) if seconds >= 5e-7
+        )
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Spans como eventos "complete" do formato Trace Event (chrome://tracing, Perfetto)"""
+        with self._lock:
+            events = list(self._events)
+        pid = os.getpid()
+        lanes: Dict[Tuple[int, int], int] = {}
+        trace: List[Dict[str, Any]] = []
+        for span in sorted(events, key=lambda s: s.start):
+            # Uma trilha por thread e por task asyncio, para que spans simultâneos não se sobreponham
+            owner = span.owner
+            lane = lanes.get(owner)
+            if lane is None:
+                lane = lanes[owner] = len(lanes) + 1
+                label = f"thread {owner[0]}" + (" task" if owner[1] else "")
+                trace.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": lane, "args": {"name": label}})
+            event = {
+                "name": span.name,
+                "cat": "openrouter",
+                "ph": "X",
+                "ts": round((span.start - self.started_at) * 1e6, 3),
+                "dur": round((span.end - span.start) * 1e6, 3),
+                "pid": pid,
+                "tid": lane,
+            }
+            if span.args:
+                event["args"] = span.args
+            trace.append(event)
+        return {"traceEvents": trace, "displayTimeUnit": "ms", "otherData": {"dropped_events": self.dropped}}
+
+    def write(self, prefix: Path) -> Tuple[Path, Path]:
+        """Grava ``<prefix>.trace.json`` (Chrome) e ``<prefix>.folded`` (flamegraph)"""
+        prefix = Path(prefix)
+        prefix.parent.mkdir(parents=True, exist_ok=True)
+        trace_path = prefix.with_name(prefix.name + ".trace.json")
+        folded_path = prefix.with_name(prefix.name + ".folded")
+        trace_path.write_text(json.dumps(self.chrome_trace()), encoding="utf-8")
+        folded_path.write_text(self.collapsed(), encoding="utf-8")
+        return trace_path, folded_path
+
+
+_active: Optional[Profiler] = None
+
+
+def span(name: str, args: Optional[Dict[str, Any]] = None):
+    """Mede o bloco ``with`` como uma etapa do profiler ativo (sem profiler, não faz nada)"""
+    profiler = _active
+    if profiler is None:
+        return _NULL_SPAN
+    return _SpanContext(profiler, name, args)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Decorador: mede cada chamada da função (síncrona ou assíncrona) como a etapa ``name``"""
+    def decorator(func: F) -> F:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                profiler = _active
+                if profiler is None:
+                    return await func(*args, **kwargs)
+                with _SpanContext(profiler, name, None):
+                    return await func(*args, **kwargs)
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            profiler = _active
+            if profiler is None:
+                return func(*args, **kwargs)
+            with _SpanContext(profiler, name, None):
+                return func(*args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+    return decorator
+
+
+def carry_context(func: F) -> F:
+    """``func`` para rodar em outra thread com o contexto de quem a criou.
+
+    ThreadPoolExecutor e Thread não copiam ContextVars: sem isto, os spans da
+    thread perdem o pai e ``request_priority()`` não chega ao rate limiter.
+    Cada chamada roda numa cópia própria, então a mesma função pode ser
+    executada por várias threads ao mesmo tempo.
+    """
+    context = copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper  # type: ignore[return-value]
+
+
+def active() -> Optional[Profiler]:
+    return _active
+
+
+def enable(profiler: Optional[Profiler] = None) -> Profiler:
+    """Ativa ``profiler`` (ou um novo) para o processo todo"""
+    global _active
+    _active = profiler or Profiler()
+    return _active
+
+
+def disable() -> Optional[Profiler]:
+    """Desativa o profiler e o retorna, com os spans registrados até aqui"""
+    global _active
+    profiler, _active = _active, None
+    return profiler
+
+
+@contextmanager
+def profiling(prefix: Optional[Path] = None, name: str = "profile") -> Iterator[Profiler]:
+    """Ativa o profiler durante o bloco, com ``name`` como span raiz, e grava o perfil em ``prefix``.
+
+    Dentro de outro ``profiling``, apenas abre o span no profiler já ativo e
+    não grava nada: os spans entram no perfil do bloco externo.
+    """
+    owner = _active is None
+    profiler = enable() if owner else _active
+    try:
+        with profiler.span(name):
+            yield profiler
+    finally:
+        if owner:
+            disable()
+            if prefix is not None:
+                profiler.write(prefix)
+
+
+def _duration(seconds: float) -> str:
+    if seconds >= 10:
+        return f"{seconds:.1f}s"
+    return f"{seconds * 1000:.1f}ms" if seconds >= 1e-3 else f"{seconds * 1e6:.0f}µs"
+
+
+def stage_table(summary: Dict[str, Dict[str, float]]) -> str:
+    """Tabela do tempo por etapa, da que mais consumiu tempo próprio à que menos"""
+    header = f"{'etapa':<20}{'chamadas':>9}{'total':>10}{'próprio':>10}{'média':>10}{'máximo':>10}"
+    lines = [header, "-" * len(header)]
+    for name, values in summary.items():
+        lines.append(
+            f"{name:<20}{values['calls']:>9}" + "".join(
+                f"{_duration(values[key]):>10}" for key in ("total", "self", "mean", "max")
+            )
+        )
+    return "\n".join(lines)
@@ -0,0 +1,239 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from .config import CONFIG_DIR, AppConfig
+from .exceptions import RateLimitError
+
+DEFAULT_BUCKET_PATH = CONFIG_DIR / "ratelimit.sqlite3"
+
+
+class LocalBucket:
+    """Token bucket em memória, compartilhado entre threads do processo"""
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self._updated_at)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_rate)
+        self._updated_at = now
+
+    def take(self) -> float:
+        """Consome um token; retorna 0 ou quantos segundos faltam para haver um"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.refill_rate
+
+    def tokens(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class SQLiteBucket:
+    """Token bucket persistido em SQLite, compartilhado entre processos da máquina"""
+
+    def __init__(
+        self,
+        capacity: float,
+        refill_rate: float,
+        name: str = "default",
+        path: Optional[Path] = None
+    ):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.name = name
+        self.path = Path(path) if path else DEFAULT_BUCKET_PATH
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                str(self.path), timeout=10.0, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _update(self, consume: bool) -> float:
+        # time.time() porque o relógio precisa ser comum a todos os processos
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT tokens, updated_at FROM buckets WHERE name = ?", (self.name,)
+                ).fetchone()
+                tokens = self.capacity
+                if row:
+                    elapsed = max(0.0, now - row[1])
+                    tokens = min(self.capacity, row[0] + elapsed * self.refill_rate)
+                result = tokens
+                if consume:
+                    if tokens >= 1:
+                        tokens -= 1
+                        result = 0.0
+                    else:
+                        result = (1 - tokens) / self.refill_rate
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                    (self.name, tokens, now)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def take(self) -> float:
+        """Consome um token; retorna 0 ou quantos segundos faltam para haver um"""
+        return self._update(consume=True)
+
+    def tokens(self) -> float:
+        """Tokens disponíveis agora, sem gravar (só leitura)"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT tokens, updated_at FROM buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+        if not row:
+            return self.capacity
+        return min(self.capacity, row[0] + max(0.0, time.time() - row[1]) * self.refill_rate)
+
+
+class RateLimiter:
+    """Rate limiter token bucket: ``max_calls`` por ``time_window`` segundos.
+
+    Em vez de falhar assim que o orçamento acaba, espera por capacidade até
+    ``max_wait`` segundos; só levanta RateLimitError se a espera necessária
+    passar desse prazo.
+    """
+
+    def __init__(
+        self,
+        max_calls: int = 10,
+        time_window: int = 60,
+        max_wait: Optional[float] = 60.0,
+        bucket=None
+    ):
+        self.max_calls = max_calls
+        self.time_window = time_window
+        self.max_wait = max_wait
+        self.bucket = bucket or LocalBucket(max_calls, max_calls / time_window)
+        self.waits = 0
+        self.total_wait = 0.0
+        self.last_wait = 0.0
+        self._metrics_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: AppConfig, api_key: Optional[str] = None) -> "RateLimiter":
+        """Cria o limiter da configuração, compartilhado entre processos se configurado"""
+        bucket = None
+        if config.rate_limit_shared:
+            name = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+            bucket = SQLiteBucket(
+                config.rate_limit_calls,
+                config.rate_limit_calls / config.rate_limit_window,
+                name=name
+            )
+        return cls(
+            max_calls=config.rate_limit_calls,
+            time_window=config.rate_limit_window,
+            max_wait=config.rate_limit_max_wait,
+            bucket=bucket
+        )
+
+    def _next_wait(self, deadline: Optional[float]) -> float:
+        wait = self.bucket.take()
+        if wait and deadline is not None and time.monotonic() + wait > deadline:
+            raise RateLimitError(
+                f"Rate limit excedido: {self.max_calls} chamadas por {self.time_window}s"
+            )
+        return wait
+
+    def _record_wait(self, waited: float) -> None:
+        with self._metrics_lock:
+            self.last_wait = waited
+            if waited > 0:
+                self.waits += 1
+                self.total_wait += waited
+
+    def _deadline(self, timeout: Optional[float]) -> Optional[float]:
+        timeout = self.max_wait if timeout is None else timeout
+        return None if timeout is None else time.monotonic() + timeout
+
+    def acquire(self, timeout: Optional[float] = None) -> float:
+        """Espera por um token; retorna o tempo esperado em segundos"""
+        started = time.monotonic()
+        deadline = self._deadline(timeout)
+        wait = self._next_wait(deadline)
+        if not wait:
+            self._record_wait(0.0)
+            return 0.0
+        while wait:
+            time.sleep(wait)
+            wait = self._next_wait(deadline)
+        waited = time.monotonic() - started
+        self._record_wait(waited)
+        return waited
+
+    def __call__(self):
+        """Espera por capacidade, levanta exceção se o prazo máximo for excedido"""
+        self.acquire()
+
+    @property
+    def tokens(self) -> float:
+        return self.bucket.tokens()
+
+    def metrics(self) -> Dict[str, float]:
+        """Tokens disponíveis e tempo de espera acumulado"""
+        with self._metrics_lock:
+            return {
+                "tokens": self.tokens,
+                "capacity": self.max_calls,
+                "waits": self.waits,
+                "total_wait": self.total_wait,
+                "last_wait": self.last_wait,
+            }
+
+
+class AsyncRateLimiter(RateLimiter):
+    """Rate limiter para uso dentro de um event loop asyncio"""
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> float:
+        """Espera por um token sem bloquear o event loop"""
+        import asyncio
+
+        started = time.monotonic()
+        deadline = self._deadline(timeout)
+        wait = self._next_wait(deadline)
+        if not wait:
+            self._record_wait(0.0)
+            return 0.0
+        while wait:
+            await asyncio.sleep(wait)
+            wait = self._next_wait(deadline)
+        waited = time.monotonic() - started
+        self._record_wait(waited)
+        return waited
+
+    async def __call__(self):
+        """Espera por capacidade, levanta exceção se o prazo máximo for excedido"""
+        await self.acquire_async()
@@ -0,0 +1,262 @@
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from .config import AppConfig
+from .exceptions import CircuitOpenError, RateLimitError, ServerError, ConnectionError
+from .profiler import span
+
+T = TypeVar('T')
+
+RETRYABLE_ERRORS = (RateLimitError, ConnectionError, ServerError)
+# Falhas que indicam um modelo doente; 429 é questão de cota, não de saúde
+UNHEALTHY_ERRORS = (ConnectionError, ServerError)
+
+OnRetry = Callable[[int, Exception, float], None]
+
+
+def parse_retry_after(headers: Any) -> Optional[float]:
+    """Lê Retry-After (segundos ou data HTTP) ou retry-after-ms dos headers"""
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+@dataclass
+class RetryPolicy:
+    """Parâmetros de retry: tentativas, backoff com jitter e prazo total"""
+    max_attempts: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 20.0
+    deadline: Optional[float] = 90.0
+
+    @classmethod
+    def from_config(cls, config: AppConfig, max_attempts: Optional[int] = None) -> "RetryPolicy":
+        return cls(
+            max_attempts=max_attempts or config.max_retries,
+            base_delay=config.retry_delay,
+            max_delay=config.retry_max_delay,
+            deadline=config.request_deadline,
+        )
+
+    def next_delay(self, previous: float, error: Exception) -> float:
+        """Backoff decorrelated jitter, respeitando Retry-After quando informado"""
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is not None:
+            return retry_after
+        return min(self.max_delay, random.uniform(self.base_delay, max(self.base_delay, previous * 3)))
+
+
+class CircuitBreaker:
+    """Circuit breaker por modelo: abre após falhas consecutivas e testa com uma chamada"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Levanta CircuitOpenError se o circuito estiver aberto"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError(
+                        f"Modelo '{self.name}' indisponível no momento (circuit breaker aberto)"
+                    )
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    raise CircuitOpenError(
+                        f"Modelo '{self.name}' em teste após falhas; tente novamente em instantes"
+                    )
+                self._probe_in_flight = True
+
+    def release(self) -> None:
+        """Libera a chamada de teste sem registrar resultado (ex.: cancelamento)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record(self, error: Optional[Exception] = None) -> None:
+        """Registra o resultado de uma chamada"""
+        with self._lock:
+            self._probe_in_flight = False
+            if error is None:
+                self.state = self.CLOSED
+                self.failures = 0
+                return
+            # 429, validação e afins não dizem nada sobre a saúde do modelo: nem
+            # contam como falha nem fecham o circuito; o próximo teste decide
+            if not isinstance(error, UNHEALTHY_ERRORS):
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class CircuitBreakerRegistry:
+    """Um CircuitBreaker por modelo, criado sob demanda"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: AppConfig) -> "CircuitBreakerRegistry":
+        return cls(config.circuit_failure_threshold, config.circuit_reset_timeout)
+
+    def get(self, model: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(model)
+            if breaker is None:
+                breaker = CircuitBreaker(model, self.failure_threshold, self.reset_timeout)
+                self._breakers[model] = breaker
+            return breaker
+
+    def states(self) -> Dict[str, str]:
+        with self._lock:
+            return {model: breaker.state for model, breaker in self._breakers.items()}
+
+
+def _remaining(end: Optional[float]) -> Optional[float]:
+    if end is None:
+        return None
+    remaining = end - time.monotonic()
+    if remaining <= 0:
+        raise ConnectionError("Timeout na conexão: prazo total da requisição excedido")
+    return remaining
+
+
+def _plan_retry(
+    policy: RetryPolicy,
+    attempt: int,
+    error: Exception,
+    previous_delay: float,
+    end: Optional[float]
+) -> Optional[float]:
+    """Retorna a espera antes da próxima tentativa, ou None se não houver nova tentativa"""
+    if not is_retryable(error) or attempt >= policy.max_attempts:
+        return None
+    delay = policy.next_delay(previous_delay, error)
+    if end is not None and time.monotonic() + delay >= end:
+        return None
+    return delay
+
+
+def retry_call(
+    func: Callable[[Optional[float]], T],
+    policy: RetryPolicy,
+    breaker: Optional[CircuitBreaker] = None,
+    on_retry: Optional[OnRetry] = None
+) -> T:
+    """Executa ``func(timeout)`` com retry, prazo total e circuit breaker.
+
+    ``func`` recebe o tempo restante até o prazo (ou None) para limitar o
+    timeout de cada tentativa.
+    """
+    end = time.monotonic() + policy.deadline if policy.deadline else None
+    delay = policy.base_delay
+    attempt = 0
+    while True:
+        attempt += 1
+        remaining = _remaining(end)
+        if breaker:
+            breaker.before_call()
+        try:
+            with span("attempt"):
+                result = func(remaining)
+        except Exception as e:
+            if breaker:
+                breaker.record(e)
+            next_delay = _plan_retry(policy, attempt, e, delay, end)
+            if next_delay is None:
+                raise
+            delay = next_delay
+            if on_retry:
+                on_retry(attempt, e, delay)
+            with span("retry_backoff"):
+                time.sleep(delay)
+            continue
+        except BaseException:
+            if breaker:
+                breaker.release()
+            raise
+        if breaker:
+            breaker.record()
+        return result
+
+
+async def async_retry_call(
+    func: Callable[[Optional[float]], Awaitable[T]],
+    policy: RetryPolicy,
+    breaker: Optional[CircuitBreaker] = None,
+    on_retry: Optional[OnRetry] = None
+) -> T:
+    """Versão assíncrona de retry_call, que espera com asyncio.sleep"""
+    import asyncio
+
+    end = time.monotonic() + policy.deadline if policy.deadline else None
+    delay = policy.base_delay
+    attempt = 0
+    while True:
+        attempt += 1
+        remaining = _remaining(end)
+        if breaker:
+            breaker.before_call()
+        try:
+            with span("attempt"):
+                result = await func(remaining)
+        except Exception as e:
+            if breaker:
+                breaker.record(e)
+            next_delay = _plan_retry(policy, attempt, e, delay, end)
+            if next_delay is None:
+                raise
+            delay = next_delay
+            if on_retry:
+                on_retry(attempt, e, delay)
+            with span("retry_backoff"):
+                await asyncio.sleep(delay)
+            continue
+        except BaseException:
+            if breaker:
+                breaker.release()
+            raise
+        if breaker:
+            breaker.record()
+        return result
@@ -0,0 +1,306 @@
+import os
+import random
+import struct
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+from .config import CONFIG_DIR, MODEL_PRICES, SUPPORTED_MODELS, AppConfig
+from .instrumentation import CompletionResult, RequestContext, RequestHook
+from .retry import UNHEALTHY_ERRORS
+
+DEFAULT_HISTORY_DIR = CONFIG_DIR / "model_history"
+
+# (timestamp, latência, tokens de entrada, tokens de saída, sucesso)
+_RECORD = struct.Struct("<dfIIB")
+_MAGIC = b"ORH1"
+
+Sample = Tuple[float, float, int, int, int]
+
+
+@dataclass
+class ModelStats:
+    """Resumo do histórico recente de um modelo"""
+    samples: int = 0
+    p95: float = 0.0                    # latência das requisições com sucesso (s)
+    error_rate: float = 0.0
+    tokens_per_second: float = 0.0      # tokens gerados por segundo de latência
+    completion_tokens: float = 0.0      # média de tokens gerados por requisição
+
+
+class ModelHistory:
+    """Ring buffer de tamanho fixo por modelo, persistido em ``directory``.
+
+    Cada amostra ocupa 21 bytes; com 256 amostras, o histórico de um modelo
+    cabe em ~5 KB. ``flush`` mescla com o que estiver em disco (outros
+    processos também gravam) e mantém as ``size`` amostras mais recentes.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, size: int = 256):
+        self.directory = Path(directory) if directory else DEFAULT_HISTORY_DIR
+        self.size = size
+        self._rings: Dict[str, Deque[Sample]] = {}
+        self._dirty: set = set()
+        self._lock = threading.Lock()
+
+    def _path(self, model: str) -> Path:
+        return self.directory / f"{model}.ring"
+
+    def _read(self, model: str) -> List[Sample]:
+        try:
+            data = self._path(model).read_bytes()
+        except OSError:
+            return []
+        if not data.startswith(_MAGIC):
+            return []
+        body = data[len(_MAGIC):]
+        body = body[:len(body) - len(body) % _RECORD.size]
+        return list(_RECORD.iter_unpack(body))
+
+    def _ring(self, model: str) -> Deque[Sample]:
+        ring = self._rings.get(model)
+        if ring is None:
+            ring = deque(self._read(model)[-self.size:], maxlen=self.size)
+            self._rings[model] = ring
+        return ring
+
+    def samples(self, model: str) -> List[Sample]:
+        with self._lock:
+            return list(self._ring(model))
+
+    def record(self, model: str, latency: float, prompt_tokens: int, completion_tokens: int, ok: bool) -> None:
+        with self._lock:
+            self._ring(model).append((time.time(), latency, prompt_tokens, completion_tokens, int(ok)))
+            self._dirty.add(model)
+
+    def flush(self) -> None:
+        """Grava os modelos alterados, mesclando com as amostras de outros processos"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            for model in dirty:
+                merged = sorted(set(self._read(model)) | set(self._ring(model)))[-self.size:]
+                self._rings[model] = deque(merged, maxlen=self.size)
+                try:
+                    self.directory.mkdir(parents=True, exist_ok=True)
+                    path = self._path(model)
+                    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+                    tmp.write_bytes(_MAGIC + b"".join(_RECORD.pack(*sample) for sample in merged))
+                    os.replace(tmp, path)
+                except OSError:
+                    pass
+
+    def stats(self, model: str) -> ModelStats:
+        samples = self.samples(model)
+        if not samples:
+            return ModelStats()
+        latencies = sorted(s[1] for s in samples if s[4])
+        successes = len(latencies)
+        generated = sum(s[3] for s in samples if s[4])
+        busy = sum(latencies)
+        return ModelStats(
+            samples=len(samples),
+            p95=latencies[min(successes - 1, int(0.95 * successes))] if successes else 0.0,
+            error_rate=1 - successes / len(samples),
+            tokens_per_second=generated / busy if busy else 0.0,
+            completion_tokens=generated / successes if successes else 0.0,
+        )
+
+
+@dataclass
+class RoutingObjective:
+    """O que o roteador otimiza.
+
+    - ``latency``: menor p95, entre os modelos com custo estimado por
+      requisição até ``max_cost`` (USD; 0 = sem teto)
+    - ``cost``: mais barato, entre os modelos com p95 até ``latency_slo`` (s)
+
+    Modelos com taxa de erro acima de ``max_error_rate`` só são escolhidos se
+    nenhum outro atender.
+    """
+    kind: str = "latency"
+    max_cost: float = 0.0
+    latency_slo: float = 10.0
+    max_error_rate: float = 0.2
+
+    def __post_init__(self) -> None:
+        if self.kind not in ("latency", "cost"):
+            raise ValueError(f"Objetivo de roteamento desconhecido: {self.kind} (use latency ou cost)")
+
+
+def estimate_cost(model: str, prompt_tokens: float, completion_tokens: float) -> float:
+    """Custo estimado de uma requisição em USD (preços por milhão de tokens em MODEL_PRICES)"""
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+class ModelRouter(RequestHook):
+    """Escolhe o modelo de requisições com ``model="auto"`` a partir do histórico local.
+
+    Como hook do cliente, registra latência, erros e tokens de todas as
+    requisições (não só as roteadas). A escolha usa estatísticas recalculadas
+    no máximo a cada ``refresh_interval`` segundos, então custa alguns
+    microssegundos. Com probabilidade ``exploration``, a requisição vai para
+    o modelo com menos amostras entre os que poderiam substituir o atual
+    (dentro do teto de custo, ou mais baratos que ele); modelos com menos de
+    ``min_samples`` amostras ainda não competem, e sem histórico vale
+    ``fallback``.
+    """
+
+    def __init__(
+        self,
+        models: Optional[Sequence[str]] = None,
+        objective: Optional[RoutingObjective] = None,
+        history: Optional[ModelHistory] = None,
+        fallback: str = "gpt-4o-mini",
+        exploration: float = 0.05,
+        min_samples: int = 5,
+        refresh_interval: float = 1.0,
+        flush_interval: float = 30.0,
+        seed: Optional[int] = None
+    ):
+        self.models = sorted(models or SUPPORTED_MODELS)
+        self.objective = objective or RoutingObjective()
+        self.history = history or ModelHistory()
+        self.fallback = fallback
+        self.exploration = exploration
+        self.min_samples = min_samples
+        self.refresh_interval = refresh_interval
+        self.flush_interval = flush_interval
+        self.decisions: Dict[Tuple[str, str], int] = {}
+        self._rng = random.Random(seed)
+        self._stats: Dict[str, ModelStats] = {}
+        self._stats_at = float("-inf")
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: AppConfig) -> "ModelRouter":
+        objective = RoutingObjective(
+            kind=config.router_objective,
+            max_cost=config.router_max_cost,
+            latency_slo=config.router_latency_slo,
+            max_error_rate=config.router_max_error_rate,
+        )
+        return cls(
+            models=config.router_models or None,
+            objective=objective,
+            history=ModelHistory(size=config.router_history_size),
+            fallback=config.router_fallback,
+            exploration=config.router_exploration,
+        )
+
+    def stats(self) -> Dict[str, ModelStats]:
+        now = time.monotonic()
+        if now - self._stats_at >= self.refresh_interval:
+            self._stats = {model: self.history.stats(model) for model in self.models}
+            self._stats_at = now
+        return self._stats
+
+    def _best(self, known: List[str], stats: Dict[str, ModelStats], costs: Dict[str, float]) -> Optional[str]:
+        objective = self.objective
+        healthy = [m for m in known if stats[m].error_rate <= objective.max_error_rate] or known
+        if not healthy:
+            return None
+        if objective.kind == "latency":
+            affordable = [m for m in healthy if not objective.max_cost or costs[m] <= objective.max_cost]
+            if affordable:
+                return min(affordable, key=lambda m: stats[m].p95)
+            return min(healthy, key=lambda m: costs[m])
+        within_slo = [m for m in healthy if stats[m].p95 <= objective.latency_slo]
+        if within_slo:
+            return min(within_slo, key=lambda m: costs[m])
+        return min(healthy, key=lambda m: stats[m].p95)
+
+    def choose(self, message: str, system_prompt: Optional[str] = None) -> str:
+        """Modelo para a próxima requisição"""
+        with self._lock:
+            stats = self.stats()
+            # ~4 bytes por token: estimativa suficiente para comparar custos
+            prompt_tokens = (len(message) + len(system_prompt or "")) / 4
+            # Sem histórico do modelo, supõe a saída média dos outros
+            sampled = [s.completion_tokens for s in stats.values() if s.completion_tokens]
+            typical = sum(sampled) / len(sampled) if sampled else 500
+            costs = {
+                m: estimate_cost(m, prompt_tokens, stats[m].completion_tokens or typical) for m in self.models
+            }
+            known = [m for m in self.models if stats[m].samples >= self.min_samples]
+            best = self._best(known, stats, costs)
+            current = best or (self.fallback if self.fallback in self.models else self.models[0])
+            reason = "best" if best else "fallback"
+
+            if self._rng.random() < self.exploration:
+                if self.objective.kind == "latency":
+                    options = [
+                        m for m in self.models if m != current
+                        and (not self.objective.max_cost or costs[m] <= self.objective.max_cost)
+                    ]
+                else:
+                    options = [m for m in self.models if m != current and costs[m] <= costs[current]]
+                if options:
+                    fewest = min(stats[m].samples for m in options)
+                    current = self._rng.choice([m for m in options if stats[m].samples == fewest])
+                    reason = "explore"
+            self.decisions[(current, reason)] = self.decisions.get((current, reason), 0) + 1
+            return current
+
+    def after_response(self, ctx: RequestContext, result: CompletionResult) -> None:
+        if result.cached:
+            return
+        usage = result.usage
+        # Só o tempo no upstream: fila do rate limiter, backoff e leitura do stream pelo
+        # consumidor medem este processo, não o modelo
+        self.history.record(
+            ctx.model, ctx.upstream_latency or result.latency,
+            usage.prompt_tokens if usage else 0, usage.completion_tokens if usage else 0, True
+        )
+        self._maybe_flush()
+
+    def on_error(self, ctx: RequestContext, error: Exception) -> None:
+        # Mesma regra do circuit breaker: rate limit local, 429, circuito aberto,
+        # API key e validação não dizem nada sobre a saúde do modelo
+        if not isinstance(error, UNHEALTHY_ERRORS):
+            return
+        self.history.record(ctx.model, ctx.upstream_latency, 0, 0, False)
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            self._flushed_at = time.monotonic()
+            self.history.flush()
+
+    def close(self) -> None:
+        self.history.flush()
+
+    def report(self) -> List[Dict[str, object]]:
+        """Estatísticas e escolhas de cada modelo"""
+        stats = self.stats()
+        with self._lock:
+            decisions = dict(self.decisions)
+        rows = []
+        for model in self.models:
+            s = stats[model]
+            rows.append({
+                "model": model,
+                "samples": s.samples,
+                "p95": round(s.p95, 3),
+                "error_rate": round(s.error_rate, 3),
+                "tokens_per_second": round(s.tokens_per_second, 1),
+                "chosen": sum(count for (m, _), count in decisions.items() if m == model),
+                "explored": decisions.get((model, "explore"), 0),
+            })
+        return rows
+
+
+def routing_table(report: Sequence[Dict[str, object]]) -> str:
+    """Tabela do histórico e das escolhas do roteador por modelo"""
+    header = f"{'modelo':<24}{'amostras':>9}{'p95':>9}{'erros':>8}{'tokens/s':>10}{'escolhido':>11}{'exploração':>12}"
+    lines = [header, "-" * len(header)]
+    for row in report:
+        lines.append(
+            f"{row['model']:<24}{row['samples']:>9}{row['p95']:>8.2f}s{row['error_rate']:>8.0%}"
+            f"{row['tokens_per_second']:>10.1f}{row['chosen']:>11}{row['explored']:>12}"
+        )
+    return "\n".join(lines)
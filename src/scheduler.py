@@ -0,0 +1,311 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Deque, Dict, Iterator, List, Optional
+
+from .config import AppConfig
+from .exceptions import RateLimitError
+from .rate_limiter import RateLimiter
+
+PRIORITY_CLASSES = ("interactive", "api", "batch")
+
+_current_priority: ContextVar[Optional[str]] = ContextVar("openrouter_priority", default=None)
+
+
+def _check_priority(priority: str) -> str:
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(f"Prioridade desconhecida: {priority} (use {', '.join(PRIORITY_CLASSES)})")
+    return priority
+
+
+@contextmanager
+def request_priority(priority: str) -> Iterator[None]:
+    """Classe de prioridade das requisições feitas dentro do bloco (nesta thread/task)"""
+    token = _current_priority.set(_check_priority(priority))
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class _Ticket:
+    __slots__ = ("priority", "tag", "enqueued_at")
+
+    def __init__(self, priority: str, tag: float, enqueued_at: float):
+        self.priority = priority
+        self.tag = tag
+        self.enqueued_at = enqueued_at
+
+
+class SharedWaiters:
+    """Quantas requisições de cada classe esperam em cada processo da máquina.
+
+    Fica no mesmo SQLite do rate limiter compartilhado; linhas de processos
+    que não atualizam há ``stale_after`` segundos são ignoradas.
+    """
+
+    def __init__(self, path: Path, stale_after: float = 3.0):
+        self.path = path
+        self.stale_after = stale_after
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._published: Dict[str, int] = {}
+        self._published_at = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                str(self.path), timeout=10.0, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS waiters ("
+                "pid INTEGER NOT NULL, priority TEXT NOT NULL, count INTEGER NOT NULL, "
+                "updated_at REAL NOT NULL, PRIMARY KEY (pid, priority))"
+            )
+            self._conn = conn
+        return self._conn
+
+    def publish(self, counts: Dict[str, int]) -> None:
+        """Registra as esperas deste processo.
+
+        Só as classes às quais outro processo pode ceder (todas menos a
+        última) importam; sem mudança, regrava apenas para não ficar velho.
+        """
+        now = time.time()
+        counts = {priority: counts.get(priority, 0) for priority in PRIORITY_CLASSES[:-1]}
+        if counts == self._published and (
+            not any(counts.values()) or now - self._published_at < self.stale_after / 3
+        ):
+            return
+        with self._lock:
+            try:
+                self._connect().executemany(
+                    "INSERT OR REPLACE INTO waiters (pid, priority, count, updated_at) VALUES (?, ?, ?, ?)",
+                    [(self.pid, priority, count, now) for priority, count in counts.items()]
+                )
+            except sqlite3.Error:
+                return
+        self._published = counts
+        self._published_at = now
+
+    def higher_waiting(self, priority: str) -> bool:
+        """Se outro processo tem requisições de classe mais alta esperando"""
+        higher = PRIORITY_CLASSES[:PRIORITY_CLASSES.index(priority)]
+        if not higher:
+            return False
+        with self._lock:
+            try:
+                row = self._connect().execute(
+                    f"SELECT 1 FROM waiters WHERE pid != ? AND count > 0 AND updated_at >= ? "
+                    f"AND priority IN ({','.join('?' * len(higher))}) LIMIT 1",
+                    (self.pid, time.time() - self.stale_after, *higher)
+                ).fetchone()
+            except sqlite3.Error:
+                return False
+        return row is not None
+
+
+class PriorityRateLimiter(RateLimiter):
+    """Rate limiter com fila de prioridade entre as classes interactive, api e batch.
+
+    Todas as classes dividem o mesmo bucket. Quem espera recebe um tag de
+    weighted-fair queueing (``tag = max(tempo virtual, último tag da classe)
+    + 1 / peso``) e só o primeiro da fila consulta o bucket; com pesos
+    16/4/1, uma requisição interativa passa à frente de todo o batch já
+    enfileirado. Para evitar starvation, cada segundo de espera reduz o tag
+    em ``aging`` (o equivalente a ``aging`` requisições de peso 1).
+
+    A classe vem de ``request_priority()`` ou, fora dele, de
+    ``default_priority``. Com ``shared``, um processo só de batch também
+    cede o bucket enquanto outro processo da máquina (ex.: o menu
+    interativo) tiver requisições de classe mais alta esperando.
+    """
+
+    def __init__(
+        self,
+        max_calls: int = 10,
+        time_window: int = 60,
+        max_wait: Optional[float] = 60.0,
+        bucket=None,
+        weights: Optional[Dict[str, float]] = None,
+        aging: float = 1.0,
+        default_priority: str = "interactive",
+        shared: Optional[SharedWaiters] = None,
+        history: int = 1000
+    ):
+        super().__init__(max_calls, time_window, max_wait, bucket)
+        self.weights = {"interactive": 16.0, "api": 4.0, "batch": 1.0, **(weights or {})}
+        self.aging = aging
+        self.default_priority = _check_priority(default_priority)
+        self.shared = shared
+        self._cond = threading.Condition()
+        self._queue: List[_Ticket] = []
+        # Só um ticket por vez consulta o bucket; o contador acorda quem
+        # estava fora do lock quando houve mudança na fila
+        self._taking = False
+        self._changes = 0
+        self._virtual_time = 0.0
+        self._last_tag: Dict[str, float] = {}
+        self._waits: Dict[str, Deque[float]] = {p: deque(maxlen=history) for p in PRIORITY_CLASSES}
+        self._granted: Dict[str, int] = {p: 0 for p in PRIORITY_CLASSES}
+
+    @classmethod
+    def from_config(cls, config: AppConfig, api_key: Optional[str] = None) -> "PriorityRateLimiter":
+        limiter = super().from_config(config, api_key)
+        limiter.weights.update(config.priority_weights)
+        limiter.aging = config.priority_aging
+        limiter.default_priority = _check_priority(config.default_priority)
+        bucket_path = getattr(limiter.bucket, "path", None)
+        if bucket_path is not None:
+            limiter.shared = SharedWaiters(bucket_path)
+        return limiter
+
+    def _head(self, now: float) -> _Ticket:
+        return min(self._queue, key=lambda t: t.tag - self.aging * (now - t.enqueued_at))
+
+    def _counts(self) -> Dict[str, int]:
+        counts = {p: 0 for p in PRIORITY_CLASSES}
+        for ticket in self._queue:
+            counts[ticket.priority] += 1
+        return counts
+
+    def acquire(self, timeout: Optional[float] = None, priority: Optional[str] = None) -> float:
+        """Espera pela vez da requisição na fila e por um token; retorna a espera em segundos.
+
+        O lock protege só a fila em memória: o SQLite (bucket e esperas
+        compartilhadas) é consultado fora dele.
+        """
+        priority = _check_priority(priority or _current_priority.get() or self.default_priority)
+        started = time.monotonic()
+        deadline = self._deadline(timeout)
+        with self._cond:
+            tag = max(self._virtual_time, self._last_tag.get(priority, 0.0)) + 1 / self.weights[priority]
+            self._last_tag[priority] = tag
+            ticket = _Ticket(priority, tag, started)
+            self._queue.append(ticket)
+            self._notify()
+        try:
+            while True:
+                with self._cond:
+                    now = time.monotonic()
+                    changes = self._changes
+                    counts = self._counts()
+                    head = not self._taking and self._head(now) is ticket
+                    self._taking = self._taking or head
+                if self.shared is not None:
+                    self.shared.publish(counts)
+                # Reavalia periodicamente por causa do aging
+                wait = 0.25
+                if head:
+                    try:
+                        if self.shared is not None and self.shared.higher_waiting(priority):
+                            wait = 0.1
+                        else:
+                            wait = self.bucket.take()
+                            if not wait:
+                                break
+                            if deadline is not None and now + wait > deadline:
+                                raise self._exceeded()
+                    finally:
+                        with self._cond:
+                            self._taking = False
+                            self._notify()
+                            changes = self._changes
+                if deadline is not None:
+                    if now >= deadline:
+                        raise self._exceeded()
+                    wait = min(wait, deadline - now)
+                with self._cond:
+                    if self._changes == changes:
+                        self._cond.wait(wait)
+            with self._cond:
+                self._virtual_time = max(self._virtual_time, ticket.tag)
+        finally:
+            with self._cond:
+                self._queue.remove(ticket)
+                counts = self._counts()
+                self._notify()
+            if self.shared is not None:
+                self.shared.publish(counts)
+        waited = time.monotonic() - started
+        with self._metrics_lock:
+            self._waits[priority].append(waited)
+            self._granted[priority] += 1
+        self._record_wait(waited)
+        return waited
+
+    def _notify(self) -> None:
+        self._changes += 1
+        self._cond.notify_all()
+
+    def _exceeded(self) -> RateLimitError:
+        return RateLimitError(f"Rate limit excedido: {self.max_calls} chamadas por {self.time_window}s")
+
+    def queue_depth(self) -> Dict[str, int]:
+        with self._cond:
+            return self._counts()
+
+    def wait_report(self) -> Dict[str, Dict[str, float]]:
+        """Espera na fila por classe: requisições, p50, p95 e máximo (segundos)"""
+        report = {}
+        depth = self.queue_depth()
+        with self._metrics_lock:
+            for priority in PRIORITY_CLASSES:
+                waits = sorted(self._waits[priority])
+                report[priority] = {
+                    "requests": self._granted[priority],
+                    "queued": depth[priority],
+                    "p50": _quantile(waits, 0.5),
+                    "p95": _quantile(waits, 0.95),
+                    "max": waits[-1] if waits else 0.0,
+                }
+        return report
+
+    def render_prometheus(self) -> List[str]:
+        """Espera e fila por classe no formato do Prometheus (ver PrometheusExporter.add_collector)"""
+        from .instrumentation import _labels
+
+        report = self.wait_report()
+        lines = [
+            "# HELP openrouter_queue_wait_seconds Espera na fila de prioridade (janela recente)",
+            "# TYPE openrouter_queue_wait_seconds summary",
+        ]
+        for priority, values in report.items():
+            for quantile in ("p50", "p95"):
+                labels = _labels(priority=priority, quantile=f"0.{quantile[1:]}")
+                lines.append(f"openrouter_queue_wait_seconds{labels} {values[quantile]:.6f}")
+            lines.append(f"openrouter_queue_wait_seconds_count{_labels(priority=priority)} {values['requests']}")
+        lines += [
+            "# HELP openrouter_queue_depth Requisições esperando na fila de prioridade",
+            "# TYPE openrouter_queue_depth gauge",
+        ]
+        for priority, values in report.items():
+            lines.append(f"openrouter_queue_depth{_labels(priority=priority)} {values['queued']}")
+        return lines
+
+
+def _quantile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def wait_table(report: Dict[str, Dict[str, float]]) -> str:
+    """Tabela da espera por classe de prioridade"""
+    header = f"{'classe':<14}{'requisições':>12}{'p50':>9}{'p95':>9}{'máximo':>9}"
+    lines = [header, "-" * len(header)]
+    for priority, values in report.items():
+        if values["requests"]:
+            lines.append(
+                f"{priority:<14}{values['requests']:>12}{values['p50']:>8.2f}s"
+                f"{values['p95']:>8.2f}s{values['max']:>8.2f}s"
+            )
+    return "\n".join(lines)
@@ -0,0 +1,320 @@
+"""Servidor HTTP local que expõe os agentes como endpoints JSON.
+
+Um único cliente (e seu pool de conexões) atende todas as requisições.
+Requisições idênticas em andamento (mesmo agente, modelo e input sanitizado)
+são atendidas por uma única chamada ao OpenRouter, e uma fila limitada de
+trabalho faz o servidor responder 503 quando saturado.
+"""
+import json
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .client import MessageStream
+from .exceptions import (
+    CircuitOpenError,
+    ConnectionError,
+    InvalidAPIKeyError,
+    RateLimitError,
+    ServerError,
+)
+
+
+@dataclass
+class AgentEndpoint:
+    """Agente exposto em ``/v1/agents/<nome>``"""
+    name: str
+    stream: Callable[[str, Optional[str]], MessageStream]
+    validate: Callable[[str, Optional[str]], str]
+    max_body_bytes: int = 1024 * 1024
+
+
+class Flight:
+    """Uma chamada ao OpenRouter compartilhada por todas as requisições idênticas"""
+
+    def __init__(self, key: Tuple[str, str, str]):
+        self.key = key
+        self.deltas: List[str] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.model: Optional[str] = None
+        self.started_at = time.perf_counter()
+        self._cond = threading.Condition()
+
+    def push(self, delta: str) -> None:
+        with self._cond:
+            self.deltas.append(delta)
+            self._cond.notify_all()
+
+    def finish(self, model: Optional[str] = None, error: Optional[Exception] = None) -> None:
+        with self._cond:
+            self.model = model
+            self.error = error
+            self.done = True
+            self._cond.notify_all()
+
+    def follow(self) -> Iterator[str]:
+        """Deltas desde o início, bloqueando até que os próximos cheguem"""
+        index = 0
+        while True:
+            with self._cond:
+                while index == len(self.deltas) and not self.done:
+                    self._cond.wait()
+                pending = self.deltas[index:]
+                finished = self.done
+            index += len(pending)
+            yield from pending
+            if finished and index == len(self.deltas):
+                if self.error is not None:
+                    raise self.error
+                return
+
+    def wait(self) -> str:
+        return "".join(self.follow())
+
+
+@dataclass
+class ServerStats:
+    requests: int = 0
+    upstream_calls: int = 0
+    coalesced: int = 0
+    rejected: int = 0
+    errors: int = 0
+    by_agent: Dict[str, int] = field(default_factory=dict)
+
+
+class Saturated(Exception):
+    """Fila de trabalho cheia"""
+
+
+class AgentService:
+    """Single-flight e fila limitada entre o HTTP e os agentes"""
+
+    def __init__(
+        self,
+        endpoints: Dict[str, AgentEndpoint],
+        workers: int = 8,
+        queue_size: int = 64,
+        status: Optional[Callable[[], Dict[str, Any]]] = None
+    ):
+        self.endpoints = endpoints
+        self.workers = workers
+        self.status = status
+        self.stats = ServerStats()
+        self._queue: "queue.Queue[Tuple[Flight, AgentEndpoint, str, Optional[str]]]" = queue.Queue(queue_size)
+        self._flights: Dict[Tuple[str, str, str], Flight] = {}
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"agent-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, endpoint: AgentEndpoint, text: str, model: Optional[str]) -> Tuple[Flight, bool]:
+        """Retorna a chamada em andamento para a mesma requisição ou enfileira uma nova.
+
+        O booleano indica se a requisição foi agrupada a uma chamada existente.
+        Levanta Saturated se a fila estiver cheia.
+        """
+        key = (endpoint.name, model or "", text)
+        with self._lock:
+            self.stats.requests += 1
+            self.stats.by_agent[endpoint.name] = self.stats.by_agent.get(endpoint.name, 0) + 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.stats.coalesced += 1
+                return flight, True
+            flight = Flight(key)
+            try:
+                self._queue.put_nowait((flight, endpoint, text, model))
+            except queue.Full:
+                self.stats.rejected += 1
+                raise Saturated()
+            self._flights[key] = flight
+            self.stats.upstream_calls += 1
+        return flight, False
+
+    def _work(self) -> None:
+        while True:
+            flight, endpoint, text, model = self._queue.get()
+            try:
+                stream = endpoint.stream(text, model)
+                for delta in stream:
+                    flight.push(delta)
+                result = stream.result
+                # Retira antes de concluir: quem chegar depois faz uma nova chamada (ou usa o cache)
+                with self._lock:
+                    self._flights.pop(flight.key, None)
+                flight.finish(result.model if result else model)
+            except Exception as e:
+                with self._lock:
+                    self._flights.pop(flight.key, None)
+                    self.stats.errors += 1
+                flight.finish(model, e)
+            finally:
+                self._queue.task_done()
+
+    def health(self) -> Dict[str, Any]:
+        """Fila, chamadas em andamento, contadores e, se houver, a espera no rate limiter"""
+        with self._lock:
+            health = {
+                "status": "ok",
+                "queue_depth": self._queue.qsize(),
+                "queue_size": self._queue.maxsize,
+                "in_flight": len(self._flights),
+                "workers": self.workers,
+                "requests": self.stats.requests,
+                "upstream_calls": self.stats.upstream_calls,
+                "coalesced": self.stats.coalesced,
+                "rejected": self.stats.rejected,
+                "errors": self.stats.errors,
+            }
+        if self.status:
+            health["rate_limiter_queue"] = self.status()
+        return health
+
+
+def error_status(error: Exception) -> int:
+    """Código HTTP correspondente a uma exceção da aplicação"""
+    if isinstance(error, InvalidAPIKeyError):
+        return 401
+    if isinstance(error, RateLimitError):
+        return 429
+    if isinstance(error, CircuitOpenError):
+        return 503
+    if isinstance(error, (ServerError, ConnectionError)):
+        return 502
+    if isinstance(error, ValueError):
+        return 400
+    return 500
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "AgentHTTPServer"
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self._send_json(status, {"error": message}, headers)
+
+    def do_GET(self) -> None:
+        service = self.server.service
+        path = self.path.rstrip("/")
+        if path == "/health":
+            self._send_json(200, service.health())
+        elif path == "/v1/agents":
+            self._send_json(200, {"agents": sorted(service.endpoints)})
+        else:
+            self._send_error(404, "Endpoint não encontrado")
+
+    def do_POST(self) -> None:
+        service = self.server.service
+        prefix = "/v1/agents/"
+        name = self.path[len(prefix):].rstrip("/") if self.path.startswith(prefix) else None
+        endpoint = service.endpoints.get(name or "")
+        if endpoint is None:
+            self._send_error(404, "Agente não encontrado")
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            # O corpo não foi lido: a conexão não pode ser reaproveitada
+            self.close_connection = True
+            self._send_error(400, "Content-Length inválido")
+            return
+        if length > endpoint.max_body_bytes:
+            self.close_connection = True
+            self._send_error(413, "Requisição muito grande")
+            return
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict) or not isinstance(request.get("input"), str):
+                raise ValueError("Campo 'input' (texto) é obrigatório")
+            model = request.get("model") or None
+            text = endpoint.validate(request["input"], model)
+        except ValueError as e:
+            self._send_error(400, str(e))
+            return
+
+        try:
+            flight, coalesced = service.submit(endpoint, text, model)
+        except Saturated:
+            self._send_error(503, "Servidor ocupado, tente novamente", {"Retry-After": "1"})
+            return
+
+        if request.get("stream"):
+            self._stream(flight, coalesced)
+            return
+        try:
+            output = flight.wait()
+        except Exception as e:
+            self._send_error(error_status(e), str(e))
+            return
+        self._send_json(200, {
+            "agent": name,
+            "model": flight.model,
+            "output": output,
+            "coalesced": coalesced,
+            "latency": time.perf_counter() - flight.started_at,
+        })
+
+    def _stream(self, flight: Flight, coalesced: bool) -> None:
+        """Server-sent events: um evento por delta e um evento final com o status"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(payload: Dict[str, Any]) -> None:
+            self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            for delta in flight.follow():
+                event({"delta": delta})
+            event({"done": True, "model": flight.model, "coalesced": coalesced})
+        except (BrokenPipeError, ConnectionResetError):
+            return
+        except Exception as e:
+            event({"error": str(e), "status": error_status(e)})
+
+
+class AgentHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+    service: AgentService
+
+
+def create_server(
+    service: AgentService,
+    host: str = "127.0.0.1",
+    port: int = 8080
+) -> AgentHTTPServer:
+    """Cria o servidor HTTP e inicia os workers do serviço"""
+    server = AgentHTTPServer((host, port), _Handler)
+    server.service = service
+    service.start()
+    return server
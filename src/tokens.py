@@ -0,0 +1,116 @@
+import re
+from functools import lru_cache
+from typing import Callable, Optional
+
+from .config import MODEL_CONTEXT_WINDOWS, MODEL_FAMILIES, MODEL_MAX_OUTPUT_TOKENS
+
+# Encodings do tiktoken por família; as demais usam a estimativa por regex
+TIKTOKEN_ENCODINGS = {"openai": "o200k_base"}
+
+# Palavras são quebradas em pedaços de até 4 caracteres e cada pontuação conta
+# como um token: próximo dos tokenizers BPE para português e inglês, e feito
+# inteiramente pelo motor de regex
+_APPROXIMATE = re.compile(r"\w{1,4}|[^\w\s]")
+
+# Custo fixo por mensagem no formato de chat (role, separadores)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def _approximate_count(text: str) -> int:
+    return len(_APPROXIMATE.findall(text))
+
+
+@lru_cache(maxsize=None)
+def get_counter(family: str) -> Callable[[str], int]:
+    """Função de contagem da família, carregada sob demanda e reutilizada.
+
+    Usa o tiktoken quando instalado (dependência opcional); sem ele, ou
+    para famílias sem tokenizer local, usa a estimativa por regex.
+    """
+    encoding_name = TIKTOKEN_ENCODINGS.get(family)
+    if encoding_name:
+        try:
+            import tiktoken
+
+            encoding = tiktoken.get_encoding(encoding_name)
+            return lambda text: len(encoding.encode(text, disallowed_special=()))
+        except Exception:
+            pass
+    return _approximate_count
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Número (estimado) de tokens de ``text`` no tokenizer de ``model``"""
+    if not text:
+        return 0
+    return get_counter(MODEL_FAMILIES.get(model, "other"))(text)
+
+
+def count_prompt_tokens(message: str, system_prompt: Optional[str], model: str) -> int:
+    """Tokens de entrada de uma requisição com system prompt e mensagem do usuário"""
+    total = count_tokens(message, model) + MESSAGE_OVERHEAD_TOKENS
+    if system_prompt:
+        total += count_tokens(system_prompt, model) + MESSAGE_OVERHEAD_TOKENS
+    return total
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str, marker: str = "…") -> str:
+    """``text`` cortado (no fim) para caber em ``max_tokens`` tokens de ``model``"""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    # Busca binária no número de caracteres: contar é bem mais barato que tokenizar às cegas
+    low, high = 0, len(text)
+    budget = max_tokens - count_tokens(marker, model)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle], model) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low].rstrip() + marker
+
+
+def output_cap(model: str, max_tokens: Optional[int]) -> Optional[int]:
+    """``max_tokens`` limitado ao máximo de saída do modelo"""
+    model_max = MODEL_MAX_OUTPUT_TOKENS.get(model)
+    if max_tokens is None:
+        return None
+    return min(max_tokens, model_max) if model_max else max_tokens
+
+
+def fits(model: str, prompt_tokens: int, max_tokens: Optional[int]) -> bool:
+    context = MODEL_CONTEXT_WINDOWS.get(model)
+    return context is None or prompt_tokens + (output_cap(model, max_tokens) or 0) <= context
+
+
+def pick_model(
+    message: str,
+    system_prompt: Optional[str],
+    preferred: str,
+    max_tokens: Optional[int] = None
+) -> str:
+    """``preferred`` se a requisição couber no contexto dele; senão, o modelo de
+    menor contexto suficiente, preferindo a mesma família.
+
+    Levanta ValueError se nenhum modelo comportar a requisição.
+    """
+    # Cada token tem ao menos um byte: textos curtos nem precisam ser contados
+    size = len(message.encode("utf-8")) + len((system_prompt or "").encode("utf-8"))
+    if fits(preferred, size + 2 * MESSAGE_OVERHEAD_TOKENS, max_tokens):
+        return preferred
+    if fits(preferred, count_prompt_tokens(message, system_prompt, preferred), max_tokens):
+        return preferred
+    family = MODEL_FAMILIES.get(preferred)
+    candidates = sorted(
+        (m for m in MODEL_CONTEXT_WINDOWS if m != preferred),
+        key=lambda m: (MODEL_FAMILIES.get(m) != family, MODEL_CONTEXT_WINDOWS[m])
+    )
+    for model in candidates:
+        if fits(model, count_prompt_tokens(message, system_prompt, model), max_tokens):
+            return model
+    raise ValueError(
+        f"Input muito longo: ~{count_prompt_tokens(message, system_prompt, preferred)} tokens "
+        f"não cabem no contexto de nenhum modelo disponível"
+    )
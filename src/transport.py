@@ -0,0 +1,242 @@
+import importlib.util
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from .config import AppConfig
+
+
+@dataclass
+class ConnectionStats:
+    """Uso das conexões do pool HTTP compartilhado"""
+    requests: int = 0
+    new_connections: int = 0        # requisições que precisaram abrir conexão (DNS, TCP e TLS)
+    reused_connections: int = 0     # requisições atendidas por uma conexão já aberta
+    handshake_seconds: float = 0.0  # tempo total gasto abrindo conexões
+    prewarmed: int = 0              # conexões abertas por prewarm()
+    http2: bool = False
+
+    @property
+    def reuse_ratio(self) -> float:
+        total = self.new_connections + self.reused_connections
+        return self.reused_connections / total if total else 0.0
+
+
+class _Tracker:
+    """Acompanha uma requisição pelos eventos de trace do httpcore"""
+    __slots__ = ("connected", "started_at", "handshake")
+
+    def __init__(self) -> None:
+        self.connected = False
+        self.started_at = 0.0
+        self.handshake = 0.0
+
+    def event(self, name: str) -> None:
+        if name == "connection.connect_tcp.started":
+            self.connected = True
+            self.started_at = time.perf_counter()
+        elif name in ("connection.connect_tcp.complete", "connection.start_tls.complete") and self.connected:
+            self.handshake = time.perf_counter() - self.started_at
+
+
+def _http_module():
+    """httpx usado pelo SDK openai instalado (versões recentes usam o fork httpx2)"""
+    import sys
+
+    from openai import DefaultHttpxClient
+
+    base = next(cls for cls in DefaultHttpxClient.__mro__[1:] if not cls.__module__.startswith("openai"))
+    return sys.modules[base.__module__.split(".")[0]]
+
+
+class SharedTransport:
+    """Pool HTTP único do processo, reusado por todos os clientes.
+
+    Cada OpenRouterClient criava o próprio cliente HTTP do SDK, e a primeira
+    requisição de cada um pagava DNS, TCP e TLS. Aqui o pool (keep-alive,
+    HTTP/2 quando o pacote ``h2`` está instalado) é criado uma vez e
+    compartilhado; ``prewarm`` abre uma conexão em segundo plano antes da
+    primeira requisição. Clientes assíncronos compartilham um pool por event
+    loop. Os eventos de trace do httpcore dizem, a cada requisição, se a
+    conexão foi aberta ou reusada.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 90.0,
+        http2: bool = True
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        self._stats = ConnectionStats(http2=self.http2)
+        self._lock = threading.Lock()
+        self._client = None
+        self._async_clients: Dict[Any, Any] = {}
+
+    @classmethod
+    def from_config(cls, config: AppConfig) -> "SharedTransport":
+        return cls(
+            config.http_max_connections,
+            config.http_max_keepalive_connections,
+            config.http_keepalive_expiry,
+            config.http2
+        )
+
+    def transport_options(self) -> Dict[str, Any]:
+        """Limites do pool e HTTP/2, aceitos pelos clientes e transportes do httpx"""
+        httpx = _http_module()
+        return {
+            "limits": httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            "http2": self.http2,
+        }
+
+    def _record(self, tracker: _Tracker, prewarm: bool = False) -> None:
+        with self._lock:
+            stats = self._stats
+            if prewarm:
+                stats.prewarmed += int(tracker.connected)
+            else:
+                stats.requests += 1
+                if tracker.connected:
+                    stats.new_connections += 1
+                else:
+                    stats.reused_connections += 1
+            stats.handshake_seconds += tracker.handshake
+
+    def client(self):
+        """Cliente HTTP síncrono compartilhado, para ``OpenAI(http_client=...)``"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from openai import DefaultHttpxClient
+
+                    self._client = DefaultHttpxClient(
+                        event_hooks={"request": [self._on_request], "response": [self._on_response]},
+                        **self.transport_options()
+                    )
+        return self._client
+
+    def _on_request(self, request) -> None:
+        tracker = _Tracker()
+        request.extensions["openrouter_tracker"] = tracker
+        request.extensions["trace"] = lambda name, info: tracker.event(name)
+
+    def _on_response(self, response) -> None:
+        tracker = response.request.extensions.get("openrouter_tracker")
+        if tracker is not None:
+            self._record(tracker, response.request.extensions.get("openrouter_prewarm", False))
+
+    def async_client(self):
+        """Cliente HTTP assíncrono compartilhado pelo event loop atual"""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            # Pools de loops já encerrados não servem mais
+            for stale in [l for l in self._async_clients if l.is_closed()]:
+                del self._async_clients[stale]
+            client = self._async_clients.get(loop)
+            if client is None:
+                from openai import DefaultAsyncHttpxClient
+
+                client = DefaultAsyncHttpxClient(
+                    event_hooks={"request": [self._aon_request], "response": [self._aon_response]},
+                    **self.transport_options()
+                )
+                self._async_clients[loop] = client
+        return client
+
+    async def _aon_request(self, request) -> None:
+        tracker = _Tracker()
+
+        async def trace(name: str, info: Dict[str, Any]) -> None:
+            tracker.event(name)
+
+        request.extensions["openrouter_tracker"] = tracker
+        request.extensions["trace"] = trace
+
+    async def _aon_response(self, response) -> None:
+        self._on_response(response)
+
+    def prewarm(self, base_url: str, timeout: float = 10.0) -> threading.Thread:
+        """Abre uma conexão com ``base_url`` em segundo plano (DNS, TCP e TLS).
+
+        Falhas são ignoradas: a primeira requisição apenas abre a conexão
+        normalmente.
+        """
+        def _warm() -> None:
+            try:
+                response = self.client().head(
+                    base_url.rstrip("/") + "/models",
+                    timeout=timeout,
+                    extensions={"openrouter_prewarm": True}
+                )
+                response.close()
+            except Exception:
+                pass
+
+        thread = threading.Thread(target=_warm, name="openrouter-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> ConnectionStats:
+        with self._lock:
+            return ConnectionStats(**vars(self._stats))
+
+    def render_prometheus(self) -> List[str]:
+        """Conexões novas e reusadas no formato do Prometheus (ver PrometheusExporter.add_collector)"""
+        from .instrumentation import _labels
+
+        stats = self.stats()
+        lines = [
+            "# HELP openrouter_http_requests_total Requisições HTTP por origem da conexão",
+            "# TYPE openrouter_http_requests_total counter",
+            f"openrouter_http_requests_total{_labels(connection='new')} {stats.new_connections}",
+            f"openrouter_http_requests_total{_labels(connection='reused')} {stats.reused_connections}",
+            "# HELP openrouter_http_handshake_seconds_total Tempo gasto abrindo conexões (DNS, TCP e TLS)",
+            "# TYPE openrouter_http_handshake_seconds_total counter",
+            f"openrouter_http_handshake_seconds_total {stats.handshake_seconds:.6f}",
+            "# HELP openrouter_http_prewarmed_total Conexões abertas antecipadamente",
+            "# TYPE openrouter_http_prewarmed_total counter",
+            f"openrouter_http_prewarmed_total {stats.prewarmed}",
+        ]
+        return lines
+
+    def close(self) -> None:
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+
+_shared: Optional[SharedTransport] = None
+_shared_lock = threading.Lock()
+
+
+def shared_transport(config: Optional[AppConfig] = None) -> SharedTransport:
+    """Pool HTTP do processo; criado na primeira chamada com os limites de ``config``"""
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = SharedTransport.from_config(config or AppConfig())
+    return _shared
+
+
+def connection_summary(stats: ConnectionStats) -> str:
+    """Linha com o reuso de conexões, para exibir ao final de um comando"""
+    handshake = stats.handshake_seconds / stats.new_connections * 1000 if stats.new_connections else 0.0
+    return (
+        f"Conexões HTTP{' (HTTP/2)' if stats.http2 else ''}: {stats.reused_connections} requisições "
+        f"em conexões reusadas, {stats.new_connections} em novas (handshake médio {handshake:.0f} ms)"
+        + (f", {stats.prewarmed} aberta(s) antecipadamente" if stats.prewarmed else "")
+    )
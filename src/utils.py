@@ -1,15 +1,10 @@
 import os
 import re
 import stat
-import time
 from pathlib import Path
-from typing import Callable, Optional, TypeVar
-from collections import deque
+from typing import List, Optional
 
-from .exceptions import RateLimitError, ConnectionError
-from .config import MAX_INPUT_LENGTH
-
-T = TypeVar('T')
+from .config import CONFIG_DIR, MAX_INPUT_LENGTH, AppConfig
 
 
 def mask_api_key(api_key: str, visible_chars: int = 4) -> str:
@@ -37,10 +32,21 @@ def sanitize_input(text: str, max_length: int = MAX_INPUT_LENGTH) -> str:
     return text
 
 
-def validate_input_length(text: str, max_length: int = MAX_INPUT_LENGTH) -> bool:
-    """Valida tamanho do input"""
+def validate_input_length(
+    text: str,
+    max_length: int = MAX_INPUT_LENGTH,
+    max_tokens: Optional[int] = None,
+    model: Optional[str] = None
+) -> bool:
+    """Valida tamanho do input em caracteres e, se ``max_tokens``, em tokens do modelo"""
     if len(text) > max_length:
         raise ValueError(f"Input muito longo. Máximo: {max_length} caracteres")
+    if max_tokens is not None:
+        from .tokens import count_tokens
+
+        tokens = count_tokens(text, model or AppConfig().default_model)
+        if tokens > max_tokens:
+            raise ValueError(f"Input muito longo (~{tokens} tokens). Máximo: {max_tokens} tokens")
     return True
 
 
@@ -50,7 +56,7 @@ def get_api_key_from_env_or_file() -> Optional[str]:
     if api_key:
         return api_key
     
-    config_file = Path.home() / ".openrouter" / "api_key"
+    config_file = CONFIG_DIR / "api_key"
     if config_file.exists():
         return config_file.read_text().strip()
     
@@ -69,49 +75,28 @@ def get_api_key(api_key_arg: Optional[str] = None) -> str:
     raise ValueError("API key não encontrada")
 
 
+def get_api_keys(keys_file: Optional[Path] = None) -> List[str]:
+    """Pool de API keys: arquivo informado > OPENROUTER_API_KEYS (separadas por vírgula) > ~/.openrouter/api_keys
+
+    No arquivo, uma key por linha; linhas vazias e iniciadas por ``#`` são
+    ignoradas. Retorna lista vazia se nenhuma fonte estiver configurada.
+    """
+    if keys_file is not None:
+        if not keys_file.exists():
+            raise ValueError(f"Arquivo de API keys não encontrado: {keys_file}")
+        lines = keys_file.read_text().splitlines()
+    elif os.getenv("OPENROUTER_API_KEYS"):
+        lines = os.getenv("OPENROUTER_API_KEYS", "").split(",")
+    elif (CONFIG_DIR / "api_keys").exists():
+        lines = (CONFIG_DIR / "api_keys").read_text().splitlines()
+    else:
+        return []
+    keys = [line.strip() for line in lines if line.strip() and not line.strip().startswith("#")]
+    return list(dict.fromkeys(keys))
+
+
 def create_config_file(path: Path, content: str) -> None:
     """Cria arquivo de configuração com permissões adequadas"""
     path.parent.mkdir(parents=True, exist_ok=True)
     path.write_text(content)
     path.chmod(stat.S_IRUSR | stat.S_IWUSR)
-
-
-def retry_with_backoff(
-    func: Callable[[], T],
-    max_retries: int = 3,
-    base_delay: float = 1.0,
-    max_delay: float = 60.0
-) -> T:
-    """Retry automático com backoff exponencial"""
-    for attempt in range(max_retries):
-        try:
-            return func()
-        except (ConnectionError, RateLimitError) as e:
-            if attempt == max_retries - 1:
-                raise
-            delay = min(base_delay * (2 ** attempt), max_delay)
-            time.sleep(delay)
-    raise Exception("Max retries exceeded")
-
-
-class RateLimiter:
-    """Rate limiter para controlar chamadas à API"""
-    
-    def __init__(self, max_calls: int = 10, time_window: int = 60):
-        self.max_calls = max_calls
-        self.time_window = time_window
-        self.calls = deque()
-    
-    def __call__(self):
-        """Verifica se pode fazer chamada, levanta exceção se rate limit excedido"""
-        now = time.time()
-        while self.calls and self.calls[0] < now - self.time_window:
-            self.calls.popleft()
-        
-        if len(self.calls) >= self.max_calls:
-            raise RateLimitError(
-                f"Rate limit excedido: {self.max_calls} chamadas por {self.time_window}s"
-            )
-        
-        self.calls.append(now)
-